@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 
+from .dead_letters import router as dead_letters_router
 from .tasks import router as tasks_router
 
 
 router = APIRouter(prefix="/v1")
-router.include_router(tasks_router)
\ No newline at end of file
+router.include_router(tasks_router)
+router.include_router(dead_letters_router)
\ No newline at end of file
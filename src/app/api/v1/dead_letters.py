@@ -0,0 +1,94 @@
+import logging
+
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+
+from ...schemas.request import TimerStatusRequest
+from ...schemas.response import DeadLetterListResponse, TimerBatchResponse
+from ...core.config import settings
+from ...core.utils import metrics, queue
+from ...core.utils.dead_letters import claim_dead_letters, list_dead_letters, restore_dead_letters
+from ...core.utils.timers import enqueue_timers
+from ...exceptions.custom_exceptions import BackendNotSupportedError, ModelValidationError
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["dead letters"])
+
+
+@router.get("/dead-letters", response_model=DeadLetterListResponse)
+async def get_dead_letters(limit: int = Query(100, ge=1, le=1000)) -> JSONResponse:
+    """Return the timers whose callback failed after the retries or was skipped by an open circuit
+
+    :param limit: number of dead letters
+    :type int
+
+    :rtype: DeadLetterListResponse
+    :return: dead letters with the history of their failures, the latest failure first
+    """
+    if queue.embedded is not None:
+        raise BackendNotSupportedError("Dead letters need the redis queue backend")
+    try:
+        dead_letters = await list_dead_letters(limit)
+        return JSONResponse(content={"dead_letters": dead_letters}, status_code=200)
+    except Exception as e:
+        logger.error("Error while getting the dead letters: %s", e)
+        return JSONResponse(content={"dead_letters": [], "error": str(e)}, status_code=500)
+
+
+@router.post("/dead-letters/replay", response_model=TimerBatchResponse, response_model_exclude_none=True)
+async def replay_dead_letters(replay_request: TimerStatusRequest) -> JSONResponse:
+    """Replay dead-lettered timers as new timers due now, with pipelined writes to the queue
+
+    The dead letters are claimed atomically before they are queued, so concurrent replays queue each one once, and
+    the ones which could not be queued are put back. A replay failing again is dead lettered under its new id.
+
+    :param replay_request: ids of the dead-lettered timers
+    :type TimerStatusRequest
+
+    :rtype: TimerBatchResponse
+    :return: id of the new task of every dead letter, or the error which prevented its replay
+    """
+    if queue.embedded is not None:
+        raise BackendNotSupportedError("Dead letters need the redis queue backend")
+    timer_ids = replay_request.ids
+    if len(timer_ids) > settings.TIMER_BATCH_MAX_SIZE:
+        raise ModelValidationError(f"A batch can contain at most {settings.TIMER_BATCH_MAX_SIZE} timers")
+    # a dead letter listed twice is replayed once
+    unique_ids = list(dict.fromkeys(timer_ids))
+    try:
+        claimed = dict(zip(unique_ids, await claim_dead_letters(unique_ids)))
+    except Exception as e:
+        logger.error("Error while claiming the dead letters: %s", e)
+        timers = [{"id": "-1", "error": "Unable to get the dead letter"} for _ in timer_ids]
+        return JSONResponse(content={"timers": timers, "failed": len(timer_ids)}, status_code=500)
+
+    first = {timer_id: index for index, timer_id in reversed(list(enumerate(timer_ids)))}
+    responses: list[dict] = [
+        {"id": "-1", "error": "Dead letter not found" if claimed[timer_id] is None else "Duplicate dead letter"}
+        for timer_id in timer_ids
+    ]
+    positions = [index for index, timer_id in enumerate(timer_ids)
+                 if claimed[timer_id] is not None and first[timer_id] == index]
+    job_ids = await enqueue_timers([(claimed[timer_ids[index]]["url"], 0) for index in positions],
+                                   settings.TIMER_BATCH_PIPELINE_SIZE)
+    replayed: list[str] = []
+    unqueued: list[dict] = []
+    for index, job_id in zip(positions, job_ids):
+        if isinstance(job_id, Exception):
+            responses[index] = {"id": "-1", "error": str(job_id)}
+            unqueued.append(claimed[timer_ids[index]])
+        else:
+            responses[index] = {"id": job_id, "time_left": 0}
+            replayed.append(timer_ids[index])
+    if unqueued:
+        try:
+            await restore_dead_letters(unqueued)
+        except Exception as e:
+            logger.error("Error while restoring %d dead letters: %s", len(unqueued), e)
+
+    failed = len(timer_ids) - len(replayed)
+    metrics.TIMERS_CREATED.inc("replay", "created", amount=len(replayed))
+    metrics.TIMERS_CREATED.inc("replay", "failed", amount=failed)
+    logger.info("%d dead letters are replayed, %d failed", len(replayed), failed)
+    response = {"timers": responses, "created": len(replayed), "failed": failed}
+    return JSONResponse(content=response, status_code=207 if failed else 201)
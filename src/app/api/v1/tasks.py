@@ -1,43 +1,199 @@
+import asyncio
+import json
 import time
-from datetime import timedelta
 import logging
+from typing import Any, AsyncGenerator
 
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from arq.jobs import Job as ArqJob
 
-from ...schemas.request import TimerRequest
-from ...schemas.response import TimerResponse
-from ...core.utils import queue
+from ...schemas.request import (
+    RecurringTimerRequest,
+    TimerDelayRequest,
+    TimerRequest,
+    TimerStatusRequest,
+    validate_timer_requests,
+)
+from ...schemas.response import TimerBatchResponse, TimerResponse, TimerStatusResponse
+from ...core.config import settings
+from ...core.utils import metrics, queue, status_cache, ticker
+from ...core.utils.queue import QUEUE_NAME
+from ...core.utils.results import CallbackResult, fetch_results, fetch_timer_results
+from ...core.utils.timers import (
+    FIRED,
+    NOT_FOUND,
+    RECURRING,
+    RUNNING,
+    SHARED,
+    UPDATED,
+    cancel_timers,
+    enqueue_coalesced_timer,
+    enqueue_idempotent_timer,
+    enqueue_recurring_timer,
+    enqueue_timers,
+    fetch_scores,
+    fetch_timer_scores,
+    reschedule_timer,
+    resolve_aliases,
+    time_left_seconds,
+)
+from ...exceptions.custom_exceptions import BackendNotSupportedError, ModelValidationError
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["tasks"])
 
+# status code and error of the timers which could not be cancelled or rescheduled
+UPDATE_ERRORS = {
+    NOT_FOUND: (404, "Timer not found"),
+    RUNNING: (409, "Timer is running"),
+    FIRED: (409, "Timer has already fired"),
+    SHARED: (409, "Timer is coalesced with other timers"),
+    RECURRING: (409, "Timer is recurring"),
+}
+
 @router.post("/timer", response_model=TimerResponse)
-async def create_task(timer_request: TimerRequest) -> JSONResponse:
+async def create_task(timer_request: TimerRequest, coalesce: bool = Query(False)) -> JSONResponse:
     """Create new delayed task
 
+    With ``?coalesce=true`` the task shares one callback with the coalesced tasks of the same url whose deadlines
+    fall in the same TIMER_COALESCE_WINDOW, and fires at the deadline of the first of them. A task with a tenant or
+    a priority is fired from its lane, fairly with the tasks of the other lanes. A task with an idempotency key is
+    created once, the retries within TIMER_IDEMPOTENCY_TTL get the id and time left of the first task with 200.
+
     :param timer_request: request for creating delayed task
     :type timer_request: TimerRequest
+    :param coalesce: share the callback with the tasks of the same url and deadline window
+    :type bool
 
     :rtype: TimerResponse
     :return: id and time left to execute the generated task
     """
+    if coalesce and queue.embedded is not None:
+        raise BackendNotSupportedError("Coalesced timers need the redis queue backend")
+    if timer_request.idempotency_key is not None and queue.embedded is not None:
+        raise BackendNotSupportedError("Idempotency keys need the redis queue backend")
+    if timer_request.lane is not None and queue.embedded is not None:
+        raise BackendNotSupportedError("Timers with a tenant or a priority need the redis queue backend")
+    if coalesce and timer_request.lane is not None:
+        raise ModelValidationError("Coalesced timers cannot have a tenant or a priority")
+    if coalesce and timer_request.idempotency_key is not None:
+        raise ModelValidationError("Coalesced timers cannot have an idempotency key")
     try:
-        delay_seconds = (timer_request.hours * 60 + timer_request.minutes) * 60 + timer_request.seconds
+        delay_seconds = timer_request.delay_seconds
 
         # Schedule the task with a delay
-        job = await queue.pool.enqueue_job("request_url", timer_request.url,_defer_by=timedelta(seconds=delay_seconds), _job_try=1, _queue_name="delayed_task")
-        logger.info(f"Task is created")
-        response = TimerResponse(id=str(job.job_id), time_left=timedelta(seconds=delay_seconds).total_seconds())
+        start = time.perf_counter()
+        if coalesce:
+            job_id, deadline, joined = await enqueue_coalesced_timer(
+                timer_request.url, delay_seconds, settings.TIMER_COALESCE_WINDOW
+            )
+            delay_seconds = time_left_seconds(deadline, time.time() * 1000)
+        elif timer_request.idempotency_key is not None:
+            job_id, deadline, created = await enqueue_idempotent_timer(
+                timer_request.url, delay_seconds, timer_request.idempotency_key, timer_request.lane,
+                settings.TIMER_IDEMPOTENCY_TTL,
+            )
+            if not created:
+                metrics.TIMERS_CREATED.inc("single", "duplicate")
+                logger.info("Task is already created")
+                content = {"id": job_id, "time_left": time_left_seconds(deadline, time.time() * 1000)}
+                return JSONResponse(content=content, status_code=200)
+            joined = False
+        else:
+            job_id, = await enqueue_timers([(timer_request.url, delay_seconds, timer_request.lane)], 1)
+            joined = False
+        metrics.ENQUEUE_SECONDS.observe(time.perf_counter() - start, "single")
+        if isinstance(job_id, Exception):
+            raise job_id
+        metrics.TIMERS_CREATED.inc("single", "coalesced" if joined else "created")
+        logger.info("Task is created")
+        return JSONResponse(content={"id": job_id, "time_left": delay_seconds}, status_code=201)
+    except Exception as e:
+        logger.error("Error while adding task to the queue: %s", e)
+        metrics.TIMERS_CREATED.inc("single", "failed")
+        response = TimerResponse(id="-1", error=f"{str(e)}")
+        return JSONResponse(content=response.model_dump(exclude_none=True), status_code=500)
+
+
+@router.post("/timer/recurring", response_model=TimerResponse, response_model_exclude_none=True)
+async def create_recurring_task(timer_request: RecurringTimerRequest) -> JSONResponse:
+    """Create a task fired every interval, or on a cron expression in UTC, until it is cancelled
+
+    The worker queues the next occurrence when the current one fires, GET /timer/{id} returns the time left
+    before the next occurrence.
+
+    :param timer_request: request for creating recurring task
+    :type timer_request: RecurringTimerRequest
+
+    :rtype: TimerResponse
+    :return: id and time left before the first occurrence of the task
+    """
+    try:
+        job_id, deadline = await enqueue_recurring_timer(timer_request.url, timer_request.schedule)
+        metrics.TIMERS_CREATED.inc("recurring", "created")
+        logger.info("Recurring task is created")
+        response = TimerResponse(id=job_id, time_left=time_left_seconds(deadline, time.time() * 1000))
         return JSONResponse(content=response.model_dump(exclude_none=True), status_code=201)
     except Exception as e:
-        logger.error(f"Error while adding task to the queue: {str(e)}")
-        print(str(e), flush=True)
+        logger.error("Error while adding recurring task to the queue: %s", e)
+        metrics.TIMERS_CREATED.inc("recurring", "failed")
         response = TimerResponse(id="-1", error=f"{str(e)}")
         return JSONResponse(content=response.model_dump(exclude_none=True), status_code=500)
 
 
+@router.post("/timers/batch", response_model=TimerBatchResponse, response_model_exclude_none=True)
+async def create_tasks(timer_requests: list[dict[str, Any]]) -> JSONResponse:
+    """Create many delayed tasks with pipelined writes to the queue
+
+    Every timer is validated on its own, the invalid ones are reported with an error and the valid ones are
+    still created.
+
+    :param timer_requests: requests for creating delayed tasks
+    :type list[dict]
+
+    :rtype: TimerBatchResponse
+    :return: id and time left of every task, or the error which prevented its creation
+    """
+    if len(timer_requests) > settings.TIMER_BATCH_MAX_SIZE:
+        raise ModelValidationError(f"A batch can contain at most {settings.TIMER_BATCH_MAX_SIZE} timers")
+
+    responses: list[dict] = []
+    positions: list[int] = []
+    timers: list[tuple] = []
+    for index, timer in enumerate(validate_timer_requests(timer_requests)):
+        if isinstance(timer, tuple) and len(timer) == 3 and queue.embedded is not None:
+            timer = "Timers with a tenant or a priority need the redis queue backend"
+        if isinstance(timer, str):
+            responses.append({"id": "-1", "error": timer})
+        else:
+            responses.append({})
+            positions.append(index)
+            timers.append(timer)
+
+    start = time.perf_counter()
+    job_ids = await enqueue_timers(timers, settings.TIMER_BATCH_PIPELINE_SIZE)
+    metrics.ENQUEUE_SECONDS.observe(time.perf_counter() - start, "batch")
+    failed = len(responses) - len(timers)
+    for index, (_, delay_seconds, *_), job_id in zip(positions, timers, job_ids):
+        if isinstance(job_id, Exception):
+            responses[index] = {"id": "-1", "error": str(job_id)}
+            failed += 1
+        else:
+            responses[index] = {"id": job_id, "time_left": delay_seconds}
+
+    metrics.TIMERS_CREATED.inc("batch", "created", amount=len(responses) - failed)
+    metrics.TIMERS_CREATED.inc("batch", "failed", amount=failed)
+    logger.info("%d tasks are created, %d failed", len(responses) - failed, failed)
+    # plain dicts, building 50k TimerResponse models costs more than the enqueue
+    response = {"timers": responses, "created": len(responses) - failed, "failed": failed}
+    return JSONResponse(content=response, status_code=207 if failed else 201)
+
+
+def result_fields(result: CallbackResult | None) -> dict:
+    return {} if result is None else {"result": result.as_dict()}
+
+
 @router.get("/timer/{task_id}", response_model=TimerResponse, response_model_exclude_none=True)
 async def get_task(task_id:str) -> JSONResponse:
     """Return task information
@@ -46,25 +202,227 @@ async def get_task(task_id:str) -> JSONResponse:
     :type str: type of id is string
 
     :rtype: TimerResponse
-    :return: id and time left to execute the task
+    :return: id and time left to execute the task, with the result of its callback once it has fired
     """
+    cache = status_cache.cache
+    if cache is not None:
+        cached = cache.get(task_id, time.time() * 1000)
+        if cached is not None:
+            deadline, result = cached
+            response = {"id": task_id, "time_left": time_left_seconds(deadline, time.time() * 1000)}
+            if result is not None:
+                response["result"] = result
+            return JSONResponse(content=response, status_code=200)
     try:
-        job = ArqJob(task_id, queue.pool, _queue_name="delayed_task")
-        job_info = await job.info()
+        if queue.embedded is not None:
+            (score,), (result,) = queue.embedded.scores([task_id]), queue.embedded.results([task_id])
+            response = TimerResponse(id=task_id, time_left=time_left_seconds(score, time.time() * 1000),
+                                     **result_fields(result))
+            return JSONResponse(content=response.model_dump(exclude_none=True), status_code=200)
+        pool = queue.pool_for(task_id)
+        job = ArqJob(task_id, pool, _queue_name=QUEUE_NAME, _deserializer=pool.job_deserializer)
+        if settings.RESULT_STORE_ENABLED:
+            job_info, (result,) = await asyncio.gather(job.info(), fetch_results(pool, [task_id]))
+        else:
+            job_info, result = await job.info(), None
+        alias = None
+        if job_info is None:
+            # a coalesced or recurring task has the state of the job it points to
+            alias, = await resolve_aliases(pool, [task_id])
+            if alias is not None:
+                job_info = await ArqJob(alias, pool, _queue_name=QUEUE_NAME, _deserializer=pool.job_deserializer).info()
         if job_info is None:
-            return JSONResponse(content=TimerResponse(id=task_id, time_left=0).model_dump(exclude_none=True), status_code=200)
+            if cache is not None:
+                # the job is gone, the state of the task does not change anymore
+                cache.put(task_id, None, result and result.as_dict())
+            response = TimerResponse(id=task_id, time_left=0, **result_fields(result))
+            return JSONResponse(content=response.model_dump(exclude_none=True), status_code=200)
         delay_time = job_info.score
+        if delay_time is None:
+            # the task is parked in the timing wheel, or it is running
+            delay_time, = await fetch_scores(pool, [task_id])
         current_time = time.time() * 1000
         if delay_time is not None:
             if current_time < delay_time:
                 time_left = (delay_time - current_time)
+                if cache is not None:
+                    cache.put(task_id, delay_time, result and result.as_dict(), alias)
             else:
                 time_left = 0
-            response = TimerResponse(id=task_id, time_left=int(time_left/1000))
+            response = TimerResponse(id=task_id, time_left=int(time_left/1000), **result_fields(result))
             return JSONResponse(content=response.model_dump(exclude_none=True), status_code=200)
         else:
             return JSONResponse(content=TimerResponse(id=task_id, error="Unable to get timer information").model_dump(exclude_none=True), status_code=200)
     except Exception as e:
-        logger.error(f"Error while getting task from the queue: {str(e)}")
+        logger.error("Error while getting task from the queue: %s", e)
         response = TimerResponse(id=task_id, error="Unable to get the task information")
         return JSONResponse(content=response.model_dump(exclude_none=True), status_code=500)
+
+
+@router.delete("/timer/{task_id}", response_model=TimerResponse, response_model_exclude_none=True)
+async def cancel_task(task_id: str) -> JSONResponse:
+    """Cancel a task which has not fired yet
+
+    :param task_id: id of the created task
+    :type str
+
+    :rtype: TimerResponse
+    :return: id of the cancelled task, or the reason why it could not be cancelled
+    """
+    try:
+        outcome, = await cancel_timers([task_id])
+    except Exception as e:
+        logger.error("Error while cancelling task: %s", e)
+        return JSONResponse(content=TimerResponse(id=task_id, error="Unable to cancel the task").model_dump(exclude_none=True), status_code=500)
+    if outcome != UPDATED:
+        status_code, error = UPDATE_ERRORS[outcome]
+        return JSONResponse(content=TimerResponse(id=task_id, error=error).model_dump(exclude_none=True), status_code=status_code)
+    await status_cache.invalidate_timers([task_id])
+    logger.info("Task is cancelled")
+    return JSONResponse(content=TimerResponse(id=task_id).model_dump(exclude_none=True), status_code=200)
+
+
+@router.patch("/timer/{task_id}", response_model=TimerResponse, response_model_exclude_none=True)
+async def reschedule_task(task_id: str, delay_request: TimerDelayRequest) -> JSONResponse:
+    """Move the deadline of a task which has not fired yet to the new delay from now
+
+    :param task_id: id of the created task
+    :type str
+    :param delay_request: new delay of the task
+    :type TimerDelayRequest
+
+    :rtype: TimerResponse
+    :return: id and new time left of the task, or the reason why it could not be rescheduled
+    """
+    try:
+        outcome = await reschedule_timer(task_id, delay_request.delay_seconds)
+    except Exception as e:
+        logger.error("Error while rescheduling task: %s", e)
+        return JSONResponse(content=TimerResponse(id=task_id, error="Unable to reschedule the task").model_dump(exclude_none=True), status_code=500)
+    if outcome != UPDATED:
+        status_code, error = UPDATE_ERRORS[outcome]
+        return JSONResponse(content=TimerResponse(id=task_id, error=error).model_dump(exclude_none=True), status_code=status_code)
+    await status_cache.invalidate_timers([task_id])
+    logger.info("Task is rescheduled")
+    response = TimerResponse(id=task_id, time_left=delay_request.delay_seconds)
+    return JSONResponse(content=response.model_dump(exclude_none=True), status_code=200)
+
+
+@router.post("/timers/cancel", response_model=TimerStatusResponse, response_model_exclude_none=True)
+async def cancel_tasks(cancel_request: TimerStatusRequest) -> JSONResponse:
+    """Cancel many tasks, one round trip per shard
+
+    :param cancel_request: ids of the created tasks
+    :type TimerStatusRequest
+
+    :rtype: TimerStatusResponse
+    :return: id of every task, with the reason why it could not be cancelled
+    """
+    task_ids = cancel_request.ids
+    if len(task_ids) > settings.TIMER_BATCH_MAX_SIZE:
+        raise ModelValidationError(f"A batch can contain at most {settings.TIMER_BATCH_MAX_SIZE} timers")
+    try:
+        outcomes = await cancel_timers(task_ids)
+    except Exception as e:
+        logger.error("Error while cancelling tasks: %s", e)
+        timers = [{"id": task_id, "error": "Unable to cancel the task"} for task_id in task_ids]
+        return JSONResponse(content={"timers": timers}, status_code=500)
+    timers = [
+        {"id": task_id} if outcome == UPDATED else {"id": task_id, "error": UPDATE_ERRORS[outcome][1]}
+        for task_id, outcome in zip(task_ids, outcomes)
+    ]
+    cancelled = outcomes.count(UPDATED)
+    await status_cache.invalidate_timers([task_id for task_id, outcome in zip(task_ids, outcomes) if outcome == UPDATED])
+    logger.info("%d tasks are cancelled, %d failed", cancelled, len(task_ids) - cancelled)
+    return JSONResponse(content={"timers": timers}, status_code=200 if cancelled == len(task_ids) else 207)
+
+
+async def get_tasks_status(task_ids: list[str]) -> JSONResponse:
+    """Return the time left of many tasks from their deadlines in the queue, without reading the task payloads
+
+    Tasks which are not in the queue anymore have fired, or never existed, and have no time left.
+
+    :param task_ids: ids of the created tasks
+    :type list[str]
+
+    :rtype: TimerStatusResponse
+    :return: id and time left of every task, with the result of the callback of the fired tasks
+    """
+    if len(task_ids) > settings.TIMER_BATCH_MAX_SIZE:
+        raise ModelValidationError(f"A batch can contain at most {settings.TIMER_BATCH_MAX_SIZE} timers")
+    try:
+        if settings.RESULT_STORE_ENABLED:
+            scores, results = await asyncio.gather(fetch_timer_scores(task_ids), fetch_timer_results(task_ids))
+        else:
+            scores, results = await fetch_timer_scores(task_ids), [None] * len(task_ids)
+        current_time = time.time() * 1000
+        timers = [
+            TimerResponse(id=task_id, time_left=time_left_seconds(score, current_time), **result_fields(result))
+            for task_id, score, result in zip(task_ids, scores, results)
+        ]
+        return JSONResponse(content=TimerStatusResponse(timers=timers).model_dump(exclude_none=True), status_code=200)
+    except Exception as e:
+        logger.error("Error while getting tasks from the queue: %s", e)
+        timers = [TimerResponse(id=task_id, error="Unable to get the task information") for task_id in task_ids]
+        return JSONResponse(content=TimerStatusResponse(timers=timers).model_dump(exclude_none=True), status_code=500)
+
+
+@router.get("/timers/status", response_model=TimerStatusResponse, response_model_exclude_none=True)
+async def get_tasks(ids: list[str] = Query(...)) -> JSONResponse:
+    """Return information of many tasks, the ids are repeated query parameters: ?ids=<id>&ids=<id>
+
+    :param ids: ids of the created tasks
+    :type list[str]
+
+    :rtype: TimerStatusResponse
+    :return: id and time left of every task
+    """
+    return await get_tasks_status(ids)
+
+
+@router.post("/timers/status", response_model=TimerStatusResponse, response_model_exclude_none=True)
+async def post_tasks(status_request: TimerStatusRequest) -> JSONResponse:
+    """Return information of many tasks, for lists of ids too long for a query string
+
+    :param status_request: ids of the created tasks
+    :type TimerStatusRequest
+
+    :rtype: TimerStatusResponse
+    :return: id and time left of every task
+    """
+    return await get_tasks_status(status_request.ids)
+
+
+@router.get("/timers/stream")
+async def stream_tasks(ids: list[str] = Query(...)) -> StreamingResponse:
+    """Stream the time left of many tasks as Server-Sent Events: ?ids=<id>&ids=<id>
+
+    The events are ``time_left`` on every tick of the ticker, ``fired`` when the task starts running,
+    then ``completed`` with the result of the task, or ``not_found`` for unknown tasks. The stream ends once
+    every task has completed.
+
+    :param ids: ids of the created tasks
+    :type list[str]
+
+    :rtype: StreamingResponse
+    :return: text/event-stream of the tasks
+    """
+    if len(ids) > settings.TIMER_BATCH_MAX_SIZE:
+        raise ModelValidationError(f"A batch can contain at most {settings.TIMER_BATCH_MAX_SIZE} timers")
+
+    async def events() -> AsyncGenerator[str, None]:
+        pending = set(ids)
+        subscription = ticker.ticker.subscribe(ids)
+        try:
+            while pending:
+                event, data = await subscription.get()
+                if data["id"] not in pending:
+                    continue
+                if event in ticker.FINAL_EVENTS:
+                    pending.discard(data["id"])
+                    ticker.ticker.unsubscribe(subscription, [data["id"]])
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            ticker.ticker.unsubscribe(subscription, list(pending))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -20,6 +20,120 @@ class AppSettings(BaseSettings):
 class RedisQueueSettings(BaseSettings):
     REDIS_QUEUE_HOST: str = config("REDIS_QUEUE_HOST", default="localhost")
     REDIS_QUEUE_PORT: int = config("REDIS_QUEUE_PORT", default=6379)
+    REDIS_QUEUE_SHARDS: str = config("REDIS_QUEUE_SHARDS", default="")
+    JOB_SERIALIZER: str = config("JOB_SERIALIZER", default="pickle")
+    TIMER_SHORT_IDS: bool = config("TIMER_SHORT_IDS", cast=bool, default=False)
+
+
+class EmbeddedQueueSettings(BaseSettings):
+    # redis, or embedded to schedule and fire the timers in the API process without Redis
+    QUEUE_BACKEND: str = config("QUEUE_BACKEND", default="redis")
+    EMBEDDED_LOG_PATH: str = config("EMBEDDED_LOG_PATH", default="./data/timers.log")
+    EMBEDDED_FSYNC: bool = config("EMBEDDED_FSYNC", cast=bool, default=False)
+
+
+class TimerBatchSettings(BaseSettings):
+    TIMER_BATCH_MAX_SIZE: int = config("TIMER_BATCH_MAX_SIZE", cast=int, default=50000)
+    TIMER_BATCH_PIPELINE_SIZE: int = config("TIMER_BATCH_PIPELINE_SIZE", cast=int, default=1000)
+
+
+class TimerStreamSettings(BaseSettings):
+    TIMER_STREAM_INTERVAL: float = config("TIMER_STREAM_INTERVAL", cast=float, default=1.0)
+    TIMER_STREAM_BUFFER_SIZE: int = config("TIMER_STREAM_BUFFER_SIZE", cast=int, default=100)
+
+
+class StatusCacheSettings(BaseSettings):
+    STATUS_CACHE_ENABLED: bool = config("STATUS_CACHE_ENABLED", cast=bool, default=True)
+    STATUS_CACHE_SIZE: int = config("STATUS_CACHE_SIZE", cast=int, default=100000)
+    STATUS_CACHE_TTL: float = config("STATUS_CACHE_TTL", cast=float, default=30.0)
+
+
+class TimerWheelSettings(BaseSettings):
+    TIMER_WHEEL_ENABLED: bool = config("TIMER_WHEEL_ENABLED", cast=bool, default=False)
+    TIMER_WHEEL_HORIZON: float = config("TIMER_WHEEL_HORIZON", cast=float, default=300.0)
+    TIMER_WHEEL_INTERVAL: float = config("TIMER_WHEEL_INTERVAL", cast=float, default=5.0)
+    TIMER_WHEEL_PROMOTE_BATCH: int = config("TIMER_WHEEL_PROMOTE_BATCH", cast=int, default=1000)
+
+
+class TimerIdempotencySettings(BaseSettings):
+    # seconds during which a retry with the same idempotency key gets the same timer
+    TIMER_IDEMPOTENCY_TTL: float = config("TIMER_IDEMPOTENCY_TTL", cast=float, default=86400)
+
+
+class LaneSettings(BaseSettings):
+    # weights of the priorities and of the tenants, name:weight, the tenants without weight have 1
+    LANE_PRIORITY_WEIGHTS: str = config("LANE_PRIORITY_WEIGHTS", default="high:4,normal:2,low:1")
+    LANE_TENANT_WEIGHTS: str = config("LANE_TENANT_WEIGHTS", default="")
+    LANE_DISPATCH_INTERVAL: float = config("LANE_DISPATCH_INTERVAL", cast=float, default=0.05)
+    LANE_DISPATCH_BACKLOG: int = config("LANE_DISPATCH_BACKLOG", cast=int, default=200)
+
+
+class TimerCoalesceSettings(BaseSettings):
+    TIMER_COALESCE_WINDOW: float = config("TIMER_COALESCE_WINDOW", cast=float, default=5.0)
+
+
+class WorkerPoolSettings(BaseSettings):
+    WORKER_MAX_JOBS: int = config("WORKER_MAX_JOBS", cast=int, default=100)
+    WORKER_POLL_DELAY: float = config("WORKER_POLL_DELAY", cast=float, default=0.5)
+    WORKER_PROCESSES: int = config("WORKER_PROCESSES", cast=int, default=0)
+    WORKER_DRAIN_TIMEOUT: float = config("WORKER_DRAIN_TIMEOUT", cast=float, default=30.0)
+    WORKER_RESTART_DELAY: float = config("WORKER_RESTART_DELAY", cast=float, default=1.0)
+    WORKER_SHARDS: str = config("WORKER_SHARDS", default="")
+    WORKER_PRECISION_MODE: bool = config("WORKER_PRECISION_MODE", cast=bool, default=False)
+    WORKER_PRECISION_MAX_WAIT: float = config("WORKER_PRECISION_MAX_WAIT", cast=float, default=0.5)
+    WORKER_FIRE_RECORDS_MAXLEN: int = config("WORKER_FIRE_RECORDS_MAXLEN", cast=int, default=100000)
+
+
+class ResultStoreSettings(BaseSettings):
+    RESULT_STORE_ENABLED: bool = config("RESULT_STORE_ENABLED", cast=bool, default=True)
+    RESULT_TTL: float = config("RESULT_TTL", cast=float, default=86400.0)
+    RESULT_MAX_ENTRIES: int = config("RESULT_MAX_ENTRIES", cast=int, default=1000000)
+
+
+class DeadLetterSettings(BaseSettings):
+    DEAD_LETTER_ENABLED: bool = config("DEAD_LETTER_ENABLED", cast=bool, default=True)
+    DEAD_LETTER_TTL: float = config("DEAD_LETTER_TTL", cast=float, default=604800.0)
+    DEAD_LETTER_MAX_ENTRIES: int = config("DEAD_LETTER_MAX_ENTRIES", cast=int, default=100000)
+
+
+class CircuitBreakerSettings(BaseSettings):
+    CIRCUIT_BREAKER_ENABLED: bool = config("CIRCUIT_BREAKER_ENABLED", cast=bool, default=True)
+    CIRCUIT_BREAKER_THRESHOLD: int = config("CIRCUIT_BREAKER_THRESHOLD", cast=int, default=5)
+    CIRCUIT_BREAKER_WINDOW: float = config("CIRCUIT_BREAKER_WINDOW", cast=float, default=60.0)
+    CIRCUIT_BREAKER_COOLDOWN: float = config("CIRCUIT_BREAKER_COOLDOWN", cast=float, default=30.0)
+
+
+class CallbackHTTPSettings(BaseSettings):
+    HTTP_REQUEST_TIMEOUT: float = config("HTTP_REQUEST_TIMEOUT", cast=float, default=10.0)
+    HTTP_CONNECT_TIMEOUT: float = config("HTTP_CONNECT_TIMEOUT", cast=float, default=5.0)
+    HTTP_MAX_RETRIES: int = config("HTTP_MAX_RETRIES", cast=int, default=4)
+    HTTP_BACKOFF_FACTOR: float = config("HTTP_BACKOFF_FACTOR", cast=float, default=2.0)
+    HTTP_MAX_CONCURRENCY: int = config("HTTP_MAX_CONCURRENCY", cast=int, default=100)
+    HTTP_MAX_CONNECTIONS: int = config("HTTP_MAX_CONNECTIONS", cast=int, default=200)
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = config("HTTP_MAX_CONNECTIONS_PER_HOST", cast=int, default=20)
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = config("HTTP_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=100)
+    HTTP_KEEPALIVE_EXPIRY: float = config("HTTP_KEEPALIVE_EXPIRY", cast=float, default=30.0)
+
+
+class HostLimitSettings(BaseSettings):
+    HOST_RATE_LIMITS: str = config("HOST_RATE_LIMITS", default="")
+    HOST_LIMIT_LEASE_TTL: float = config("HOST_LIMIT_LEASE_TTL", cast=float, default=120.0)
+    HOST_LIMIT_BUSY_WAIT: float = config("HOST_LIMIT_BUSY_WAIT", cast=float, default=0.25)
+    HOST_LIMIT_MAX_DEFERRALS: int = config("HOST_LIMIT_MAX_DEFERRALS", cast=int, default=100)
+
+
+class LoggingSettings(BaseSettings):
+    LOG_FORMAT: str = config("LOG_FORMAT", default="text")
+    LOG_ASYNC_ENABLED: bool = config("LOG_ASYNC_ENABLED", cast=bool, default=False)
+    LOG_QUEUE_SIZE: int = config("LOG_QUEUE_SIZE", cast=int, default=10000)
+    LOG_QUEUE_POLICY: str = config("LOG_QUEUE_POLICY", default="drop")
+
+
+class MetricsSettings(BaseSettings):
+    METRICS_ENABLED: bool = config("METRICS_ENABLED", cast=bool, default=True)
+    WORKER_METRICS_PORT: int = config("WORKER_METRICS_PORT", cast=int, default=9100)
+    API_METRICS_PORT: int = config("API_METRICS_PORT", cast=int, default=0)
+    API_METRICS_PORTS: int = config("API_METRICS_PORTS", cast=int, default=4)
 
 
 class EnvironmentOption(Enum):
@@ -33,6 +147,22 @@ class EnvironmentSettings(BaseSettings):
 class Settings(
     AppSettings,
     RedisQueueSettings,
+    EmbeddedQueueSettings,
+    TimerBatchSettings,
+    TimerStreamSettings,
+    StatusCacheSettings,
+    TimerWheelSettings,
+    TimerCoalesceSettings,
+    TimerIdempotencySettings,
+    LaneSettings,
+    WorkerPoolSettings,
+    CallbackHTTPSettings,
+    ResultStoreSettings,
+    DeadLetterSettings,
+    CircuitBreakerSettings,
+    HostLimitSettings,
+    LoggingSettings,
+    MetricsSettings,
     EnvironmentSettings,
 ):
     pass
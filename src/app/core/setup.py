@@ -8,26 +8,102 @@ import redis.asyncio as redis
 from arq import create_pool
 from arq.connections import RedisSettings
 from fastapi import APIRouter, Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
 
 from .config import (
     AppSettings,
+    EmbeddedQueueSettings,
     EnvironmentOption,
     EnvironmentSettings,
+    MetricsSettings,
     RedisQueueSettings,
+    StatusCacheSettings,
+    TimerStreamSettings,
     settings,
 )
-from .utils import queue
+from .utils import metrics, queue, serializer, status_cache, ticker
+from .utils.embedded import EmbeddedScheduler
+from .utils.logger import get_logger
+from .worker.executor import create_callback_executor
+
+logger = get_logger(__name__)
 
 # -------------- queue --------------
 async def create_redis_queue_pool() -> None:
-    queue.pool = await create_pool(RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT))
+    shard_settings = queue.parse_shards(settings.REDIS_QUEUE_SHARDS, settings.REDIS_QUEUE_HOST, settings.REDIS_QUEUE_PORT)
+    job_serializer, job_deserializer = serializer.job_serializers(settings.JOB_SERIALIZER)
+    queue.shards = [
+        await create_pool(redis_settings, job_serializer=job_serializer, job_deserializer=job_deserializer)
+        for redis_settings in shard_settings
+    ]
+    queue.pool = queue.shards[0]
 
 
 async def close_redis_queue_pool() -> None:
-    await queue.pool.close()  # type: ignore
+    for pool in queue.shards:
+        await pool.close()
+    queue.shards = []
+
+
+async def start_embedded_queue() -> None:
+    queue.embedded = EmbeddedScheduler(settings.EMBEDDED_LOG_PATH, create_callback_executor(settings),
+                                       settings.EMBEDDED_FSYNC, settings.RESULT_MAX_ENTRIES)
+    queue.embedded.open()
+    queue.embedded.start()
+
+
+async def stop_embedded_queue() -> None:
+    await queue.embedded.stop()  # type: ignore
+    await queue.embedded.executor.aclose()  # type: ignore
+    queue.embedded = None
+
+# -------------- ticker --------------
+async def start_timer_ticker() -> None:
+    ticker.ticker = ticker.TimerTicker(settings.TIMER_STREAM_INTERVAL, settings.TIMER_STREAM_BUFFER_SIZE)
+    ticker.ticker.start()
+
+
+async def stop_timer_ticker() -> None:
+    await ticker.ticker.stop()  # type: ignore
+
+# -------------- status cache --------------
+async def start_status_cache() -> None:
+    status_cache.cache = status_cache.StatusCache(settings.STATUS_CACHE_SIZE, settings.STATUS_CACHE_TTL)
+    status_cache.cache.start(queue.shards)
+
+
+async def stop_status_cache() -> None:
+    await status_cache.cache.stop()  # type: ignore
+    status_cache.cache = None
+
+# -------------- metrics --------------
+metrics_router = APIRouter()
+
+
+async def collect_metrics() -> None:
+    try:
+        if queue.embedded is not None:
+            metrics.QUEUE_DEPTH.set(len(queue.embedded), "0", "hot")
+        await metrics.collect_queue_depth(queue.shards)
+    except Exception as e:
+        logger.error("Error while collecting the queue depth: %s", e)
+
+
+async def start_metrics_exporter(port: int, ports: int) -> None:
+    # gunicorn runs several processes behind the port of the API, each one is scraped on its own port
+    try:
+        await metrics.start_exporter(port, ports, collect_metrics)
+    except OSError as e:
+        logger.error("No free port for the metrics of the process from %d to %d: %s", port, port + ports - 1, e)
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    await collect_metrics()
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
 
 # -------------- application --------------
 async def set_threadpool_tokens(number_of_tokens: int = 100) -> None:
@@ -39,6 +115,10 @@ def lifespan_factory(
     settings: (
         AppSettings
         | RedisQueueSettings
+        | EmbeddedQueueSettings
+        | TimerStreamSettings
+        | StatusCacheSettings
+        | MetricsSettings
         | EnvironmentSettings
     ),
 ) -> Callable[[FastAPI], _AsyncGeneratorContextManager[Any]]:
@@ -48,12 +128,38 @@ def lifespan_factory(
     async def lifespan(app: FastAPI) -> AsyncGenerator:
         await set_threadpool_tokens()
 
-        if isinstance(settings, RedisQueueSettings):
+        embedded = isinstance(settings, EmbeddedQueueSettings) and settings.QUEUE_BACKEND == "embedded"
+        if embedded:
+            await start_embedded_queue()
+        elif isinstance(settings, RedisQueueSettings):
             await create_redis_queue_pool()
 
+        if isinstance(settings, TimerStreamSettings):
+            await start_timer_ticker()
+
+        # the embedded queue is read in memory, there is nothing to cache
+        cached = isinstance(settings, StatusCacheSettings) and settings.STATUS_CACHE_ENABLED and not embedded
+        if cached:
+            await start_status_cache()
+
+        exported = isinstance(settings, MetricsSettings) and settings.METRICS_ENABLED and settings.API_METRICS_PORT
+        if exported:
+            await start_metrics_exporter(settings.API_METRICS_PORT, settings.API_METRICS_PORTS)
+
         yield
 
-        if isinstance(settings, RedisQueueSettings):
+        if exported:
+            await metrics.stop_exporter()
+
+        if cached:
+            await stop_status_cache()
+
+        if isinstance(settings, TimerStreamSettings):
+            await stop_timer_ticker()
+
+        if embedded:
+            await stop_embedded_queue()
+        elif isinstance(settings, RedisQueueSettings):
             await close_redis_queue_pool()
 
     return lifespan
@@ -65,6 +171,10 @@ def create_application(
     settings: (
         AppSettings
         | RedisQueueSettings
+        | EmbeddedQueueSettings
+        | TimerStreamSettings
+        | StatusCacheSettings
+        | MetricsSettings
         | EnvironmentSettings
     ),
     **kwargs: Any,
@@ -87,6 +197,10 @@ def create_application(
 
         - AppSettings: Configures basic app metadata like name, description, contact, and license info.
         - RedisQueueSettings: Sets up event handlers for creating and closing a Redis queue pool.
+        - EmbeddedQueueSettings: Runs the timers in the process instead, without Redis, with QUEUE_BACKEND=embedded.
+        - TimerStreamSettings: Starts and stops the ticker shared by the streams of timers.
+        - StatusCacheSettings: Starts and stops the status cache of GET /timer/{id} and its invalidations.
+        - MetricsSettings: Exposes the metrics of the process on /metrics, and on a port of its own per process.
         - EnvironmentSettings: Conditionally sets documentation URLs and integrates custom routes for API documentation
           based on the environment type.
     :type settings
@@ -114,6 +228,9 @@ def create_application(
     application = FastAPI(lifespan=lifespan, **kwargs)
     application.include_router(router)
 
+    if isinstance(settings, MetricsSettings) and settings.METRICS_ENABLED:
+        application.include_router(metrics_router)
+
     if isinstance(settings, EnvironmentSettings):
         if settings.ENVIRONMENT == EnvironmentOption.LOCAL:
             docs_router = APIRouter()
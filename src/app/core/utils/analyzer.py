@@ -0,0 +1,265 @@
+"""
+Memory analyzer of the Redis shards of the queue
+
+    python -m app.core.utils.analyzer [--shard 0] [--purge] [--pause 0.01]
+
+Every shard is walked with SCAN, never KEYS, and the size of every key is read with MEMORY USAGE, so it runs against
+a live shard, throttled with --pause between the pages, as well as offline against a replica or a local Redis
+restored from a snapshot (--redis host:port). The report gives the number of keys, the bytes and the largest key of
+every kind of key, and the bytes per pending timer.
+
+Orphaned keys are reported, and deleted with --purge:
+
+- job keys whose job is neither in the sorted set, parked in the timing wheel or a lane, nor running,
+- entries of the sorted set whose job key is gone, arq only drops them once they are due,
+- arq result keys without expiry.
+
+Each orphan is checked again and deleted by one Redis script, a job queued or picked meanwhile is kept.
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+
+from arq import create_pool
+from arq.connections import ArqRedis
+from arq.constants import in_progress_key_prefix, job_key_prefix, result_key_prefix, retry_key_prefix
+
+from ..config import settings
+from ..worker.breaker import BREAKER_KEY_PREFIX
+from ..worker.limiter import DEFERRALS_KEY_PREFIX, LIMIT_KEY_PREFIX
+from ..worker.precision import FIRES_KEY
+from .dead_letters import DEAD_LETTERS_INDEX_KEY, DEAD_LETTERS_KEY
+from .lanes import LANE_KEY_PREFIX, LANE_TAGS_KEY, LANE_TIMERS_KEY, LANES_KEY
+from .queue import QUEUE_NAME, parse_shards
+from .results import RESULTS_INDEX_KEY, RESULTS_KEY
+from .timers import (
+    ALIAS_KEY_PREFIX,
+    COALESCE_KEY_PREFIX,
+    IDEMPOTENCY_KEY_PREFIX,
+    MEMBERS_KEY_PREFIX,
+    RECURRING_KEY,
+)
+from .wheel import DEADLINES_KEY, WHEEL_KEY
+
+# kind of the keys, by exact name or by prefix, the longest prefix wins
+KEY_NAMES = {
+    QUEUE_NAME: "queue",
+    WHEEL_KEY: "wheel",
+    DEADLINES_KEY: "deadlines",
+    LANES_KEY: "lanes",
+    LANE_TAGS_KEY: "lanes",
+    LANE_TIMERS_KEY: "lanes",
+    RECURRING_KEY: "recurring",
+    RESULTS_KEY: "results",
+    RESULTS_INDEX_KEY: "results",
+    DEAD_LETTERS_KEY: "dead_letters",
+    DEAD_LETTERS_INDEX_KEY: "dead_letters",
+    FIRES_KEY: "fires",
+}
+KEY_PREFIXES = sorted([
+    (job_key_prefix, "job"),
+    (result_key_prefix, "arq_result"),
+    (in_progress_key_prefix, "in_progress"),
+    (retry_key_prefix, "retry"),
+    (WHEEL_KEY + ":", "wheel"),
+    (LANE_KEY_PREFIX, "lanes"),
+    (ALIAS_KEY_PREFIX, "alias"),
+    (MEMBERS_KEY_PREFIX, "coalesce"),
+    (COALESCE_KEY_PREFIX, "coalesce"),
+    (IDEMPOTENCY_KEY_PREFIX, "idempotency"),
+    (LIMIT_KEY_PREFIX, "host_limits"),
+    (DEFERRALS_KEY_PREFIX, "host_limits"),
+    (BREAKER_KEY_PREFIX, "circuit_breaker"),
+], key=lambda prefix: -len(prefix[0]))
+
+# KEYS: queue, deadlines, job, in progress  ARGV: job id
+PURGE_JOB = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) or redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1
+        or redis.call('EXISTS', KEYS[4]) == 1 then
+    return 0
+end
+return redis.call('DEL', KEYS[3])
+"""
+
+# KEYS: queue, job, in progress  ARGV: job id
+PURGE_QUEUE_ENTRY = """
+if redis.call('EXISTS', KEYS[2], KEYS[3]) > 0 then
+    return 0
+end
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+
+
+def key_kind(key: str) -> str:
+    """
+    The function returns the kind of a key of the shard, other for the keys which do not belong to the queue
+    """
+    kind = KEY_NAMES.get(key)
+    if kind is not None:
+        return kind
+    for prefix, kind in KEY_PREFIXES:
+        if key.startswith(prefix):
+            return kind
+    return "other"
+
+
+@dataclass
+class KeyStats:
+    keys: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
+    max_key: str = ""
+
+    def add(self, key: str, size: int) -> None:
+        self.keys += 1
+        self.bytes += size
+        if size > self.max_bytes:
+            self.max_bytes, self.max_key = size, key
+
+
+@dataclass
+class ShardReport:
+    """
+    Memory of the keys of a shard by kind, with the orphaned keys found, and deleted when purged
+    """
+    kinds: dict[str, KeyStats] = field(default_factory=dict)
+    pending: int = 0
+    orphans: dict[str, int] = field(default_factory=lambda: {"job": 0, "queue_entry": 0, "arq_result": 0})
+    purged: int = 0
+
+    @property
+    def bytes(self) -> int:
+        return sum(stats.bytes for stats in self.kinds.values())
+
+    def lines(self, shard: int) -> list[str]:
+        per_timer = self.bytes // self.pending if self.pending else 0
+        lines = [
+            f"shard {shard}: {sum(stats.keys for stats in self.kinds.values())} keys, {self.bytes} bytes, "
+            f"{self.pending} pending timers, {per_timer} bytes per pending timer",
+            f"  {'kind':<16}{'keys':>12}{'bytes':>14}{'avg':>10}{'max':>12}  largest key",
+        ]
+        for kind, stats in sorted(self.kinds.items(), key=lambda item: -item[1].bytes):
+            lines.append(f"  {kind:<16}{stats.keys:>12}{stats.bytes:>14}{stats.bytes // stats.keys:>10}"
+                         f"{stats.max_bytes:>12}  {stats.max_key}")
+        orphans = ", ".join(f"{count} {kind}" for kind, count in self.orphans.items())
+        lines.append(f"  orphans: {orphans}, {self.purged} purged")
+        return lines
+
+
+async def find_orphan_jobs(pool: ArqRedis, job_ids: list[str]) -> list[str]:
+    """
+    The function returns the jobs of a page of keys which are neither queued, parked nor running
+    """
+    async with pool.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.zscore(QUEUE_NAME, job_id)
+            pipe.hexists(DEADLINES_KEY, job_id)
+            pipe.exists(in_progress_key_prefix + job_id)
+        replies = await pipe.execute()
+    return [
+        job_id for index, job_id in enumerate(job_ids)
+        if replies[3 * index] is None and not replies[3 * index + 1] and not replies[3 * index + 2]
+    ]
+
+
+async def analyze_shard(pool: ArqRedis, scan_count: int, pause: float, purge: bool) -> ShardReport:
+    """
+    The function walks the keys of a shard with SCAN and reads their size with MEMORY USAGE
+    :param pool: redis pool of the shard
+    :type ArqRedis
+    :param scan_count: keys read per SCAN page
+    :type int
+    :param pause: seconds to wait between the pages, to spare a live shard
+    :type float
+    :param purge: delete the orphaned keys
+    :type bool
+
+    :rtype: ShardReport
+    :return: memory of the keys by kind and orphaned keys
+    """
+    report = ShardReport()
+    purge_job = pool.register_script(PURGE_JOB)
+    purge_queue_entry = pool.register_script(PURGE_QUEUE_ENTRY)
+    cursor = None
+    while cursor != 0:
+        cursor, keys = await pool.scan(cursor or 0, count=scan_count)
+        keys = [key.decode() for key in keys]
+        async with pool.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.memory_usage(key)
+                pipe.pttl(key)
+            replies = await pipe.execute()
+        job_ids = []
+        for index, key in enumerate(keys):
+            size, ttl = replies[2 * index], replies[2 * index + 1]
+            if size is None:
+                # expired or deleted since the SCAN
+                continue
+            kind = key_kind(key)
+            report.kinds.setdefault(kind, KeyStats()).add(key, size)
+            if kind == "job":
+                job_ids.append(key[len(job_key_prefix):])
+            elif kind == "arq_result" and ttl == -1:
+                report.orphans["arq_result"] += 1
+                if purge:
+                    report.purged += await pool.delete(key)
+        orphan_jobs = await find_orphan_jobs(pool, job_ids) if job_ids else []
+        for job_id in orphan_jobs:
+            report.orphans["job"] += 1
+            if purge:
+                report.purged += await purge_job(
+                    keys=[QUEUE_NAME, DEADLINES_KEY, job_key_prefix + job_id, in_progress_key_prefix + job_id],
+                    args=[job_id],
+                )
+        if pause and cursor:
+            await asyncio.sleep(pause)
+
+    # the entries of the sorted set are read by pages as well, a large set is never read in one reply
+    cursor = None
+    while cursor != 0:
+        cursor, entries = await pool.zscan(QUEUE_NAME, cursor or 0, count=scan_count)
+        job_ids = [job_id.decode() for job_id, _ in entries]
+        async with pool.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.exists(job_key_prefix + job_id, in_progress_key_prefix + job_id)
+            replies = await pipe.execute()
+        for job_id, exists in zip(job_ids, replies):
+            if not exists:
+                report.orphans["queue_entry"] += 1
+                if purge:
+                    report.purged += await purge_queue_entry(
+                        keys=[QUEUE_NAME, job_key_prefix + job_id, in_progress_key_prefix + job_id], args=[job_id]
+                    )
+        if pause and cursor:
+            await asyncio.sleep(pause)
+
+    async with pool.pipeline(transaction=False) as pipe:
+        pipe.zcard(QUEUE_NAME)
+        pipe.hlen(DEADLINES_KEY)
+        hot, parked = await pipe.execute()
+    # the purged entries are not in the sorted set anymore
+    report.pending = hot + parked - (0 if purge else report.orphans["queue_entry"])
+    return report
+
+
+async def main(args: argparse.Namespace) -> None:
+    shard_settings = parse_shards(args.redis or settings.REDIS_QUEUE_SHARDS, settings.REDIS_QUEUE_HOST,
+                                  settings.REDIS_QUEUE_PORT)
+    for shard in args.shard or range(len(shard_settings)):
+        pool = await create_pool(shard_settings[shard])
+        try:
+            report = await analyze_shard(pool, args.scan_count, args.pause, args.purge)
+        finally:
+            await pool.close()
+        print("\n".join(report.lines(shard)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis", default="", help="comma separated host:port of the shards, REDIS_QUEUE_SHARDS "
+                                                    "by default, e.g. a replica or a restored snapshot")
+    parser.add_argument("--shard", type=int, action="append", help="index of a shard to analyze, all by default")
+    parser.add_argument("--scan-count", type=int, default=1000, help="keys read per SCAN page")
+    parser.add_argument("--pause", type=float, default=0, help="seconds between the SCAN pages")
+    parser.add_argument("--purge", action="store_true", help="delete the orphaned keys")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""
+Store of the timers whose callback failed.
+
+A timer whose callback still fails after the retries of the executor, or which is not sent because the circuit of its
+host is open, is kept in the ``delayed_task:dead_letters`` hash of its shard with its url, its last error and the
+history of its failures, indexed by failure time in the ``delayed_task:dead_letters:index`` sorted set. Every write
+evicts the dead letters older than DEAD_LETTER_TTL and the oldest beyond DEAD_LETTER_MAX_ENTRIES. The dead letters
+are replayed in bulk as new timers, a replay claims its dead letters first so each one is queued once. Redis queue backend only.
+"""
+import asyncio
+import json
+
+from arq.connections import ArqRedis
+
+from . import queue
+from .queue import QUEUE_NAME
+from .results import EVICTION_BATCH, STORE_RESULT
+
+DEAD_LETTERS_KEY = f"{QUEUE_NAME}:dead_letters"
+DEAD_LETTERS_INDEX_KEY = f"{QUEUE_NAME}:dead_letters:index"
+# failures kept in the history of a dead letter, the oldest are dropped
+HISTORY_SIZE = 10
+
+# KEYS: dead letters, index  ARGV: ids  returns the dead letter of every id, false for the missing ones
+CLAIM_DEAD_LETTERS = """
+local records = {}
+for i, id in ipairs(ARGV) do
+    records[i] = redis.call('HGET', KEYS[1], id)
+    if records[i] then
+        redis.call('HDEL', KEYS[1], id)
+        redis.call('ZREM', KEYS[2], id)
+    end
+end
+return records
+"""
+
+
+async def store_dead_letter(pool: ArqRedis, timer_id: str, url: str, status_code: int, attempts: int, error: str,
+                            failed_at: int, ttl_ms: int, max_entries: int) -> None:
+    """
+    The function stores a failed timer, the failures of a timer already dead lettered, a recurring timer or a
+    replayed one, are added to its history
+    :param pool: redis pool of the shard of the timer
+    :type ArqRedis
+    :param timer_id: id of the timer
+    :type str
+    :param url: url of the timer
+    :type str
+    :param status_code: status code of the last attempt, 0 when no response was received
+    :type int
+    :param attempts: number of requests made by the last fire
+    :type int
+    :param error: last error
+    :type str
+    :param failed_at: time of the failure in ms
+    :type int
+    :param ttl_ms: time the dead letters are kept
+    :type int
+    :param max_entries: number of dead letters kept on the shard
+    :type int
+    """
+    failure = {"failed_at": failed_at, "status_code": status_code, "attempts": attempts, "error": error}
+    previous = await pool.hget(DEAD_LETTERS_KEY, timer_id)
+    history = json.loads(previous)["history"][-(HISTORY_SIZE - 1):] if previous else []
+    record = {"id": timer_id, "url": url, **failure, "history": [*history, failure]}
+    store = pool.register_script(STORE_RESULT)
+    await store(keys=[DEAD_LETTERS_KEY, DEAD_LETTERS_INDEX_KEY],
+                args=[timer_id, json.dumps(record), failed_at, ttl_ms, max_entries, EVICTION_BATCH])
+
+
+async def list_dead_letters(limit: int) -> list[dict]:
+    """
+    The function reads the latest dead letters of the shards of the queue
+    :param limit: number of dead letters
+    :type int
+
+    :rtype: list[dict]
+    :return: dead letters, the latest failure first
+    """
+    async def list_shard(pool: ArqRedis) -> list[dict]:
+        timer_ids = await pool.zrevrange(DEAD_LETTERS_INDEX_KEY, 0, limit - 1)
+        if not timer_ids:
+            return []
+        return [json.loads(record) for record in await pool.hmget(DEAD_LETTERS_KEY, timer_ids) if record]
+
+    pools = queue.shards or [queue.pool]
+    records = [record for shard in await asyncio.gather(*(list_shard(pool) for pool in pools)) for record in shard]
+    return sorted(records, key=lambda record: record["failed_at"], reverse=True)[:limit]
+
+
+async def claim_dead_letters(timer_ids: list[str]) -> list[dict | None]:
+    """
+    The function takes the dead letters of many timers out of the store, one script per shard, so concurrent
+    replays of the same dead letter get it once
+    :param timer_ids: ids of the timers, without duplicates
+    :type list[str]
+
+    :rtype: list[dict | None]
+    :return: dead letter of every timer, None for the timers which are not dead lettered or claimed meanwhile
+    """
+    records: list[dict | None] = [None] * len(timer_ids)
+
+    async def claim_shard(shard: int, positions: list[int]) -> None:
+        claim = queue.shard_pool(shard).register_script(CLAIM_DEAD_LETTERS)
+        payloads = await claim(keys=[DEAD_LETTERS_KEY, DEAD_LETTERS_INDEX_KEY], args=[timer_ids[i] for i in positions])
+        for position, payload in zip(positions, payloads):
+            records[position] = json.loads(payload) if payload else None
+
+    await asyncio.gather(*(claim_shard(shard, positions) for shard, positions in queue.group_by_shard(timer_ids).items()))
+    return records
+
+
+async def restore_dead_letters(records: list[dict]) -> None:
+    """
+    The function puts claimed dead letters back in the store, for the replays which could not be queued
+    """
+    timer_ids = [record["id"] for record in records]
+
+    async def restore_shard(shard: int, positions: list[int]) -> None:
+        async with queue.shard_pool(shard).pipeline(transaction=True) as pipe:
+            for position in positions:
+                pipe.hset(DEAD_LETTERS_KEY, timer_ids[position], json.dumps(records[position]))
+                pipe.zadd(DEAD_LETTERS_INDEX_KEY, {timer_ids[position]: records[position]["failed_at"]})
+            await pipe.execute()
+
+    await asyncio.gather(*(restore_shard(shard, positions) for shard, positions in queue.group_by_shard(timer_ids).items()))
@@ -0,0 +1,317 @@
+"""
+In-process scheduler of the timers, for single node and test deployments without Redis.
+
+The timers are kept in a heap ordered by deadline and fired by the API process itself with the callback executor of
+the workers. Every change is appended to a log, one line per record, which is replayed on startup and then
+rewritten with the pending timers only:
+
+- ``A <id> <deadline ms> <schedule or -> <url>``: a timer is added, the control characters of the url are percent
+  encoded so a url never splits a record,
+- ``R <id> <deadline ms>``: a timer is rescheduled, or a recurring timer moves to its next occurrence,
+- ``D <id>``: a timer is done, it fired or it was cancelled.
+
+A timer is marked done when it fires, before its callback is made, so a crash during a callback does not make it
+again. The log is flushed to the operating system after every write, which survives a crash of the process, and
+synced to the disk with EMBEDDED_FSYNC, which survives a crash of the host.
+"""
+import asyncio
+import heapq
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+
+import httpx
+from arq.utils import timestamp_ms
+
+from ...exceptions.custom_exceptions import CallbackRetryError
+from . import metrics
+from .logger import get_logger
+from .recurrence import next_deadline
+from .results import CallbackResult, body_hash
+from .timers import FIRED, NOT_FOUND, RECURRING, RUNNING, UPDATED, new_job_id
+
+logger = get_logger(__name__)
+
+CONTROL_CHARS_REGEX = re.compile(r"[\x00-\x1f\x7f]")
+
+
+@dataclass(slots=True)
+class Timer:
+    url: str
+    deadline: int
+    schedule: str | None = None
+
+
+class EmbeddedScheduler:
+    """
+    Heap of timers persisted to an append-only log, fired on the event loop of the process
+    """
+    def __init__(self, path: str, executor, fsync: bool = False, max_results: int = 100000) -> None:
+        self.path = path
+        self.executor = executor
+        self.fsync = fsync
+        self.max_results = max_results
+        self._timers: dict[str, Timer] = {}
+        # (deadline, id), the entries of cancelled and rescheduled timers are skipped when they are popped
+        self._heap: list[tuple[int, str]] = []
+        self._running: set[str] = set()
+        self._results: OrderedDict[str, CallbackResult] = OrderedDict()
+        self._log = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._callbacks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    # -------- log --------
+    def open(self) -> None:
+        """
+        The function replays the log and rewrites it with the pending timers
+        """
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as log:
+                for line in log:
+                    self._replay(line.rstrip("\n"))
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._heap = [(timer.deadline, timer_id) for timer_id, timer in self._timers.items()]
+        heapq.heapify(self._heap)
+        compacted = f"{self.path}.compact"
+        with open(compacted, "w", encoding="utf-8") as log:
+            log.writelines(self._add_record(timer_id, timer) for timer_id, timer in self._timers.items())
+            log.flush()
+            os.fsync(log.fileno())
+        os.replace(compacted, self.path)
+        self._log = open(self.path, "a", encoding="utf-8")
+        logger.info("Embedded scheduler loaded %d timers from %s", len(self._timers), self.path)
+
+    def _replay(self, line: str) -> None:
+        record, _, fields = line.partition(" ")
+        try:
+            if record == "A":
+                timer_id, deadline, schedule, url = fields.split(" ", 3)
+                self._timers[timer_id] = Timer(url, int(deadline), None if schedule == "-" else schedule)
+            elif record == "R":
+                timer_id, deadline = fields.split(" ")
+                if timer_id in self._timers:
+                    self._timers[timer_id].deadline = int(deadline)
+            elif record == "D":
+                self._timers.pop(fields, None)
+        except ValueError:
+            # the last line of a log cut by a crash
+            logger.warning("Skipping a truncated record of the embedded log: %r", line)
+
+    @staticmethod
+    def _add_record(timer_id: str, timer: Timer) -> str:
+        url = CONTROL_CHARS_REGEX.sub(lambda char: f"%{ord(char.group()):02X}", timer.url)
+        return f"A {timer_id} {timer.deadline} {timer.schedule or '-'} {url}\n"
+
+    def _write(self, records: list[str]) -> None:
+        self._log.writelines(records)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    # -------- timers --------
+    def _schedule(self, timer_id: str, timer: Timer) -> None:
+        self._timers[timer_id] = timer
+        heapq.heappush(self._heap, (timer.deadline, timer_id))
+        if self._heap[0][1] == timer_id:
+            self._wakeup.set()
+
+    def add(self, timers: list[tuple]) -> list[str]:
+        """
+        The function adds timers, with one write to the log
+        :param timers: url and delay in seconds of every timer, the lanes need the redis queue backend
+        :type list[tuple]
+
+        :rtype: list[str]
+        :return: id of every timer
+        """
+        if any(lane is not None for _, _, *lanes in timers for lane in lanes):
+            raise ValueError("Lanes need the redis queue backend")
+        now_ms = timestamp_ms()
+        added = [(new_job_id(), Timer(url, now_ms + delay_seconds * 1000)) for url, delay_seconds, *_ in timers]
+        self._write([self._add_record(timer_id, timer) for timer_id, timer in added])
+        for timer_id, timer in added:
+            self._schedule(timer_id, timer)
+        return [timer_id for timer_id, _ in added]
+
+    def add_recurring(self, url: str, schedule: str) -> tuple[str, int]:
+        """
+        The function adds a recurring timer
+        :param url: url of the timer
+        :type str
+        :param schedule: every:<seconds> or cron:<expression>
+        :type str
+
+        :rtype: tuple[str, int]
+        :return: id of the timer and deadline in ms of its first occurrence
+        """
+        now_ms = timestamp_ms()
+        timer_id, timer = new_job_id(), Timer(url, next_deadline(schedule, now_ms, now_ms), schedule)
+        self._write([self._add_record(timer_id, timer)])
+        self._schedule(timer_id, timer)
+        return timer_id, timer.deadline
+
+    def scores(self, timer_ids: list[str]) -> list[float | None]:
+        """
+        The function returns the deadlines of the timers, None for the timers which are not pending
+        """
+        timers = self._timers
+        return [None if timer_id not in timers else float(timers[timer_id].deadline) for timer_id in timer_ids]
+
+    def results(self, timer_ids: list[str]) -> list[CallbackResult | None]:
+        return [self._results.get(timer_id) for timer_id in timer_ids]
+
+    def cancel(self, timer_ids: list[str]) -> list[int]:
+        """
+        The function cancels timers which have not fired yet, with one write to the log
+        :param timer_ids: ids of the timers
+        :type list[str]
+
+        :rtype: list[int]
+        :return: UPDATED, NOT_FOUND, RUNNING or FIRED for every timer
+        """
+        outcomes = []
+        for timer_id in timer_ids:
+            if timer_id in self._timers and timer_id not in self._running:
+                outcomes.append(UPDATED)
+            elif timer_id in self._running:
+                outcomes.append(RUNNING)
+            else:
+                outcomes.append(FIRED if timer_id in self._results else NOT_FOUND)
+        cancelled = [timer_id for timer_id, outcome in zip(timer_ids, outcomes) if outcome == UPDATED]
+        self._write([f"D {timer_id}\n" for timer_id in cancelled])
+        for timer_id in cancelled:
+            self._timers.pop(timer_id, None)
+        return outcomes
+
+    def reschedule(self, timer_id: str, delay_seconds: int) -> int:
+        """
+        The function moves the deadline of a timer which has not fired yet to `delay_seconds` from now
+        :param timer_id: id of the timer
+        :type str
+        :param delay_seconds: new delay of the timer from now
+        :type int
+
+        :rtype: int
+        :return: UPDATED, NOT_FOUND, RUNNING, FIRED or RECURRING
+        """
+        timer = self._timers.get(timer_id)
+        if timer is None:
+            return RUNNING if timer_id in self._running else FIRED if timer_id in self._results else NOT_FOUND
+        if timer.schedule is not None:
+            return RECURRING
+        deadline = timestamp_ms() + delay_seconds * 1000
+        self._write([f"R {timer_id} {deadline}\n"])
+        self._schedule(timer_id, Timer(timer.url, deadline))
+        return UPDATED
+
+    def state(self, timer_id: str) -> str:
+        """
+        The function returns pending, running, completed or unknown
+        """
+        if timer_id in self._running:
+            return "running"
+        if timer_id in self._timers:
+            return "pending"
+        return "completed" if timer_id in self._results else "unknown"
+
+    # -------- firing --------
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        The function stops firing timers and cancels the callbacks in flight, their timers are already done
+        """
+        tasks = [self._task, *self._callbacks] if self._task is not None else list(self._callbacks)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._task = None
+        self.close()
+
+    def pop_due(self, now_ms: int) -> list[tuple[str, Timer]]:
+        """
+        The function removes the due timers from the heap, the recurring timers move to their next occurrence
+        :param now_ms: current time in ms
+        :type int
+
+        :rtype: list[tuple[str, Timer]]
+        :return: id and timer of the timers to fire
+        """
+        due, records = [], []
+        while self._heap and self._heap[0][0] <= now_ms:
+            deadline, timer_id = heapq.heappop(self._heap)
+            timer = self._timers.get(timer_id)
+            if timer is None or timer.deadline != deadline:
+                continue
+            due.append((timer_id, timer))
+            if timer.schedule is None:
+                del self._timers[timer_id]
+                records.append(f"D {timer_id}\n")
+            else:
+                following = Timer(timer.url, next_deadline(timer.schedule, deadline, now_ms), timer.schedule)
+                self._timers[timer_id] = following
+                heapq.heappush(self._heap, (following.deadline, timer_id))
+                records.append(f"R {timer_id} {following.deadline}\n")
+        if records:
+            self._write(records)
+        return due
+
+    async def run(self) -> None:
+        while True:
+            now_ms = timestamp_ms()
+            for timer_id, timer in self.pop_due(now_ms):
+                metrics.SCHEDULING_LAG_SECONDS.observe(max(0, now_ms - timer.deadline) / 1000)
+                task = asyncio.create_task(self.fire(timer_id, timer.url))
+                self._callbacks.add(task)
+                task.add_done_callback(self._callbacks.discard)
+            self._wakeup.clear()
+            timeout = (self._heap[0][0] - timestamp_ms()) / 1000 if self._heap else None
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+    async def fire(self, timer_id: str, url: str) -> None:
+        """
+        The function requests the url of a fired timer and keeps the outcome of the callback
+        """
+        self._running.add(timer_id)
+        fired_ms = timestamp_ms()
+        start = time.perf_counter()
+        try:
+            try:
+                response, attempts = await self.executor.request(url)
+                status_code, body = response.status_code, response.content
+            except CallbackRetryError as e:
+                status_code, attempts, body, error = e.status_code, e.attempts, b"", e
+            except httpx.TransportError as e:
+                status_code, attempts, body, error = 0, self.executor.retry.total + 1, b"", e
+            else:
+                error = None
+            duration = time.perf_counter() - start
+            metrics.CALLBACK_SECONDS.observe(duration, "failure" if error else "success")
+            self._results[timer_id] = CallbackResult(status_code, int(duration * 1000), attempts, fired_ms,
+                                                     body_hash(body))
+            self._results.move_to_end(timer_id)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            if error is not None:
+                logger.error("Callback of timer %s failed: %s", timer_id, error)
+        except Exception as e:
+            logger.error("Error while firing timer %s: %s", timer_id, e)
+        finally:
+            self._running.discard(timer_id)
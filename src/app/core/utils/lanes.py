@@ -0,0 +1,170 @@
+"""
+Tenant and priority lanes in front of the ``delayed_task`` sorted set.
+
+A timer created with a tenant or a priority is parked in the sorted set of its lane instead of the hot sorted set:
+
+- ``delayed_task:lane:<tenant>:<priority>`` holds the timers of a lane by deadline,
+- ``delayed_task:lanes`` is the set of the lanes holding timers,
+- ``delayed_task:lanes:tags`` holds the finish tag of every lane and the virtual clock of the dispatcher,
+- ``delayed_task:lanes:timers`` maps the id of every parked timer to its lane, a rescheduled timer stays in its lane,
+- ``delayed_task:deadlines`` maps the id of every parked timer to its deadline in ms, like the timing wheel.
+
+The dispatcher of the workers tops the due backlog of the hot sorted set up to LANE_DISPATCH_BACKLOG jobs, taking the
+due timers of the lanes with start-time fair queuing: every lane gets a share of the dispatched timers in proportion
+to the weight of its tenant times the weight of its priority, whatever the number of timers due in the other lanes.
+A burst of one tenant waits in its lane instead of the hot sorted set, so the timers of the other tenants are fired
+after at most a backlog of jobs. A parked timer which is not in ``delayed_task:deadlines`` anymore was cancelled or
+rescheduled and is dropped by the dispatcher.
+"""
+import asyncio
+import re
+
+from arq.connections import ArqRedis
+from arq.utils import timestamp_ms
+
+from . import metrics
+from .logger import get_logger
+from .queue import QUEUE_NAME
+from .wheel import DEADLINES_KEY
+
+logger = get_logger(__name__)
+
+LANES_KEY = f"{QUEUE_NAME}:lanes"
+LANE_TAGS_KEY = f"{QUEUE_NAME}:lanes:tags"
+LANE_TIMERS_KEY = f"{QUEUE_NAME}:lanes:timers"
+LANE_KEY_PREFIX = f"{QUEUE_NAME}:lane:"
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_TENANT = "default"
+TENANT_REGEX = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+# KEYS: queue, deadlines, lanes, tags, lane timers  ARGV: now ms, backlog, lane prefix, then lane and weight of every lane
+# the lane with the smallest start tag, max(finish tag of the lane, virtual clock), gives the next due timer
+DISPATCH_LANES = """
+local now = tonumber(ARGV[1])
+local budget = tonumber(ARGV[2]) - redis.call('ZCOUNT', KEYS[1], '-inf', now)
+if budget <= 0 then
+    return 0
+end
+local lanes = {}
+for i = 4, #ARGV, 2 do
+    local tag = redis.call('HGET', KEYS[4], ARGV[i])
+    lanes[#lanes + 1] = {name = ARGV[i], key = ARGV[3] .. ARGV[i], weight = tonumber(ARGV[i + 1]),
+                         tag = tonumber(tag or 0), due = true}
+end
+local clock = tonumber(redis.call('HGET', KEYS[4], '') or 0)
+local moved = 0
+while moved < budget do
+    local best, best_start
+    for _, lane in ipairs(lanes) do
+        if lane.due then
+            local start = math.max(lane.tag, clock)
+            if best == nil or start < best_start then
+                best, best_start = lane, start
+            end
+        end
+    end
+    if best == nil then
+        break
+    end
+    local head = redis.call('ZRANGEBYSCORE', best.key, '-inf', now, 'WITHSCORES', 'LIMIT', 0, 1)
+    if #head == 0 then
+        best.due = false
+    else
+        redis.call('ZREM', best.key, head[1])
+        redis.call('HDEL', KEYS[5], head[1])
+        if redis.call('HDEL', KEYS[2], head[1]) == 1 then
+            redis.call('ZADD', KEYS[1], head[2], head[1])
+            moved = moved + 1
+            clock = best_start
+            best.tag = best_start + 1 / best.weight
+        end
+    end
+end
+for _, lane in ipairs(lanes) do
+    if redis.call('EXISTS', lane.key) == 0 then
+        redis.call('SREM', KEYS[3], lane.name)
+        redis.call('HDEL', KEYS[4], lane.name)
+    else
+        redis.call('HSET', KEYS[4], lane.name, lane.tag)
+    end
+end
+redis.call('HSET', KEYS[4], '', clock)
+return moved
+"""
+
+
+def lane_for(tenant: str | None, priority: str | None) -> str | None:
+    """
+    The function returns the lane of a timer, None for the timers of the shared hot sorted set
+    """
+    if tenant is None and priority is None:
+        return None
+    return f"{tenant or DEFAULT_TENANT}:{priority or 'normal'}"
+
+
+def parse_weights(value: str) -> dict[str, float]:
+    """
+    The function parses comma separated name:weight pairs, like high:4,normal:2,low:1
+    :param value: weights of the setting
+    :type str
+
+    :rtype: dict[str, float]
+    :return: weight of every name
+    """
+    weights = {}
+    for pair in value.split(","):
+        if pair.strip():
+            name, _, weight = pair.strip().rpartition(":")
+            if not name or float(weight) <= 0:
+                raise ValueError(f"Invalid lane weight {pair!r}, expected name:weight with a weight above 0")
+            weights[name] = float(weight)
+    return weights
+
+
+def lane_weight(lane: str, priority_weights: dict[str, float], tenant_weights: dict[str, float]) -> float:
+    tenant, _, priority = lane.rpartition(":")
+    return tenant_weights.get(tenant, 1.0) * priority_weights.get(priority, 1.0)
+
+
+async def dispatch_lanes(pool: ArqRedis, backlog: int, priority_weights: dict[str, float],
+                         tenant_weights: dict[str, float], now_ms: int | None = None) -> int:
+    """
+    The function moves the due timers of the lanes to the hot sorted set, fairly, until its due backlog is full
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param backlog: number of due jobs kept in the hot sorted set
+    :type int
+    :param priority_weights: weight of every priority
+    :type dict[str, float]
+    :param tenant_weights: weight of the tenants, 1 for the others
+    :type dict[str, float]
+    :param now_ms: time up to which the timers are due, defaults to now
+    :type int | None
+
+    :rtype: int
+    :return: number of timers moved to the hot sorted set
+    """
+    lanes = await pool.smembers(LANES_KEY)
+    if not lanes:
+        return 0
+    args: list = [now_ms or timestamp_ms(), backlog, LANE_KEY_PREFIX]
+    for lane in lanes:
+        lane = lane.decode()
+        args += [lane, lane_weight(lane, priority_weights, tenant_weights)]
+    dispatch = pool.register_script(DISPATCH_LANES)
+    return await dispatch(keys=[QUEUE_NAME, DEADLINES_KEY, LANES_KEY, LANE_TAGS_KEY, LANE_TIMERS_KEY], args=args)
+
+
+async def run_dispatcher(pool: ArqRedis, interval: float, backlog: int, priority_weights: dict[str, float],
+                         tenant_weights: dict[str, float]) -> None:
+    """
+    The function dispatches the due timers of the lanes every `interval` seconds, it is safe to run it in many workers
+    """
+    while True:
+        try:
+            moved = await dispatch_lanes(pool, backlog, priority_weights, tenant_weights)
+            if moved:
+                metrics.LANE_DISPATCHED.inc(amount=moved)
+        except Exception as e:
+            logger.error("Error while dispatching the lanes: %s", e)
+        await asyncio.sleep(interval)
@@ -1,6 +1,13 @@
+import atexit
+import json
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
+import sys
+
+from ..config import settings
 
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
 if not os.path.exists(LOG_DIR):
@@ -46,7 +53,97 @@ logging_config = {
     }
 }
 
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats the records as one JSON object per line
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands the records off to the writer thread of a QueueListener through a bounded queue.
+
+    The record is put in the queue as is, its message is only formatted by the writer thread. When the queue is
+    full the record is dropped, or the caller waits for a free slot with `block`.
+    """
+    def __init__(self, log_queue: queue.Queue, block: bool = False) -> None:
+        super().__init__(log_queue)
+        self.block = block
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def enable_queue_logging(logger: logging.Logger, size: int, block: bool = False
+                         ) -> tuple[BoundedQueueHandler, logging.handlers.QueueListener]:
+    """
+    The function moves the handlers of the logger to a background writer thread
+    :param logger: logger whose handlers write the records, usually the root logger
+    :type logging.Logger
+    :param size: maximum number of records waiting for the writer thread
+    :type int
+    :param block: wait for a free slot instead of dropping the records when the queue is full
+    :type bool
+
+    :rtype: tuple[BoundedQueueHandler, QueueListener]
+    :return: handler now attached to the logger and started listener writing the records
+    """
+    handlers = list(logger.handlers)
+    log_queue: queue.Queue = queue.Queue(size)
+    handler = BoundedQueueHandler(log_queue, block)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for existing in handlers:
+        logger.removeHandler(existing)
+    logger.addHandler(handler)
+    listener.start()
+    return handler, listener
+
+
+def stop_queue_logging(handler: BoundedQueueHandler, listener: logging.handlers.QueueListener) -> None:
+    """
+    The function writes the records left in the queue and stops the writer thread
+    """
+    listener.stop()
+    if handler.dropped:
+        sys.stderr.write(f"{handler.dropped} log records were dropped, the log queue was full\n")
+
+
 logging.config.dictConfig(logging_config)
 
+if settings.LOG_FORMAT == "json":
+    for root_handler in logging.getLogger().handlers:
+        root_handler.setFormatter(JsonFormatter())
+
+if settings.LOG_ASYNC_ENABLED:
+    queue_handler, queue_listener = enable_queue_logging(
+        logging.getLogger(), settings.LOG_QUEUE_SIZE, settings.LOG_QUEUE_POLICY == "block"
+    )
+    atexit.register(stop_queue_logging, queue_handler, queue_listener)
+
+
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Metrics of the API and worker hot paths in the Prometheus text format.
+
+The metrics are plain counters updated from the event loop of the process, recording a value is a dict update and
+takes no lock. Every process exposes its own values on its own port: the worker on ``WORKER_METRICS_PORT``, the
+processes of the API on the first free port from ``API_METRICS_PORT``. The ``/metrics`` route of the API answers with
+the values of the process which got the request, it is only meant for an API running one process.
+"""
+import asyncio
+from bisect import bisect_left
+from typing import Awaitable, Callable, Iterable
+
+from arq.connections import ArqRedis
+
+from .logger import get_logger
+from .queue import QUEUE_NAME
+from .wheel import DEADLINES_KEY
+
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300)
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 registry: list | None = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        (REGISTRY if registry is None else registry).append(self)
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: tuple = LATENCY_BUCKETS, registry: list | None = None) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = buckets
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._observations: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        observations = self._observations.get(labelvalues)
+        if observations is None:
+            observations = self._observations[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        observations[bisect_left(self.buckets, value)] += 1
+        observations[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, observations in self._observations.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), observations):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {observations[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: list[Metric] = []
+
+
+def render_metrics(registry: list[Metric] | None = None) -> str:
+    """
+    The function renders the metrics of the process in the Prometheus text format
+    :param registry: metrics to render, defaults to all the metrics of the process
+    :type list[Metric] | None
+
+    :rtype: str
+    :return: text exposition of the metrics
+    """
+    metrics = REGISTRY if registry is None else registry
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+# -------- api --------
+ENQUEUE_SECONDS = Histogram(
+    "delayed_task_enqueue_seconds", "Time to write new timers to the queue", ["path"]
+)
+TIMERS_CREATED = Counter(
+    "delayed_task_timers_created_total", "Timers handled by the create API's", ["path", "outcome"]
+)
+QUEUE_DEPTH = Gauge(
+    "delayed_task_queue_depth", "Pending timers of a shard, in the hot sorted set or parked in the timing wheel",
+    ["shard", "set"]
+)
+STATUS_CACHE_LOOKUPS = Counter(
+    "delayed_task_status_cache_lookups_total", "Lookups of GET /timer/{id} in the status cache", ["outcome"]
+)
+STATUS_CACHE_INVALIDATIONS = Counter(
+    "delayed_task_status_cache_invalidations_total", "Ids dropped from the status cache by invalidations"
+)
+
+# -------- worker --------
+SCHEDULING_LAG_SECONDS = Histogram(
+    "delayed_task_scheduling_lag_seconds", "Actual start time of a job minus its deadline", buckets=LAG_BUCKETS
+)
+CALLBACK_SECONDS = Histogram(
+    "delayed_task_callback_seconds", "Duration of the callback request of a job, retries included", ["outcome"],
+    buckets=LATENCY_BUCKETS + (60, 120)
+)
+CALLBACK_RETRIES = Counter(
+    "delayed_task_callback_retries_total", "Retries of the callback requests", ["reason"]
+)
+CALLBACK_DEFERRALS = Counter(
+    "delayed_task_callback_deferrals_total", "Jobs deferred back into the queue by the limits of their host", ["reason"]
+)
+DEAD_LETTERS = Counter(
+    "delayed_task_dead_letters_total", "Failed timers moved to the dead-letter store", ["reason"]
+)
+CIRCUIT_OPENED = Counter(
+    "delayed_task_circuit_opened_total", "Circuits of callback hosts opened by consecutive failures"
+)
+LANE_DISPATCHED = Counter(
+    "delayed_task_lane_dispatched_total", "Due timers moved from the tenant and priority lanes to the hot sorted set"
+)
+
+
+async def collect_queue_depth(pools: list[ArqRedis]) -> None:
+    """
+    The function reads the number of pending timers of every shard, it runs at scrape time of the API only
+    :param pools: redis pools of the shards, in the order of the shard indexes
+    :type list[ArqRedis]
+    """
+    for shard, pool in enumerate(pools):
+        async with pool.pipeline(transaction=False) as pipe:
+            pipe.zcard(QUEUE_NAME)
+            pipe.hlen(DEADLINES_KEY)
+            hot, parked = await pipe.execute()
+        QUEUE_DEPTH.set(hot, str(shard), "hot")
+        QUEUE_DEPTH.set(parked, str(shard), "parked")
+
+
+_exporter: asyncio.AbstractServer | None = None
+# refreshes the gauges read at scrape time
+_collect: Callable[[], Awaitable[None]] | None = None
+
+
+async def _serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if request_line.split(b" ")[1:2] == [b"/metrics"]:
+            if _collect is not None:
+                await _collect()
+            body = render_metrics().encode()
+            status = b"200 OK"
+        else:
+            body = b"Not Found\n"
+            status = b"404 Not Found"
+        writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     + b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_exporter(port: int, ports: int = 1, collect: Callable[[], Awaitable[None]] | None = None) -> int:
+    """
+    The function serves the metrics of the process on http://0.0.0.0:<port>/metrics, once per process as the
+    workers of all the shards served by the process share the metrics. The processes started by gunicorn have no
+    index, every one of them takes the first free port of the `ports` ports from `port`.
+    :param port: port of the exporter, or first port tried
+    :type int
+    :param ports: number of ports tried
+    :type int
+    :param collect: coroutine refreshing the gauges before every scrape
+    :type Callable[[], Awaitable[None]] | None
+
+    :rtype: int
+    :return: port of the exporter
+    """
+    global _exporter, _collect
+    if _exporter is None:
+        for candidate in range(port, port + ports):
+            try:
+                _exporter = await asyncio.start_server(_serve_metrics, "0.0.0.0", candidate)
+                break
+            except OSError:
+                if candidate == port + ports - 1:
+                    raise
+        _collect = collect
+        logger.info("Serving the metrics of the process on port %d", _exporter.sockets[0].getsockname()[1])
+    return _exporter.sockets[0].getsockname()[1]
+
+
+async def stop_exporter() -> None:
+    global _exporter, _collect
+    if _exporter is not None:
+        _exporter.close()
+        await _exporter.wait_closed()
+        _exporter = None
+        _collect = None
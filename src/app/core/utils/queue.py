@@ -1,3 +1,77 @@
-from arq.connections import ArqRedis
+import zlib
+from typing import TYPE_CHECKING
 
-pool: ArqRedis | None = None
\ No newline at end of file
+from arq.connections import ArqRedis, RedisSettings
+
+if TYPE_CHECKING:
+    from .embedded import EmbeddedScheduler
+
+QUEUE_NAME = "delayed_task"
+
+pool: ArqRedis | None = None
+shards: list[ArqRedis] = []
+# set instead of the pools when QUEUE_BACKEND is embedded
+embedded: "EmbeddedScheduler | None" = None
+
+
+def parse_shards(endpoints: str, host: str, port: int) -> list[RedisSettings]:
+    """
+    The function parses the redis endpoints of the shards
+    :param endpoints: comma separated host:port or redis:// urls, empty for a single redis
+    :type str
+    :param host: host of the single redis
+    :type str
+    :param port: port of the single redis
+    :type int
+
+    :rtype: list[RedisSettings]
+    :return: settings of every shard, in the order of the shard indexes
+    """
+    if not endpoints.strip():
+        return [RedisSettings(host=host, port=int(port))]
+    shard_settings = []
+    for endpoint in endpoints.split(","):
+        endpoint = endpoint.strip()
+        if endpoint.startswith(("redis://", "rediss://")):
+            shard_settings.append(RedisSettings.from_dsn(endpoint))
+        else:
+            shard_host, _, shard_port = endpoint.rpartition(":")
+            shard_settings.append(RedisSettings(host=shard_host, port=int(shard_port)))
+    return shard_settings
+
+
+def shard_index(job_id: str, count: int) -> int:
+    """
+    The function hashes a job id to its shard, the hash is stable across processes and restarts
+    """
+    return zlib.crc32(job_id.encode()) % count
+
+
+def shard_pool(index: int) -> ArqRedis:
+    return shards[index] if shards else pool
+
+
+def pool_for(job_id: str) -> ArqRedis:
+    """
+    The function returns the redis pool of the shard holding the job
+    """
+    if len(shards) <= 1:
+        return pool
+    return shards[shard_index(job_id, len(shards))]
+
+
+def group_by_shard(job_ids: list[str]) -> dict[int, list[int]]:
+    """
+    The function groups the positions of the job ids by shard
+    :param job_ids: ids of the jobs
+    :type list[str]
+
+    :rtype: dict[int, list[int]]
+    :return: positions in `job_ids` of the jobs of every shard
+    """
+    if len(shards) <= 1:
+        return {0: list(range(len(job_ids)))} if job_ids else {}
+    groups: dict[int, list[int]] = {}
+    for position, job_id in enumerate(job_ids):
+        groups.setdefault(shard_index(job_id, len(shards)), []).append(position)
+    return groups
@@ -0,0 +1,144 @@
+"""
+Schedules of the recurring timers.
+
+A schedule is kept with the jobs of a recurring timer as a string, ``every:<seconds>`` for a fixed interval or
+``cron:<expression>`` for a 5 field cron expression (minute, hour, day of month, month, day of week) in UTC. The
+fields accept ``*``, values, ranges and lists, with an optional ``/step``; day of week 0 and 7 are sunday.
+
+The next deadline is computed from the deadline of the occurrence which fired, not from the time it fired, so the
+firing lag does not accumulate. Occurrences missed while no worker was running are skipped.
+"""
+import datetime
+from dataclasses import dataclass
+from functools import lru_cache
+
+INTERVAL_PREFIX = "every:"
+CRON_PREFIX = "cron:"
+# minute, hour, day of month, month, day of week
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# a schedule without occurrence in this number of days never fires, 4 years cover the 29th of february
+MAX_SEARCH_DAYS = 366 * 4 + 1
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    # cron matches the day of month or the day of week when both are restricted
+    any_day: bool
+
+    def matches_day(self, moment: datetime.datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        return (day or weekday) if self.any_day else (day and weekday)
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """
+        The function returns the first occurrence strictly after the moment
+        :param moment: aware datetime in UTC
+        :type datetime.datetime
+
+        :rtype: datetime.datetime
+        :return: next occurrence, on a whole minute
+        """
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = candidate + datetime.timedelta(days=MAX_SEARCH_DAYS)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self.matches_day(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + datetime.timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError("The cron expression has no occurrence")
+
+
+def parse_cron_field(field: str, low: int, high: int) -> frozenset[int]:
+    """
+    The function parses one field of a cron expression
+    :param field: values, ranges and steps separated by commas
+    :type str
+    :param low: lowest value of the field
+    :type int
+    :param high: highest value of the field
+    :type int
+
+    :rtype: frozenset[int]
+    :return: values matched by the field
+    """
+    values: set[int] = set()
+    for part in field.split(","):
+        part, has_step, step = part.partition("/")
+        step = int(step) if has_step else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if has_step else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid cron field {field!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@lru_cache(maxsize=1024)
+def parse_cron(expression: str) -> CronSchedule:
+    """
+    The function parses a 5 field cron expression, the schedules of the timers are parsed on every fire so the
+    results are cached
+    :param expression: minute hour day-of-month month day-of-week
+    :type str
+
+    :rtype: CronSchedule
+    :return: parsed schedule
+    """
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError("A cron expression has 5 fields: minute hour day-of-month month day-of-week")
+    minutes, hours, days, months, weekdays = (
+        parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)
+    )
+    weekdays = frozenset(weekday % 7 for weekday in weekdays)
+    return CronSchedule(minutes, hours, days, months, weekdays, any_day=fields[2] != "*" and fields[4] != "*")
+
+
+def interval_schedule(seconds: int) -> str:
+    return f"{INTERVAL_PREFIX}{seconds}"
+
+
+def cron_schedule(expression: str) -> str:
+    return f"{CRON_PREFIX}{' '.join(expression.split())}"
+
+
+def next_deadline(schedule: str, previous_ms: int, now_ms: int) -> int:
+    """
+    The function computes the deadline of the next occurrence of a recurring timer
+    :param schedule: every:<seconds> or cron:<expression>
+    :type str
+    :param previous_ms: deadline of the occurrence which fired, or the creation time for the first occurrence
+    :type int
+    :param now_ms: current time in ms
+    :type int
+
+    :rtype: int
+    :return: first deadline of the schedule after the previous deadline and after now, in ms
+    """
+    if schedule.startswith(INTERVAL_PREFIX):
+        interval_ms = int(schedule[len(INTERVAL_PREFIX):]) * 1000
+        if interval_ms <= 0:
+            raise ValueError("The interval of a recurring timer should be greater than 0")
+        missed = max(0, now_ms - previous_ms) // interval_ms
+        return previous_ms + (missed + 1) * interval_ms
+    if schedule.startswith(CRON_PREFIX):
+        moment = datetime.datetime.fromtimestamp(max(previous_ms, now_ms) / 1000, tz=datetime.timezone.utc)
+        return int(parse_cron(schedule[len(CRON_PREFIX):]).next_after(moment).timestamp() * 1000)
+    raise ValueError(f"Unknown schedule {schedule!r}")
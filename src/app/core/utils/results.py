@@ -0,0 +1,140 @@
+"""
+Store of the outcome of the fired callbacks.
+
+Every callback result is packed in 24 bytes (status code, latency, attempts, fire time and a truncated hash of the
+response body) and kept in the ``delayed_task:results`` hash of the shard of the timer, indexed by fire time in the
+``delayed_task:results:index`` sorted set. Every write evicts the results older than RESULT_TTL and the oldest
+results beyond RESULT_MAX_ENTRIES, so the memory of the store is bounded whatever the traffic.
+"""
+import asyncio
+import hashlib
+import struct
+from dataclasses import asdict, dataclass
+
+from arq.connections import ArqRedis
+
+from . import queue
+from .queue import QUEUE_NAME
+from .timers import ALIAS_KEY_PREFIX
+
+RESULTS_KEY = f"{QUEUE_NAME}:results"
+RESULTS_INDEX_KEY = f"{QUEUE_NAME}:results:index"
+RESULT_FORMAT = struct.Struct(">HIHQ8s")
+# expired results evicted per write, the backlog of a burst is evicted by the next writes
+EVICTION_BATCH = 100
+
+# KEYS: results, index  ARGV: id, result, fire time ms, ttl ms, max entries, eviction batch
+STORE_RESULT = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+local batch = tonumber(ARGV[6])
+local evicted = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', tonumber(ARGV[3]) - tonumber(ARGV[4]), 'LIMIT', 0, batch)
+local excess = math.min(redis.call('ZCARD', KEYS[2]) - #evicted - tonumber(ARGV[5]), batch)
+if excess > 0 then
+    for _, id in ipairs(redis.call('ZRANGE', KEYS[2], #evicted, #evicted + excess - 1)) do
+        table.insert(evicted, id)
+    end
+end
+if #evicted > 0 then
+    redis.call('HDEL', KEYS[1], unpack(evicted))
+    redis.call('ZREM', KEYS[2], unpack(evicted))
+end
+return #evicted
+"""
+
+
+@dataclass(frozen=True)
+class CallbackResult:
+    # 0 when no response was received
+    status_code: int
+    latency_ms: int
+    attempts: int
+    fired_at: int
+    body_hash: str
+
+    def pack(self) -> bytes:
+        return RESULT_FORMAT.pack(self.status_code, min(self.latency_ms, 0xFFFFFFFF), min(self.attempts, 0xFFFF),
+                                  self.fired_at, bytes.fromhex(self.body_hash))
+
+    @classmethod
+    def unpack(cls, payload: bytes) -> "CallbackResult":
+        status_code, latency_ms, attempts, fired_at, body_hash = RESULT_FORMAT.unpack(payload)
+        return cls(status_code, latency_ms, attempts, fired_at, body_hash.hex())
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def body_hash(body: bytes) -> str:
+    """
+    The function returns the 8 bytes blake2b hash of a response body, enough to tell two responses apart
+    """
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+async def store_result(pool: ArqRedis, result_id: str, result: CallbackResult, ttl_ms: int, max_entries: int) -> None:
+    """
+    The function stores the result of a callback and evicts the expired and the oldest results in the same script
+    :param pool: redis pool of the shard of the timer
+    :type ArqRedis
+    :param result_id: id of the timer, or of the job of coalesced timers
+    :type str
+    :param result: outcome of the callback
+    :type CallbackResult
+    :param ttl_ms: time the results are kept
+    :type int
+    :param max_entries: number of results kept on the shard
+    :type int
+    """
+    store = pool.register_script(STORE_RESULT)
+    await store(keys=[RESULTS_KEY, RESULTS_INDEX_KEY],
+                args=[result_id, result.pack(), result.fired_at, ttl_ms, max_entries, EVICTION_BATCH])
+
+
+async def fetch_results(pool: ArqRedis, timer_ids: list[str]) -> list[CallbackResult | None]:
+    """
+    The function reads the callback results of many timers, in one round trip unless some of them are coalesced
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param timer_ids: ids of the timers
+    :type list[str]
+
+    :rtype: list[CallbackResult | None]
+    :return: result of every timer, None for the timers which have not fired or whose result was evicted
+    """
+    if not timer_ids:
+        return []
+    async with pool.pipeline(transaction=False) as pipe:
+        pipe.hmget(RESULTS_KEY, timer_ids)
+        pipe.mget([ALIAS_KEY_PREFIX + timer_id for timer_id in timer_ids])
+        payloads, aliases = await pipe.execute()
+    # coalesced timers share the result of the job of their group
+    aliased = [(position, alias.decode()) for position, (payload, alias) in enumerate(zip(payloads, aliases))
+               if payload is None and alias is not None]
+    if aliased:
+        for (position, _), payload in zip(aliased, await pool.hmget(RESULTS_KEY, [alias for _, alias in aliased])):
+            payloads[position] = payload
+    return [None if payload is None else CallbackResult.unpack(payload) for payload in payloads]
+
+
+async def fetch_timer_results(timer_ids: list[str]) -> list[CallbackResult | None]:
+    """
+    The function reads the callback results of many timers from the shards of the queue, the shards are read
+    concurrently
+    :param timer_ids: ids of the timers
+    :type list[str]
+
+    :rtype: list[CallbackResult | None]
+    :return: result of every timer, None for the timers without result
+    """
+    if queue.embedded is not None:
+        return queue.embedded.results(timer_ids)
+    results: list[CallbackResult | None] = [None] * len(timer_ids)
+
+    async def fetch_shard(shard: int, positions: list[int]) -> None:
+        shard_results = await fetch_results(queue.shard_pool(shard), [timer_ids[i] for i in positions])
+        for position, result in zip(positions, shard_results):
+            results[position] = result
+
+    await asyncio.gather(*(fetch_shard(shard, positions) for shard, positions in queue.group_by_shard(timer_ids).items()))
+    return results
@@ -0,0 +1,79 @@
+"""
+Compact serialization of the request_url jobs.
+
+A pickled request_url job spends most of its ~150 bytes on the names of the dict keys and the function. The compact
+format only stores a tag byte, the job try, the enqueue time and the url:
+
+    0x01 | job try (2 bytes) | enqueue time in ms (8 bytes) | url (utf-8)
+
+Any other payload (other functions, kwargs, job results) is pickled as before. The deserializer reads both formats,
+so the jobs queued before the switch keep running, and the switch back to pickle is always possible.
+"""
+import pickle
+import struct
+from typing import Any, Callable
+
+COMPACT_TAG = b"\x01"
+COMPACT_HEADER = struct.Struct(">HQ")
+COMPACT_FUNCTION = "request_url"
+MAX_JOB_TRY = 0xFFFF
+
+
+def serialize_compact(data: dict[str, Any]) -> bytes:
+    """
+    The function serializes a job, request_url jobs in the compact format and anything else with pickle
+    :param data: job or job result built by arq
+    :type dict[str, Any]
+
+    :rtype: bytes
+    :return: serialized payload
+    """
+    args = data.get("a")
+    job_try = data.get("t")
+    if (
+        data.keys() == {"t", "f", "a", "k", "et"}
+        and data["f"] == COMPACT_FUNCTION
+        and not data["k"]
+        and type(args) is tuple and len(args) == 1 and type(args[0]) is str
+        and type(job_try) is int and 0 <= job_try <= MAX_JOB_TRY
+    ):
+        return COMPACT_TAG + COMPACT_HEADER.pack(job_try, data["et"]) + args[0].encode()
+    return pickle.dumps(data)
+
+
+def deserialize_compact(payload: bytes) -> dict[str, Any]:
+    """
+    The function deserializes a job in the compact format or pickled
+    :param payload: serialized job or job result
+    :type bytes
+
+    :rtype: dict[str, Any]
+    :return: job or job result in the format of arq
+    """
+    if payload[:1] == COMPACT_TAG:
+        job_try, enqueue_time_ms = COMPACT_HEADER.unpack_from(payload, 1)
+        url = payload[1 + COMPACT_HEADER.size:].decode()
+        return {"t": job_try, "f": COMPACT_FUNCTION, "a": (url,), "k": {}, "et": enqueue_time_ms}
+    return pickle.loads(payload)
+
+
+SERIALIZERS: dict[str, tuple[Callable[[dict], bytes], Callable[[bytes], dict]]] = {
+    # pickled payloads are read by both, only the written format differs
+    "pickle": (pickle.dumps, deserialize_compact),
+    "compact": (serialize_compact, deserialize_compact),
+}
+
+
+def job_serializers(name: str) -> tuple[Callable[[dict], bytes], Callable[[bytes], dict]]:
+    """
+    The function returns the serializer and deserializer of the jobs
+    :param name: JOB_SERIALIZER setting, compact or pickle
+    :type str
+
+    :rtype: tuple[Callable, Callable]
+    :return: job_serializer and job_deserializer for arq
+    """
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JOB_SERIALIZER {name!r}, expected one of {', '.join(SERIALIZERS)}") from None
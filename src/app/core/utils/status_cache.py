@@ -0,0 +1,175 @@
+"""
+In-process cache of the answers of GET /api/v1/timer/{id}.
+
+A pending timer keeps its deadline until it fires, is cancelled or is rescheduled, and a completed timer does not
+change anymore, so both are cached for STATUS_CACHE_TTL seconds in a LRU of STATUS_CACHE_SIZE entries. A pending
+entry is only served while its deadline is in the future, the state of a due timer is read from Redis.
+
+A firing timer needs no invalidation, its deadline is in the past. The API processes subscribe to the
+``delayed_task:invalidations`` channel of every shard, where the ids of the timers cancelled or rescheduled by any of
+them are published, and drop them from their cache. The cache is cleared whenever a subscription is (re)established,
+invalidations may have been missed in between.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import suppress
+
+from arq.connections import ArqRedis
+
+from . import metrics, queue
+from .logger import get_logger
+from .queue import QUEUE_NAME
+
+logger = get_logger(__name__)
+
+INVALIDATION_CHANNEL = f"{QUEUE_NAME}:invalidations"
+RECONNECT_DELAY = 1.0
+
+
+class StatusCache:
+    """
+    LRU cache of the deadline and callback result of the timers, with a time to live
+    """
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # timer id -> (deadline ms or None once the job is gone, result, id of the job, expiry)
+        self._entries: OrderedDict[str, tuple[float | None, dict | None, str, float]] = OrderedDict()
+        # job id -> ids of the coalesced timers cached with it
+        self._aliases: dict[str, set[str]] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, timer_id: str, now_ms: float) -> tuple[float | None, dict | None] | None:
+        """
+        The function returns the cached state of a timer
+        :param timer_id: id of the timer
+        :type str
+        :param now_ms: current time in ms
+        :type float
+
+        :rtype: tuple[float | None, dict | None] | None
+        :return: deadline and result of the timer, None if the timer is not cached or is due
+        """
+        entry = self._entries.get(timer_id)
+        if entry is not None:
+            deadline, result, _, expires_at = entry
+            if expires_at > time.monotonic() and (deadline is None or deadline > now_ms):
+                self._entries.move_to_end(timer_id)
+                metrics.STATUS_CACHE_LOOKUPS.inc("hit")
+                return deadline, result
+            self._remove(timer_id)
+        metrics.STATUS_CACHE_LOOKUPS.inc("miss")
+        return None
+
+    def put(self, timer_id: str, deadline: float | None, result: dict | None, job_id: str | None = None) -> None:
+        """
+        The function caches the state of a timer
+        :param timer_id: id of the timer
+        :type str
+        :param deadline: deadline of a pending timer in ms, None for a timer whose job is gone
+        :type float | None
+        :param result: result of the callback of the timer
+        :type dict | None
+        :param job_id: id of the job of a coalesced or recurring timer, fired under its own id
+        :type str | None
+        """
+        self._remove(timer_id)
+        job_id = job_id or timer_id
+        self._entries[timer_id] = (deadline, result, job_id, time.monotonic() + self.ttl)
+        if job_id != timer_id:
+            self._aliases.setdefault(job_id, set()).add(timer_id)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, ids: list[str]) -> None:
+        """
+        The function drops timers, and the coalesced timers of jobs, from the cache
+        :param ids: ids of timers or jobs
+        :type list[str]
+        """
+        for entry_id in ids:
+            self._remove(entry_id)
+            for timer_id in self._aliases.pop(entry_id, ()):
+                self._remove(timer_id)
+        metrics.STATUS_CACHE_INVALIDATIONS.inc(amount=len(ids))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._aliases.clear()
+
+    def _remove(self, timer_id: str) -> None:
+        entry = self._entries.pop(timer_id, None)
+        if entry is not None and entry[2] != timer_id:
+            aliases = self._aliases.get(entry[2])
+            if aliases is not None:
+                aliases.discard(timer_id)
+                if not aliases:
+                    del self._aliases[entry[2]]
+
+    def start(self, pools: list[ArqRedis]) -> None:
+        self._tasks = [asyncio.create_task(self.listen(pool)) for pool in pools]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    async def listen(self, pool: ArqRedis) -> None:
+        """
+        The function applies the invalidations published on the shard, until it is cancelled
+        :param pool: redis pool of a shard
+        :type ArqRedis
+        """
+        while True:
+            pubsub = pool.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.invalidate(message["data"].decode().split())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error while reading the invalidations of the status cache: %s", e)
+                self.clear()
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+
+async def publish_invalidation(pool: ArqRedis, ids: list[str]) -> None:
+    """
+    The function publishes the ids of timers or jobs whose state changed to the API processes
+    :param pool: redis pool of the shard of the timers
+    :type ArqRedis
+    :param ids: ids of the timers or jobs
+    :type list[str]
+    """
+    if ids:
+        await pool.publish(INVALIDATION_CHANNEL, " ".join(ids))
+
+
+async def invalidate_timers(timer_ids: list[str]) -> None:
+    """
+    The function drops the timers from the cache of this process and of the other API processes
+    :param timer_ids: ids of the timers
+    :type list[str]
+    """
+    if cache is None:
+        return
+    cache.invalidate(timer_ids)
+    await asyncio.gather(*(
+        publish_invalidation(queue.shard_pool(shard), [timer_ids[i] for i in positions])
+        for shard, positions in queue.group_by_shard(timer_ids).items()
+    ))
+
+
+cache: StatusCache | None = None
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from contextlib import suppress
+
+from arq.connections import ArqRedis
+from arq.constants import in_progress_key_prefix, job_key_prefix, result_key_prefix
+from arq.jobs import deserialize_result
+
+from . import queue
+from .logger import get_logger
+from .timers import fetch_timer_scores, resolve_aliases, time_left_seconds
+
+logger = get_logger(__name__)
+
+# events which end the stream of a timer
+FINAL_EVENTS = frozenset({"completed", "not_found"})
+
+
+class TimerTicker:
+    """
+    Shared clock of the streamed timers of one API process.
+
+    Every tick reads the deadlines of all the subscribed timers with one Redis round trip per shard, whatever the
+    number of clients, and pushes ``time_left``, ``fired`` and ``completed`` events to the subscribers. The ticker idles
+    while nobody is subscribed.
+    """
+    def __init__(self, interval: float, buffer_size: int = 100) -> None:
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._fired: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def subscribe(self, timer_ids: list[str]) -> asyncio.Queue:
+        """
+        The function registers a subscriber for the events of the timers
+        :param timer_ids: ids of the timers to stream
+        :type list[str]
+
+        :rtype: asyncio.Queue
+        :return: queue receiving the (event, data) tuples of the timers
+        """
+        events: asyncio.Queue = asyncio.Queue(self.buffer_size)
+        for timer_id in timer_ids:
+            self._subscribers.setdefault(timer_id, set()).add(events)
+        self._wakeup.set()
+        return events
+
+    def unsubscribe(self, events: asyncio.Queue, timer_ids: list[str]) -> None:
+        for timer_id in timer_ids:
+            subscribers = self._subscribers.get(timer_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(events)
+            if not subscribers:
+                del self._subscribers[timer_id]
+                self._fired.discard(timer_id)
+
+    async def run(self) -> None:
+        while True:
+            if not self._subscribers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error("Error while reading the streamed timers: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def tick(self) -> None:
+        timer_ids = list(self._subscribers)
+        scores = await fetch_timer_scores(timer_ids)
+        current_time = time.time() * 1000
+        dequeued = []
+        for timer_id, score in zip(timer_ids, scores):
+            if score is None:
+                dequeued.append(timer_id)
+            else:
+                self._publish(timer_id, "time_left", {"id": timer_id, "time_left": time_left_seconds(score, current_time)})
+        if queue.embedded is not None:
+            self._resolve_embedded(dequeued)
+            return
+        for shard, positions in queue.group_by_shard(dequeued).items():
+            await self._resolve_dequeued(queue.shard_pool(shard), [dequeued[i] for i in positions])
+
+    async def _resolve_dequeued(self, pool: ArqRedis, timer_ids: list[str]) -> None:
+        """
+        Timers out of the queue are running, completed, or unknown, a coalesced timer has the state of the job of
+        its group
+        """
+        job_ids = [alias or timer_id for timer_id, alias in zip(timer_ids, await resolve_aliases(pool, timer_ids))]
+        async with pool.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.get(result_key_prefix + job_id)
+                pipe.exists(in_progress_key_prefix + job_id, job_key_prefix + job_id)
+            replies = await pipe.execute()
+
+        for timer_id, result, exists in zip(timer_ids, replies[::2], replies[1::2]):
+            if result is not None:
+                job_result = deserialize_result(result, deserializer=pool.job_deserializer)
+                self._publish_fired(timer_id)
+                self._publish(timer_id, "completed", {
+                    "id": timer_id, "success": job_result.success, "result": str(job_result.result)
+                })
+            elif exists:
+                self._publish_fired(timer_id)
+            else:
+                self._publish(timer_id, "not_found", {"id": timer_id})
+
+    def _resolve_embedded(self, timer_ids: list[str]) -> None:
+        for timer_id, result in zip(timer_ids, queue.embedded.results(timer_ids)):
+            state = queue.embedded.state(timer_id)
+            if state == "completed":
+                self._publish_fired(timer_id)
+                self._publish(timer_id, "completed", {
+                    "id": timer_id, "success": 0 < result.status_code < 400, "result": str(result.as_dict()),
+                })
+            elif state == "running":
+                self._publish_fired(timer_id)
+            else:
+                self._publish(timer_id, "not_found", {"id": timer_id})
+
+    def _publish_fired(self, timer_id: str) -> None:
+        if timer_id not in self._fired:
+            self._fired.add(timer_id)
+            self._publish(timer_id, "fired", {"id": timer_id, "time_left": 0})
+
+    def _publish(self, timer_id: str, event: str, data: dict) -> None:
+        for events in self._subscribers.get(timer_id, ()):
+            if events.full():
+                if event not in FINAL_EVENTS:
+                    # a slow client misses countdown updates, never the end of its timers
+                    continue
+                events.get_nowait()
+            events.put_nowait((event, data))
+
+
+ticker: TimerTicker | None = None
@@ -0,0 +1,601 @@
+import asyncio
+import hashlib
+import secrets
+from uuid import uuid4
+
+from arq.connections import ArqRedis
+from arq.constants import in_progress_key_prefix, job_key_prefix, retry_key_prefix
+from arq.jobs import serialize_job
+from arq.utils import timestamp_ms
+from redis.exceptions import ResponseError
+
+from ..config import settings
+from . import queue
+from .logger import get_logger
+from .lanes import LANE_KEY_PREFIX, LANE_TIMERS_KEY, LANES_KEY
+from .queue import QUEUE_NAME
+from .recurrence import next_deadline
+from .wheel import DEADLINES_KEY, WHEEL_KEY, bucket_for
+
+logger = get_logger(__name__)
+
+REQUEST_URL = "request_url"
+REQUEST_URL_RECURRING = "request_url_recurring"
+
+# coalesced timers: every caller gets an alias pointing to the job of its group, which counts its aliases
+COALESCE_KEY_PREFIX = f"{QUEUE_NAME}:coalesce:"
+ALIAS_KEY_PREFIX = f"{QUEUE_NAME}:alias:"
+MEMBERS_KEY_PREFIX = f"{QUEUE_NAME}:members:"
+# recurring timers: the id of the timer is an alias of the job of its next occurrence, the schedules are in a hash
+RECURRING_KEY = f"{QUEUE_NAME}:recurring"
+# idempotency keys of the created timers: key of the producer -> id of the job
+IDEMPOTENCY_KEY_PREFIX = f"{QUEUE_NAME}:idempotency:"
+
+# outcomes of the cancel and reschedule scripts
+UPDATED = 1
+NOT_FOUND = 0
+RUNNING = -1
+FIRED = -2
+SHARED = -3
+RECURRING = -4
+
+# KEYS: queue, group, alias  ARGV: new job id, deadline ms, job, ttl ms, job prefix, members prefix, in progress prefix
+# the job of the group is joined while it is queued and not running yet
+COALESCE_JOB = """
+local job = redis.call('GET', KEYS[2])
+if not job or not redis.call('ZSCORE', KEYS[1], job) or redis.call('EXISTS', ARGV[7] .. job) == 1 then
+    job = ARGV[1]
+    redis.call('PSETEX', ARGV[5] .. job, ARGV[4], ARGV[3])
+    redis.call('ZADD', KEYS[1], ARGV[2], job)
+    redis.call('SET', KEYS[2], job, 'PX', ARGV[4])
+end
+redis.call('SET', KEYS[3], job, 'PX', ARGV[4])
+redis.call('INCR', ARGV[6] .. job)
+redis.call('PEXPIRE', ARGV[6] .. job, ARGV[4])
+return {job, redis.call('ZSCORE', KEYS[1], job)}
+"""
+
+# KEYS: queue, deadlines, job, in progress, retry, alias, recurring, lane timers  ARGV: job id, job prefix,
+# in progress prefix, retry prefix, members prefix
+CANCEL_JOB = """
+local job = redis.call('GET', KEYS[6])
+if job then
+    if redis.call('EXISTS', ARGV[3] .. job) == 1 then
+        return -1
+    end
+    if not redis.call('ZSCORE', KEYS[1], job) then
+        return -2
+    end
+    redis.call('DEL', KEYS[6])
+    redis.call('HDEL', KEYS[7], ARGV[1])
+    if redis.call('DECR', ARGV[5] .. job) <= 0 then
+        redis.call('ZREM', KEYS[1], job)
+        redis.call('DEL', ARGV[2] .. job, ARGV[4] .. job, ARGV[5] .. job)
+    end
+    return 1
+end
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    return -1
+end
+local queued = redis.call('ZREM', KEYS[1], ARGV[1]) + redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[8], ARGV[1])
+if queued == 0 then
+    return redis.call('EXISTS', KEYS[3]) == 1 and -2 or 0
+end
+redis.call('DEL', KEYS[3], KEYS[5])
+return 1
+"""
+
+# KEYS: idempotency, job, queue, deadlines, lanes, lane, lane timers  ARGV: job id, deadline ms, job, ttl ms of the job,
+# ttl ms of the key, lane or ''
+# a retry gets the job created by the first request, with its current deadline, nil once it is not pending anymore
+IDEMPOTENT_JOB = """
+local job = redis.call('GET', KEYS[1])
+if job then
+    return {job, redis.call('ZSCORE', KEYS[3], job) or redis.call('HGET', KEYS[4], job), 0}
+end
+redis.call('PSETEX', KEYS[2], ARGV[4], ARGV[3])
+if ARGV[6] == '' then
+    redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+else
+    redis.call('ZADD', KEYS[6], ARGV[2], ARGV[1])
+    redis.call('HSET', KEYS[4], ARGV[1], ARGV[2])
+    redis.call('SADD', KEYS[5], ARGV[6])
+    redis.call('HSET', KEYS[7], ARGV[1], ARGV[6])
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[5])
+return {ARGV[1], ARGV[2], 1}
+"""
+
+# KEYS: queue, deadlines, job, in progress, alias, recurring, lane timers  ARGV: job id, new deadline ms, now ms,
+# ttl ms of the job, lane prefix
+# a timer parked in a lane is moved within its lane, a timer parked in the timing wheel goes to the hot sorted set
+RESCHEDULE_JOB = """
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    return redis.call('HEXISTS', KEYS[6], ARGV[1]) == 1 and -4 or -3
+end
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    return -1
+end
+local deadline = redis.call('ZSCORE', KEYS[1], ARGV[1]) or redis.call('HGET', KEYS[2], ARGV[1])
+if not deadline then
+    return redis.call('EXISTS', KEYS[3]) == 1 and -2 or 0
+end
+if tonumber(deadline) <= tonumber(ARGV[3]) then
+    return -2
+end
+local lane = redis.call('HGET', KEYS[7], ARGV[1])
+if lane then
+    redis.call('ZADD', ARGV[5] .. lane, ARGV[2], ARGV[1])
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+else
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+end
+redis.call('PEXPIRE', KEYS[3], ARGV[4])
+return 1
+"""
+
+# KEYS: queue, alias, recurring, next job  ARGV: timer id, job id, next job id, next deadline ms, next job, ttl ms
+# the next occurrence is queued once, by the job the timer points to, and not after the timer is cancelled
+NEXT_OCCURRENCE = """
+if redis.call('GET', KEYS[2]) ~= ARGV[2] or redis.call('HEXISTS', KEYS[3], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('PSETEX', KEYS[4], ARGV[6], ARGV[5])
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+redis.call('SET', KEYS[2], ARGV[3])
+return 1
+"""
+
+
+async def enqueue_request_urls(
+    pool: ArqRedis, timers: list[tuple], chunk_size: int, job_ids: list[str] | None = None
+) -> list[str | Exception]:
+    """
+    The function writes the request_url jobs of many timers with pipelined commands.
+
+    Every chunk of timers is written in one MULTI/EXEC round trip: one PSETEX per job and one ZADD for the whole
+    chunk, so a chunk is either fully queued or not queued at all. With the timing wheel enabled, the timers due
+    after the horizon are parked in the buckets of the wheel instead of the hot sorted set. The timers of a lane are
+    parked in the lane, whatever their deadline, and dispatched by the workers.
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param timers: url, delay in seconds and optionally lane of every timer
+    :type list[tuple]
+    :param chunk_size: number of timers written per round trip
+    :type int
+    :param job_ids: ids of the jobs, new ids are generated when absent
+    :type list[str] | None
+
+    :rtype: list[str | Exception]
+    :return: job id of every timer, or the error which prevented its chunk from being queued
+    """
+    if job_ids is None:
+        job_ids = [new_job_id() for _ in timers]
+    horizon_ms = int(settings.TIMER_WHEEL_HORIZON * 1000) if settings.TIMER_WHEEL_ENABLED else None
+    results: list[str | Exception] = []
+    for start in range(0, len(timers), chunk_size):
+        chunk = timers[start:start + chunk_size]
+        chunk_ids = job_ids[start:start + chunk_size]
+        enqueue_time_ms = timestamp_ms()
+        scores: dict[str, int] = {}
+        buckets: dict[str, dict[str, int]] = {}
+        promotions: dict[str, int] = {}
+        lanes: dict[str, dict[str, int]] = {}
+        try:
+            async with pool.pipeline(transaction=True) as pipe:
+                for job_id, (url, delay_seconds, *lane) in zip(chunk_ids, chunk):
+                    defer_ms = delay_seconds * 1000
+                    job = serialize_job(REQUEST_URL, (url,), {}, 1, enqueue_time_ms, serializer=pool.job_serializer)
+                    pipe.psetex(job_key_prefix + job_id, defer_ms + pool.expires_extra_ms, job)
+                    deadline = enqueue_time_ms + defer_ms
+                    bucket = None if horizon_ms is None else bucket_for(deadline, enqueue_time_ms, horizon_ms)
+                    if lane and lane[0] is not None:
+                        lanes.setdefault(lane[0], {})[job_id] = deadline
+                    elif bucket is None:
+                        scores[job_id] = deadline
+                    else:
+                        buckets.setdefault(bucket[0], {})[job_id] = deadline
+                        promotions[bucket[0]] = bucket[1]
+                if scores:
+                    pipe.zadd(QUEUE_NAME, scores)
+                for bucket_key, members in buckets.items():
+                    pipe.zadd(bucket_key, members)
+                    pipe.hset(DEADLINES_KEY, mapping=members)
+                if promotions:
+                    pipe.zadd(WHEEL_KEY, promotions)
+                for lane, members in lanes.items():
+                    pipe.zadd(LANE_KEY_PREFIX + lane, members)
+                    pipe.hset(DEADLINES_KEY, mapping=members)
+                    pipe.hset(LANE_TIMERS_KEY, mapping=dict.fromkeys(members, lane))
+                if lanes:
+                    pipe.sadd(LANES_KEY, *lanes)
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Error while adding %d tasks to the queue: %s", len(chunk), e)
+            results.extend(e for _ in chunk)
+        else:
+            results.extend(chunk_ids)
+    return results
+
+
+async def enqueue_timers(timers: list[tuple], chunk_size: int) -> list[str | Exception]:
+    """
+    The function creates the request_url jobs of many timers on the shards of the queue, the shards are written
+    concurrently
+    :param timers: url, delay in seconds and optionally lane of every timer
+    :type list[tuple]
+    :param chunk_size: number of timers written per round trip
+    :type int
+
+    :rtype: list[str | Exception]
+    :return: job id of every timer, or the error which prevented it from being queued
+    """
+    if queue.embedded is not None:
+        return queue.embedded.add(timers)
+    job_ids = [new_job_id() for _ in timers]
+    results: list[str | Exception] = [None] * len(timers)  # type: ignore
+
+    async def enqueue_shard(shard: int, positions: list[int]) -> None:
+        shard_results = await enqueue_request_urls(
+            queue.shard_pool(shard), [timers[i] for i in positions], chunk_size, [job_ids[i] for i in positions]
+        )
+        for position, result in zip(positions, shard_results):
+            results[position] = result
+
+    await asyncio.gather(*(enqueue_shard(shard, positions) for shard, positions in queue.group_by_shard(job_ids).items()))
+    return results
+
+
+def coalesce_key(url: str, deadline_ms: int, window_ms: int) -> str:
+    """
+    The function returns the key of the group of the timers of a url with deadlines in the same window
+    """
+    return f"{COALESCE_KEY_PREFIX}{hashlib.sha1(url.encode()).hexdigest()}:{deadline_ms // window_ms}"
+
+
+def new_job_id() -> str:
+    """
+    The function generates the id of a new job, 16 url safe characters (96 random bits) instead of the 32 hex
+    characters of a uuid when TIMER_SHORT_IDS is enabled. The id is repeated in the job key, the sorted set and the
+    result keys of the job.
+    """
+    return secrets.token_urlsafe(12) if settings.TIMER_SHORT_IDS else uuid4().hex
+
+
+def shard_job_id(shard: int) -> str:
+    """
+    The function generates a job id hashed to the shard, the aliases of a group live on the shard of its job
+    """
+    count = len(queue.shards)
+    while True:
+        job_id = new_job_id()
+        if count <= 1 or queue.shard_index(job_id, count) == shard:
+            return job_id
+
+
+async def enqueue_coalesced_timer(url: str, delay_seconds: int, window_seconds: float) -> tuple[str, float, bool]:
+    """
+    The function creates a timer sharing the request_url job of the timers of the same url with deadlines in the
+    same window, the job fires at the deadline of the first timer of the group.
+
+    The caller gets its own id, an alias of the job of the group, which is created if the group has no queued job.
+    The job is written to the hot sorted set, it is not parked in the timing wheel. Redis queue backend only.
+    :param url: url of the timer
+    :type str
+    :param delay_seconds: delay of the timer
+    :type int
+    :param window_seconds: width of the windows of deadlines
+    :type float
+
+    :rtype: tuple[str, float, bool]
+    :return: id of the timer, deadline in ms of the job of its group, True if the timer joined an existing job
+    """
+    enqueue_time_ms = timestamp_ms()
+    defer_ms = delay_seconds * 1000
+    deadline = enqueue_time_ms + defer_ms
+    group_key = coalesce_key(url, deadline, max(int(window_seconds * 1000), 1))
+    shard = queue.shard_index(group_key, len(queue.shards)) if len(queue.shards) > 1 else 0
+    pool = queue.shard_pool(shard)
+    job_id, alias_id = shard_job_id(shard), shard_job_id(shard)
+    job = serialize_job(REQUEST_URL, (url,), {}, 1, enqueue_time_ms, serializer=pool.job_serializer)
+    coalesce = pool.register_script(COALESCE_JOB)
+    group_job_id, score = await coalesce(
+        keys=[QUEUE_NAME, group_key, ALIAS_KEY_PREFIX + alias_id],
+        args=[job_id, deadline, job, defer_ms + pool.expires_extra_ms, job_key_prefix, MEMBERS_KEY_PREFIX,
+              in_progress_key_prefix],
+    )
+    joined = (group_job_id.decode() if isinstance(group_job_id, bytes) else group_job_id) != job_id
+    return alias_id, float(score), joined
+
+
+async def enqueue_idempotent_timer(
+    url: str, delay_seconds: int, idempotency_key: str, lane: str | None, ttl_seconds: float
+) -> tuple[str, float | None, bool]:
+    """
+    The function creates a timer once per idempotency key, a retry of the producer gets the timer created by its
+    first request instead of a new one. The key and the job are written by the same script, so concurrent retries
+    create one job.
+
+    The job is written to the hot sorted set or to its lane, it is not parked in the timing wheel. Redis queue
+    backend only.
+    :param url: url of the timer
+    :type str
+    :param delay_seconds: delay of the timer
+    :type int
+    :param idempotency_key: key of the producer, scoped by the lane of the timer
+    :type str
+    :param lane: lane of the timer, None for the hot sorted set
+    :type str | None
+    :param ttl_seconds: time during which the retries get the same timer
+    :type float
+
+    :rtype: tuple[str, float | None, bool]
+    :return: id of the timer, its deadline in ms or None once it is not pending anymore, True if it was created
+    """
+    key = f"{IDEMPOTENCY_KEY_PREFIX}{lane.rpartition(':')[0] if lane else ''}:{idempotency_key}"
+    shard = queue.shard_index(key, len(queue.shards)) if len(queue.shards) > 1 else 0
+    pool = queue.shard_pool(shard)
+    job_id = shard_job_id(shard)
+    enqueue_time_ms = timestamp_ms()
+    defer_ms = delay_seconds * 1000
+    job = serialize_job(REQUEST_URL, (url,), {}, 1, enqueue_time_ms, serializer=pool.job_serializer)
+    enqueue = pool.register_script(IDEMPOTENT_JOB)
+    timer_id, deadline, created = await enqueue(
+        keys=[key, job_key_prefix + job_id, QUEUE_NAME, DEADLINES_KEY, LANES_KEY, LANE_KEY_PREFIX + (lane or ""),
+              LANE_TIMERS_KEY],
+        args=[job_id, enqueue_time_ms + defer_ms, job, defer_ms + pool.expires_extra_ms, int(ttl_seconds * 1000),
+              lane or ""],
+    )
+    timer_id = timer_id.decode() if isinstance(timer_id, bytes) else timer_id
+    return timer_id, None if deadline is None else float(deadline), bool(created)
+
+
+async def enqueue_recurring_timer(url: str, schedule: str) -> tuple[str, int]:
+    """
+    The function creates a recurring timer and the job of its first occurrence, the next occurrences are queued by
+    the worker when the previous one fires.
+
+    The job is written to the hot sorted set, it is not parked in the timing wheel.
+    :param url: url of the timer
+    :type str
+    :param schedule: every:<seconds> or cron:<expression>
+    :type str
+
+    :rtype: tuple[str, int]
+    :return: id of the timer and deadline in ms of its first occurrence
+    """
+    if queue.embedded is not None:
+        return queue.embedded.add_recurring(url, schedule)
+    timer_id, job_id = new_job_id(), new_job_id()
+    pool = queue.pool_for(timer_id)
+    enqueue_time_ms = timestamp_ms()
+    deadline = next_deadline(schedule, enqueue_time_ms, enqueue_time_ms)
+    job = serialize_job(REQUEST_URL_RECURRING, (url, timer_id, schedule, deadline), {}, 1, enqueue_time_ms,
+                        serializer=pool.job_serializer)
+    async with pool.pipeline(transaction=True) as pipe:
+        pipe.hset(RECURRING_KEY, timer_id, schedule)
+        pipe.psetex(job_key_prefix + job_id, deadline - enqueue_time_ms + pool.expires_extra_ms, job)
+        pipe.zadd(QUEUE_NAME, {job_id: deadline})
+        pipe.set(ALIAS_KEY_PREFIX + timer_id, job_id)
+        await pipe.execute()
+    return timer_id, deadline
+
+
+async def enqueue_next_occurrence(
+    pool: ArqRedis, job_id: str, url: str, timer_id: str, schedule: str, deadline_ms: int
+) -> int | None:
+    """
+    The function queues the next occurrence of a recurring timer, it is called by the job of the occurrence which
+    fires. The deadline follows from the deadline of the firing occurrence, so the firing lag does not accumulate.
+
+    A job retried after a deferral, or the job of a cancelled timer, does not queue anything.
+    :param pool: redis pool of the shard of the timer
+    :type ArqRedis
+    :param job_id: id of the firing job
+    :type str
+    :param url: url of the timer
+    :type str
+    :param timer_id: id of the recurring timer
+    :type str
+    :param schedule: every:<seconds> or cron:<expression>
+    :type str
+    :param deadline_ms: deadline of the firing occurrence
+    :type int
+
+    :rtype: int | None
+    :return: deadline in ms of the next occurrence, None if it was not queued
+    """
+    enqueue_time_ms = timestamp_ms()
+    deadline = next_deadline(schedule, deadline_ms, enqueue_time_ms)
+    next_job_id = new_job_id()
+    job = serialize_job(REQUEST_URL_RECURRING, (url, timer_id, schedule, deadline), {}, 1, enqueue_time_ms,
+                        serializer=pool.job_serializer)
+    queue_next = pool.register_script(NEXT_OCCURRENCE)
+    queued = await queue_next(
+        keys=[QUEUE_NAME, ALIAS_KEY_PREFIX + timer_id, RECURRING_KEY, job_key_prefix + next_job_id],
+        args=[timer_id, job_id, next_job_id, deadline, job, deadline - enqueue_time_ms + pool.expires_extra_ms],
+    )
+    return deadline if queued else None
+
+
+async def resolve_aliases(pool: ArqRedis, job_ids: list[str]) -> list[str | None]:
+    """
+    The function reads the jobs of coalesced timers in one round trip
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param job_ids: ids of the timers
+    :type list[str]
+
+    :rtype: list[str | None]
+    :return: id of the job of every coalesced timer, None for the other timers
+    """
+    if not job_ids:
+        return []
+    aliases = await pool.mget([ALIAS_KEY_PREFIX + job_id for job_id in job_ids])
+    return [alias.decode() if isinstance(alias, bytes) else alias for alias in aliases]
+
+
+def time_left_seconds(score: float | None, now_ms: float) -> int:
+    """
+    The function converts the deadline score of a job to the whole seconds left before it fires
+    :param score: deadline of the job in ms, None if the job is not in the queue anymore
+    :type float | None
+    :param now_ms: current time in ms
+    :type float
+
+    :rtype: int
+    :return: seconds left, 0 if the deadline has passed
+    """
+    if score is None or score <= now_ms:
+        return 0
+    return int((score - now_ms) / 1000)
+
+
+async def fetch_scores(pool: ArqRedis, job_ids: list[str]) -> list[float | None]:
+    """
+    The function reads the deadline scores of many jobs in one round trip, without reading the job payloads.
+
+    The scores come from the hot sorted set, or from the deadlines of the timers parked in the timing wheel, both
+    are read in the same MULTI/EXEC so a timer being promoted is found in one of them.
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param job_ids: ids of the jobs
+    :type list[str]
+
+    :rtype: list[float | None]
+    :return: deadline in ms of every job, None for the jobs which are not in the queue
+    """
+    if not job_ids:
+        return []
+    try:
+        async with pool.pipeline(transaction=True) as pipe:
+            pipe.zmscore(QUEUE_NAME, job_ids)
+            pipe.hmget(DEADLINES_KEY, job_ids)
+            scores, parked = await pipe.execute()
+    except ResponseError:
+        # ZMSCORE needs redis 6.2, older servers get the same answer from ZSCORE
+        async with pool.pipeline(transaction=True) as pipe:
+            for job_id in job_ids:
+                pipe.zscore(QUEUE_NAME, job_id)
+            pipe.hmget(DEADLINES_KEY, job_ids)
+            *scores, parked = await pipe.execute()
+    scores = [
+        score if score is not None or deadline is None else float(deadline)
+        for score, deadline in zip(scores, parked)
+    ]
+    missing = [position for position, score in enumerate(scores) if score is None]
+    if missing:
+        # coalesced timers have the deadline of the job of their group
+        aliases = await resolve_aliases(pool, [job_ids[position] for position in missing])
+        aliased = [(position, alias) for position, alias in zip(missing, aliases) if alias is not None]
+        if aliased:
+            async with pool.pipeline(transaction=False) as pipe:
+                for _, alias in aliased:
+                    pipe.zscore(QUEUE_NAME, alias)
+                for (position, _), score in zip(aliased, await pipe.execute()):
+                    scores[position] = score
+    return scores
+
+
+async def fetch_timer_scores(job_ids: list[str]) -> list[float | None]:
+    """
+    The function reads the deadline scores of many jobs from the shards of the queue, one round trip per shard
+    :param job_ids: ids of the jobs
+    :type list[str]
+
+    :rtype: list[float | None]
+    :return: deadline in ms of every job, None for the jobs which are not in the queue
+    """
+    if queue.embedded is not None:
+        return queue.embedded.scores(job_ids)
+    scores: list[float | None] = [None] * len(job_ids)
+
+    async def fetch_shard(shard: int, positions: list[int]) -> None:
+        shard_scores = await fetch_scores(queue.shard_pool(shard), [job_ids[i] for i in positions])
+        for position, score in zip(positions, shard_scores):
+            scores[position] = score
+
+    await asyncio.gather(*(fetch_shard(shard, positions) for shard, positions in queue.group_by_shard(job_ids).items()))
+    return scores
+
+
+async def cancel_jobs(pool: ArqRedis, job_ids: list[str]) -> list[int]:
+    """
+    The function removes jobs from the queue before they fire, in one round trip.
+
+    Every job is removed by a script, atomically with respect to the workers: a job already marked in progress is
+    not touched, and a worker picking the job at the same moment finds its payload deleted and does not call the url.
+    A coalesced timer is detached from the job of its group, which is removed with the last timer of the group. A
+    recurring timer is removed with its next occurrence.
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param job_ids: ids of the jobs
+    :type list[str]
+
+    :rtype: list[int]
+    :return: UPDATED, NOT_FOUND, RUNNING, FIRED or SHARED for every job
+    """
+    cancel = pool.register_script(CANCEL_JOB)
+    async with pool.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            await cancel(
+                keys=[QUEUE_NAME, DEADLINES_KEY, job_key_prefix + job_id, in_progress_key_prefix + job_id,
+                      retry_key_prefix + job_id, ALIAS_KEY_PREFIX + job_id, RECURRING_KEY, LANE_TIMERS_KEY],
+                args=[job_id, job_key_prefix, in_progress_key_prefix, retry_key_prefix, MEMBERS_KEY_PREFIX],
+                client=pipe,
+            )
+        return await pipe.execute()
+
+
+async def cancel_timers(job_ids: list[str]) -> list[int]:
+    """
+    The function cancels jobs on the shards of the queue, one round trip per shard
+    :param job_ids: ids of the jobs
+    :type list[str]
+
+    :rtype: list[int]
+    :return: UPDATED, NOT_FOUND, RUNNING, FIRED or SHARED for every job
+    """
+    if queue.embedded is not None:
+        return queue.embedded.cancel(job_ids)
+    outcomes: list[int] = [NOT_FOUND] * len(job_ids)
+
+    async def cancel_shard(shard: int, positions: list[int]) -> None:
+        shard_outcomes = await cancel_jobs(queue.shard_pool(shard), [job_ids[i] for i in positions])
+        for position, outcome in zip(positions, shard_outcomes):
+            outcomes[position] = outcome
+
+    await asyncio.gather(*(cancel_shard(shard, positions) for shard, positions in queue.group_by_shard(job_ids).items()))
+    return outcomes
+
+
+async def reschedule_timer(job_id: str, delay_seconds: int) -> int:
+    """
+    The function moves the deadline of a job which has not fired yet to `delay_seconds` from now.
+
+    The new deadline is written to the hot sorted set, a job parked in the timing wheel is dropped from its bucket.
+    A job parked in a lane stays in its lane with the new deadline, and is dispatched fairly like the other jobs of
+    its lane.
+    A job already due is not rescheduled, a worker may be starting it, and neither are the coalesced timers, their
+    deadline is shared by their group, nor the recurring timers, their deadlines follow their schedule.
+    :param job_id: id of the job
+    :type str
+    :param delay_seconds: new delay of the job from now
+    :type int
+
+    :rtype: int
+    :return: UPDATED, NOT_FOUND, RUNNING, FIRED, SHARED or RECURRING
+    """
+    if queue.embedded is not None:
+        return queue.embedded.reschedule(job_id, delay_seconds)
+    pool = queue.pool_for(job_id)
+    now_ms = timestamp_ms()
+    defer_ms = delay_seconds * 1000
+    reschedule = pool.register_script(RESCHEDULE_JOB)
+    return await reschedule(
+        keys=[QUEUE_NAME, DEADLINES_KEY, job_key_prefix + job_id, in_progress_key_prefix + job_id,
+              ALIAS_KEY_PREFIX + job_id, RECURRING_KEY, LANE_TIMERS_KEY],
+        args=[job_id, now_ms + defer_ms, now_ms, defer_ms + pool.expires_extra_ms, LANE_KEY_PREFIX],
+    )
@@ -0,0 +1,124 @@
+"""
+Hierarchical timing wheel in front of the ``delayed_task`` sorted set.
+
+Timers far in the future are parked in coarse buckets instead of the hot sorted set polled by the workers:
+
+- ``delayed_task:wheel:h:<hour>`` holds the timers due more than an hour after their creation,
+- ``delayed_task:wheel:m:<minute>`` holds the timers due more than ``horizon`` seconds after their creation,
+- ``delayed_task:wheel`` indexes the buckets by the time at which they must be promoted,
+- ``delayed_task:deadlines`` maps the id of every parked timer to its deadline in ms.
+
+The promoter moves an hour bucket into minute buckets one hour before the hour starts, and a minute bucket into
+the hot sorted set ``horizon`` seconds before the minute starts, so a timer is in the hot sorted set well before
+it is due. A parked timer which is not in ``delayed_task:deadlines`` anymore was cancelled or rescheduled and is
+dropped by the promotion.
+"""
+import asyncio
+
+from arq.connections import ArqRedis
+from arq.utils import timestamp_ms
+
+from .logger import get_logger
+from .queue import QUEUE_NAME
+
+logger = get_logger(__name__)
+
+WHEEL_KEY = f"{QUEUE_NAME}:wheel"
+DEADLINES_KEY = f"{QUEUE_NAME}:deadlines"
+HOUR_MS = 3_600_000
+MINUTE_MS = 60_000
+
+# KEYS: bucket, index, deadlines, queue  ARGV: level, max members, horizon ms
+PROMOTE_BUCKET = """
+local members = redis.call('ZPOPMIN', KEYS[1], ARGV[2])
+local moved = 0
+for i = 1, #members, 2 do
+    local job_id = members[i]
+    local deadline = redis.call('HGET', KEYS[3], job_id)
+    if deadline then
+        if ARGV[1] == 'h' then
+            local slot = math.floor(tonumber(deadline) / 60000)
+            local bucket = KEYS[2] .. ':m:' .. slot
+            redis.call('ZADD', bucket, deadline, job_id)
+            redis.call('ZADD', KEYS[2], slot * 60000 - tonumber(ARGV[3]), bucket)
+        else
+            redis.call('ZADD', KEYS[4], deadline, job_id)
+            redis.call('HDEL', KEYS[3], job_id)
+        end
+        moved = moved + 1
+    end
+end
+local left = redis.call('ZCARD', KEYS[1])
+if left == 0 then
+    redis.call('ZREM', KEYS[2], KEYS[1])
+end
+return {moved, left}
+"""
+
+
+def bucket_for(deadline_ms: int, now_ms: int, horizon_ms: int) -> tuple[str, int] | None:
+    """
+    The function returns the bucket of the wheel in which a timer is parked
+    :param deadline_ms: deadline of the timer
+    :type int
+    :param now_ms: current time
+    :type int
+    :param horizon_ms: timers due within the horizon go directly to the hot sorted set
+    :type int
+
+    :rtype: tuple[str, int] | None
+    :return: key of the bucket and time at which the bucket is promoted, None for the hot sorted set
+    """
+    distance = deadline_ms - now_ms
+    if distance <= horizon_ms:
+        return None
+    if distance <= HOUR_MS:
+        slot = deadline_ms // MINUTE_MS
+        return f"{WHEEL_KEY}:m:{slot}", slot * MINUTE_MS - horizon_ms
+    slot = deadline_ms // HOUR_MS
+    return f"{WHEEL_KEY}:h:{slot}", slot * HOUR_MS - HOUR_MS
+
+
+async def promote_due_buckets(pool: ArqRedis, horizon_ms: int, batch_size: int, now_ms: int | None = None) -> int:
+    """
+    The function promotes every bucket of the wheel whose promotion time has come
+    :param pool: redis pool of the queue
+    :type ArqRedis
+    :param horizon_ms: lead time of the minute buckets before their timers are due
+    :type int
+    :param batch_size: maximum number of timers moved by one script call
+    :type int
+    :param now_ms: time up to which the buckets are promoted, defaults to now
+    :type int | None
+
+    :rtype: int
+    :return: number of timers moved to a lower level of the wheel or to the hot sorted set
+    """
+    promote = pool.register_script(PROMOTE_BUCKET)
+    moved = 0
+    while True:
+        buckets = await pool.zrangebyscore(WHEEL_KEY, "-inf", now_ms or timestamp_ms(), start=0, num=100)
+        if not buckets:
+            return moved
+        for bucket in buckets:
+            bucket = bucket.decode()
+            level = bucket.rsplit(":", 2)[1]
+            left = 1
+            while left:
+                count, left = await promote(keys=[bucket, WHEEL_KEY, DEADLINES_KEY, QUEUE_NAME],
+                                            args=[level, batch_size, horizon_ms])
+                moved += count
+
+
+async def run_promoter(pool: ArqRedis, horizon_ms: int, interval: float, batch_size: int) -> None:
+    """
+    The function promotes the due buckets of the wheel every `interval` seconds, it is safe to run it in many workers
+    """
+    while True:
+        try:
+            moved = await promote_due_buckets(pool, horizon_ms, batch_size)
+            if moved:
+                logger.info("Promoted %d timers of the timing wheel", moved)
+        except Exception as e:
+            logger.error("Error while promoting the timing wheel: %s", e)
+        await asyncio.sleep(interval)
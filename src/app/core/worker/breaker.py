@@ -0,0 +1,73 @@
+"""
+Per host circuit breaker of the callback requests, shared by all the workers through Redis.
+
+A host whose callbacks fail CIRCUIT_BREAKER_THRESHOLD times in a row, each failure within CIRCUIT_BREAKER_WINDOW
+seconds of the previous one, is opened for CIRCUIT_BREAKER_COOLDOWN seconds. The jobs of an open host are not sent,
+they go to the dead-letter store right away and can be replayed once the host has recovered. After the cooldown the
+host is half open: the next callback is sent, a failure opens the host again and a success closes it.
+"""
+from arq.connections import ArqRedis
+
+from ..utils.queue import QUEUE_NAME
+
+BREAKER_KEY_PREFIX = f"{QUEUE_NAME}:breaker:"
+
+# KEYS: failures, open  ARGV: threshold, window ms, cooldown ms
+RECORD_FAILURE = """
+local failures = redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+if failures >= tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[2], 1, 'PX', ARGV[3])
+    -- half open after the cooldown, the first failure opens the host again
+    redis.call('SET', KEYS[1], tonumber(ARGV[1]) - 1, 'PX', tonumber(ARGV[3]) + tonumber(ARGV[2]))
+    return 1
+end
+return 0
+"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive failures and open state of every callback host, stored in Redis
+    """
+    def __init__(self, pool: ArqRedis, threshold: int, window: float, cooldown: float) -> None:
+        self.pool = pool
+        self.threshold = threshold
+        self.window_ms = int(window * 1000)
+        self.cooldown_ms = int(cooldown * 1000)
+        self._record_failure = pool.register_script(RECORD_FAILURE)
+
+    async def check(self, host: str) -> tuple[bool, bool]:
+        """
+        The function reads the state of a host before its callback
+        :param host: host of the callback url
+        :type str
+
+        :rtype: tuple[bool, bool]
+        :return: True if the host is open, True if the host has failures to clear on success
+        """
+        is_open, failures = await self.pool.mget([BREAKER_KEY_PREFIX + host + ":open", BREAKER_KEY_PREFIX + host])
+        return is_open is not None, failures is not None
+
+    async def record(self, host: str, success: bool, failing: bool) -> bool:
+        """
+        The function records the outcome of a callback of the host
+        :param host: host of the callback url
+        :type str
+        :param success: whether the callback succeeded
+        :type bool
+        :param failing: whether the host had failures when it was checked
+        :type bool
+
+        :rtype: bool
+        :return: True if the failure opened the host
+        """
+        if success:
+            if failing:
+                await self.pool.delete(BREAKER_KEY_PREFIX + host)
+            return False
+        opened = await self._record_failure(
+            keys=[BREAKER_KEY_PREFIX + host, BREAKER_KEY_PREFIX + host + ":open"],
+            args=[self.threshold, self.window_ms, self.cooldown_ms],
+        )
+        return bool(opened)
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from ...exceptions.custom_exceptions import CallbackRetryError
+from ..config import CallbackHTTPSettings
+from ..utils import metrics
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+RETRY_AFTER_STATUS_CODES = frozenset({413, 429, 503})
+BACKOFF_MAX = 120
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry behaviour of the callback requests, it follows the semantics of ``urllib3.util.Retry``
+    """
+    total: int = 4
+    status_forcelist: frozenset = RETRY_STATUS_CODES
+    backoff_factor: float = 2
+    backoff_max: float = BACKOFF_MAX
+    respect_retry_after_header: bool = True
+
+    def backoff(self, consecutive_errors: int) -> float:
+        """
+        The function returns the sleep before the next attempt, the first retry is immediate
+        :param consecutive_errors: number of failed attempts so far
+        :type int
+
+        :rtype: float
+        :return: seconds to sleep
+        """
+        if consecutive_errors <= 1:
+            return 0
+        return min(self.backoff_max, self.backoff_factor * (2 ** (consecutive_errors - 1)))
+
+    def retry_after(self, response: httpx.Response) -> float | None:
+        """
+        The function reads the Retry-After header of the response if it should be honoured
+        :param response: response of the last attempt
+        :type httpx.Response
+
+        :rtype: float | None
+        :return: seconds to sleep or None if the header is absent
+        """
+        if not self.respect_retry_after_header or response.status_code not in RETRY_AFTER_STATUS_CODES:
+            return None
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class CallbackExecutor:
+    """
+    Executes the callback requests of the fired timers on the event loop.
+
+    One pooled client is shared by all the jobs of the worker, so connections to the same webhook host are
+    kept alive and reused for http and https urls alike. The number of requests in flight is bounded by
+    ``max_concurrency`` in total and by ``max_per_host`` for every host, jobs above the limits wait for a
+    free slot instead of blocking the worker. A job takes the slot of its host first and a global slot only
+    while its request is sent, and gives both back while it sleeps before a retry, so the jobs waiting for a
+    saturated host never hold the slots of the requests to the other hosts.
+    """
+    def __init__(
+        self,
+        retry: RetryPolicy,
+        timeout: httpx.Timeout,
+        max_concurrency: int,
+        limits: httpx.Limits,
+        max_per_host: int,
+    ) -> None:
+        self.retry = retry
+        self.max_per_host = max_per_host
+        self.client = httpx.AsyncClient(timeout=timeout, limits=limits)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # host -> [semaphore, number of jobs using it], dropped once the host is idle
+        self._hosts: dict[str, list] = {}
+
+    async def get(self, url: str) -> httpx.Response:
+        """
+        The function makes a GET request to the url, retrying on the retryable status codes and transport errors
+        :param url: webserver url to request
+        :type str
+
+        :rtype: httpx.Response
+        :return: response of the last attempt
+        """
+        response, _ = await self.request(url)
+        return response
+
+    async def request(self, url: str) -> tuple[httpx.Response, int]:
+        """
+        The function makes a GET request to the url like `get`, and counts the attempts
+        :param url: webserver url to request
+        :type str
+
+        :rtype: tuple[httpx.Response, int]
+        :return: response of the last attempt and number of attempts
+        """
+        host = httpx.URL(url).netloc.decode()
+        slot = self._hosts.setdefault(host, [asyncio.Semaphore(self.max_per_host), 0])
+        slot[1] += 1
+        try:
+            return await self._send(url, slot[0])
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._hosts[host]
+
+    async def aclose(self) -> None:
+        """
+        The function closes the pooled connections
+        """
+        await self.client.aclose()
+
+    async def _send(self, url: str, host_semaphore: asyncio.Semaphore) -> tuple[httpx.Response, int]:
+        errors = 0
+        while True:
+            try:
+                # the slots are held by the request only, never by the sleeps between the attempts
+                async with host_semaphore, self._semaphore:
+                    response = await self.client.get(url)
+            except httpx.TransportError as e:
+                errors += 1
+                if errors > self.retry.total:
+                    raise
+                logger.warning("Request to %s failed with %s, retry %d", url, e.__class__.__name__, errors)
+                metrics.CALLBACK_RETRIES.inc("transport")
+                await asyncio.sleep(self.retry.backoff(errors))
+                continue
+
+            if response.status_code not in self.retry.status_forcelist:
+                return response, errors + 1
+            errors += 1
+            if errors > self.retry.total:
+                raise CallbackRetryError(url, response.status_code, errors)
+            logger.warning("Request to %s returned %d, retry %d", url, response.status_code, errors)
+            metrics.CALLBACK_RETRIES.inc("status")
+            delay = self.retry.retry_after(response)
+            await asyncio.sleep(self.retry.backoff(errors) if delay is None else delay)
+
+
+def create_callback_executor(settings: CallbackHTTPSettings) -> CallbackExecutor:
+    """
+    The function creates the executor from the application settings
+    :param settings: settings with the HTTP options of the callbacks
+    :type CallbackHTTPSettings
+
+    :rtype: CallbackExecutor
+    :return: executor used by the request_url job
+    """
+    retry = RetryPolicy(total=settings.HTTP_MAX_RETRIES, backoff_factor=settings.HTTP_BACKOFF_FACTOR)
+    timeout = httpx.Timeout(settings.HTTP_REQUEST_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return CallbackExecutor(retry, timeout, settings.HTTP_MAX_CONCURRENCY, limits, settings.HTTP_MAX_CONNECTIONS_PER_HOST)
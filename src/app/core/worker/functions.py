@@ -1,15 +1,30 @@
 import asyncio
 import datetime
 import logging
+import time
+from contextlib import suppress
 
+import httpx
 import uvloop
+from arq import Retry
+from arq.connections import create_pool
+from arq.utils import timestamp_ms
 from arq.worker import Worker
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-
+from ...exceptions.custom_exceptions import CallbackRetryError, CircuitOpenError, HostLimitError
+from ..config import settings
+from ..utils import metrics
+from ..utils.dead_letters import store_dead_letter
+from ..utils.lanes import parse_weights, run_dispatcher
 from ..utils.logger import get_logger
+from ..utils.queue import parse_shards
+from ..utils.results import CallbackResult, body_hash, store_result
+from ..utils.timers import enqueue_next_occurrence
+from ..utils.wheel import run_promoter
+from .breaker import CircuitBreaker
+from .executor import create_callback_executor
+from .limiter import HostLimiter, clear_deferrals, count_deferral, parse_host_limits
+from .precision import record_fire
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 logger = get_logger(__name__)
@@ -18,32 +33,172 @@ logger = get_logger(__name__)
 # -------- background tasks --------
 async def request_url(ctx: Worker, url: str) -> str:
     """
-    The function requests the URL using requests library
+    The function requests the URL without blocking the event loop of the worker
+    :param ctx: main class for running jobs
+    :type Worker
+    :param url: webserver url to fetch the data from
+    :type str
+
+    :rtype: str
+    :return: string with the statement data extracted
+    """
+    return await call_url(ctx, url, ctx["job_id"])
+
+
+async def call_url(ctx: Worker, url: str, result_id: str) -> str:
+    """
+    The function requests the URL of a fired job and stores the outcome of the callback
     :param ctx: main class for running jobs
     :type Worker
     :param url: webserver url to fetch the data from
     :type str
+    :param result_id: id under which the result of the callback is stored
+    :type str
 
     :rtype: str
     :return: string with the statement data extracted
     """
-    retry_strategy = Retry(
-        total=4,  # Maximum number of retries
-        status_forcelist=[429, 500, 502, 503, 504],  # HTTP status codes to retry on
-        backoff_factor=2,
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session = requests.Session()
-    session.mount('https://', adapter)
-    resp = session.get(url)
-    logger.info(f"The request has been made to the URL: {url}")
+    host = httpx.URL(url).host
+    host_limiter: HostLimiter | None = ctx.get("host_limiter")
+    if host_limiter is not None:
+        wait, reason = await host_limiter.acquire(host, ctx["job_id"])
+        if wait:
+            deferrals = await count_deferral(ctx["redis"], ctx["job_id"])
+            if deferrals > settings.HOST_LIMIT_MAX_DEFERRALS:
+                error = HostLimitError(host, deferrals - 1)
+                await dead_letter(ctx, result_id, url, 0, 0, error, timestamp_ms(), "deferrals")
+                await clear_deferrals(ctx["redis"], ctx["job_id"])
+                raise error
+            # the host is over its limits, the job goes back to the queue instead of holding a slot of the worker
+            metrics.CALLBACK_DEFERRALS.inc(reason)
+            raise Retry(defer=wait)
+
+    try:
+        fired_ms = timestamp_ms()
+        metrics.SCHEDULING_LAG_SECONDS.observe(max(0, fired_ms - ctx["score"]) / 1000)
+        if settings.WORKER_FIRE_RECORDS_MAXLEN:
+            await record_fire(ctx["redis"], ctx["job_id"], ctx["score"], fired_ms, settings.WORKER_FIRE_RECORDS_MAXLEN)
+        breaker: CircuitBreaker | None = ctx.get("circuit_breaker")
+        failing = False
+        if breaker is not None:
+            is_open, failing = await breaker.check(host)
+            if is_open:
+                # the host keeps failing, the timer waits in the dead-letter store instead of a worker slot
+                error = CircuitOpenError(host)
+                await dead_letter(ctx, result_id, url, 0, 0, error, fired_ms, "circuit")
+                raise error
+        executor = ctx["http_executor"]
+        start = time.perf_counter()
+        try:
+            response, attempts = await executor.request(url)
+            status_code, body = response.status_code, response.content
+        except CallbackRetryError as e:
+            status_code, attempts, body, error = e.status_code, e.attempts, b"", e
+        except httpx.TransportError as e:
+            status_code, attempts, body, error = 0, executor.retry.total + 1, b"", e
+        else:
+            error = None
+        duration = time.perf_counter() - start
+        metrics.CALLBACK_SECONDS.observe(duration, "failure" if error else "success")
+        if settings.RESULT_STORE_ENABLED:
+            result = CallbackResult(status_code, int(duration * 1000), attempts, fired_ms, body_hash(body))
+            await store_result(ctx["redis"], result_id, result, int(settings.RESULT_TTL * 1000),
+                               settings.RESULT_MAX_ENTRIES)
+        if breaker is not None and await breaker.record(host, error is None, failing):
+            logger.error("Circuit of host %s is open for %ss", host, settings.CIRCUIT_BREAKER_COOLDOWN)
+            metrics.CIRCUIT_OPENED.inc()
+        if error is not None:
+            await dead_letter(ctx, result_id, url, status_code, attempts, error, fired_ms, "retries")
+            raise error
+    finally:
+        if host_limiter is not None:
+            await host_limiter.release(host, ctx["job_id"])
+            await clear_deferrals(ctx["redis"], ctx["job_id"])
+    logger.info("The request has been made to the URL: %s", url)
     return f"Extracted data from {url}"
 
 
+async def dead_letter(ctx: Worker, timer_id: str, url: str, status_code: int, attempts: int, error: Exception,
+                      failed_at: int, reason: str) -> None:
+    """
+    The function keeps a failed timer in the dead-letter store, a failure to store it does not hide the error of the
+    callback
+    """
+    metrics.DEAD_LETTERS.inc(reason)
+    if not settings.DEAD_LETTER_ENABLED:
+        return
+    try:
+        await store_dead_letter(ctx["redis"], timer_id, url, status_code, attempts, str(error) or error.__class__.__name__,
+                                failed_at, int(settings.DEAD_LETTER_TTL * 1000), settings.DEAD_LETTER_MAX_ENTRIES)
+    except Exception as e:
+        logger.error("Error while storing the dead letter of %s: %s", timer_id, e)
+
+
+async def request_url_recurring(ctx: Worker, url: str, timer_id: str, schedule: str, deadline_ms: int) -> str:
+    """
+    The function fires an occurrence of a recurring timer, the next occurrence is queued before the URL is requested
+    so a failing callback does not end the timer
+    :param ctx: main class for running jobs
+    :type Worker
+    :param url: webserver url to fetch the data from
+    :type str
+    :param timer_id: id of the recurring timer
+    :type str
+    :param schedule: every:<seconds> or cron:<expression>
+    :type str
+    :param deadline_ms: deadline of the occurrence
+    :type int
+
+    :rtype: str
+    :return: string with the statement data extracted
+    """
+    await enqueue_next_occurrence(ctx["redis"], ctx["job_id"], url, timer_id, schedule, deadline_ms)
+    # the result of the last occurrence is stored under the id of the timer
+    return await call_url(ctx, url, timer_id)
+
+
 # -------- base functions --------
 async def startup(ctx: Worker) -> None:
+    ctx["http_executor"] = create_callback_executor(settings)
+    # TIMER_WHEEL_ENABLED only decides where the API parks the timers, the workers always promote the parked ones
+    ctx["wheel_promoter"] = asyncio.create_task(run_promoter(
+        ctx["redis"], int(settings.TIMER_WHEEL_HORIZON * 1000), settings.TIMER_WHEEL_INTERVAL,
+        settings.TIMER_WHEEL_PROMOTE_BATCH,
+    ))
+    ctx["lane_dispatcher"] = asyncio.create_task(run_dispatcher(
+        ctx["redis"], settings.LANE_DISPATCH_INTERVAL, settings.LANE_DISPATCH_BACKLOG,
+        parse_weights(settings.LANE_PRIORITY_WEIGHTS), parse_weights(settings.LANE_TENANT_WEIGHTS),
+    ))
+    if settings.HOST_RATE_LIMITS:
+        # the limits are kept on the first shard so all the workers share them
+        shard_settings = parse_shards(settings.REDIS_QUEUE_SHARDS, settings.REDIS_QUEUE_HOST, settings.REDIS_QUEUE_PORT)
+        limiter_redis = ctx["redis"]
+        if len(shard_settings) > 1:
+            limiter_redis = ctx["limiter_redis"] = await create_pool(shard_settings[0])
+        ctx["host_limiter"] = HostLimiter(limiter_redis, parse_host_limits(settings.HOST_RATE_LIMITS),
+                                          settings.HOST_LIMIT_LEASE_TTL, settings.HOST_LIMIT_BUSY_WAIT)
+    if settings.CIRCUIT_BREAKER_ENABLED:
+        # the breakers are kept on the first shard so all the workers share them
+        shard_settings = parse_shards(settings.REDIS_QUEUE_SHARDS, settings.REDIS_QUEUE_HOST, settings.REDIS_QUEUE_PORT)
+        breaker_redis = ctx["redis"]
+        if len(shard_settings) > 1:
+            breaker_redis = ctx.get("limiter_redis") or await create_pool(shard_settings[0])
+            ctx["limiter_redis"] = breaker_redis
+        ctx["circuit_breaker"] = CircuitBreaker(breaker_redis, settings.CIRCUIT_BREAKER_THRESHOLD,
+                                                settings.CIRCUIT_BREAKER_WINDOW, settings.CIRCUIT_BREAKER_COOLDOWN)
+    if settings.WORKER_METRICS_PORT:
+        await metrics.start_exporter(settings.WORKER_METRICS_PORT)
     logger.info("Worker Started")
 
 
 async def shutdown(ctx: Worker) -> None:
-    logger.info("Worker end")
\ No newline at end of file
+    for task in ("wheel_promoter", "lane_dispatcher"):
+        if task in ctx:
+            ctx[task].cancel()
+            with suppress(asyncio.CancelledError):
+                await ctx[task]
+    await ctx["http_executor"].aclose()
+    if "limiter_redis" in ctx:
+        await ctx["limiter_redis"].close()
+    await metrics.stop_exporter()
+    logger.info("Worker end")
@@ -0,0 +1,157 @@
+"""
+Per host limits of the callback requests, shared by all the workers through Redis.
+
+Every host has a token bucket (requests per second and burst) and a maximum number of requests in flight, both
+optional. A job over the limit of its host is deferred back into the queue with ``arq.Retry`` for the time the
+bucket needs to refill, so it does not hold a worker slot while it waits. The deferrals of a job are counted on their
+own, the try of arq taken by the deferred run is given back, so they do not use the retries of arq. The count is
+dropped once the callback is sent or the job is dead lettered.
+
+The limits are configured in ``HOST_RATE_LIMITS`` as ``host=rate:burst:concurrency`` entries separated by commas,
+``*`` gives the limits of the other hosts and 0 disables a limit:
+
+    HOST_RATE_LIMITS="*=50:100:20,api.example.com=5:10:2"
+"""
+from dataclasses import dataclass
+
+from arq.connections import ArqRedis
+from arq.constants import retry_key_prefix
+
+from ..utils.queue import QUEUE_NAME
+
+LIMIT_KEY_PREFIX = f"{QUEUE_NAME}:limit:"
+DEFERRALS_KEY_PREFIX = f"{QUEUE_NAME}:deferrals:"
+# the deferrals of a job are kept as long as its tries in arq
+DEFERRALS_TTL = 88400
+DEFAULT_HOST = "*"
+
+# KEYS: retry of arq, deferrals  ARGV: ttl s
+DEFER_JOB = """
+redis.call('DECR', KEYS[1])
+local deferrals = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return deferrals
+"""
+
+# KEYS: bucket, leases  ARGV: rate per second, burst, max concurrency, lease id, lease ttl ms, busy wait ms
+ACQUIRE = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local concurrency = tonumber(ARGV[3])
+if concurrency > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+    if redis.call('ZCARD', KEYS[2]) >= concurrency then
+        return {tonumber(ARGV[6]), 'concurrency'}
+    end
+end
+if rate > 0 then
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - last) * rate / 1000)
+    if tokens < 1 then
+        return {math.ceil((1 - tokens) * 1000 / rate), 'rate'}
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+end
+if concurrency > 0 then
+    redis.call('ZADD', KEYS[2], now + tonumber(ARGV[5]), ARGV[4])
+    redis.call('PEXPIRE', KEYS[2], ARGV[5])
+end
+return {0, ''}
+"""
+
+
+@dataclass(frozen=True)
+class HostLimit:
+    rate: float = 0
+    burst: float = 0
+    concurrency: int = 0
+
+
+def parse_host_limits(value: str) -> dict[str, HostLimit]:
+    """
+    The function parses the HOST_RATE_LIMITS setting
+    :param value: comma separated host=rate:burst:concurrency entries
+    :type str
+
+    :rtype: dict[str, HostLimit]
+    :return: limits of every configured host, `*` for the other hosts
+    """
+    limits = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        host, _, limit = entry.strip().partition("=")
+        rate, burst, concurrency = (limit.split(":") + ["0", "0"])[:3]
+        rate = float(rate)
+        limits[host.lower()] = HostLimit(rate, float(burst) or max(rate, 1), int(concurrency))
+    return limits
+
+
+class HostLimiter:
+    """
+    Token bucket and concurrency limit of every callback host, stored in Redis
+    """
+    def __init__(self, pool: ArqRedis, limits: dict[str, HostLimit], lease_ttl: float, busy_wait: float) -> None:
+        self.pool = pool
+        self.limits = limits
+        self.lease_ttl_ms = int(lease_ttl * 1000)
+        self.busy_wait_ms = int(busy_wait * 1000)
+        self._acquire = pool.register_script(ACQUIRE)
+
+    def limit_for(self, host: str) -> HostLimit | None:
+        return self.limits.get(host) or self.limits.get(DEFAULT_HOST)
+
+    async def acquire(self, host: str, lease_id: str) -> tuple[float, str]:
+        """
+        The function takes a token and a slot of the host for a request
+        :param host: host of the callback url
+        :type str
+        :param lease_id: id of the job, holding the slot until `release`
+        :type str
+
+        :rtype: tuple[float, str]
+        :return: 0 when the request can be sent, otherwise the seconds to wait and the exceeded limit
+        """
+        limit = self.limit_for(host)
+        if limit is None:
+            return 0, ""
+        wait_ms, reason = await self._acquire(
+            keys=[LIMIT_KEY_PREFIX + host, LIMIT_KEY_PREFIX + host + ":leases"],
+            args=[limit.rate, limit.burst, limit.concurrency, lease_id, self.lease_ttl_ms, self.busy_wait_ms],
+        )
+        return wait_ms / 1000, reason.decode() if isinstance(reason, bytes) else reason
+
+    async def release(self, host: str, lease_id: str) -> None:
+        """
+        The function frees the slot of the host held by the job
+        """
+        limit = self.limit_for(host)
+        if limit is not None and limit.concurrency:
+            await self.pool.zrem(LIMIT_KEY_PREFIX + host + ":leases", lease_id)
+
+
+async def count_deferral(pool: ArqRedis, job_id: str) -> int:
+    """
+    The function counts a deferral of a job and gives back the try of arq taken by the deferred run
+    :param pool: redis pool of the shard of the job
+    :type ArqRedis
+    :param job_id: id of the job
+    :type str
+
+    :rtype: int
+    :return: number of deferrals of the job, this one included
+    """
+    defer = pool.register_script(DEFER_JOB)
+    return await defer(keys=[retry_key_prefix + job_id, DEFERRALS_KEY_PREFIX + job_id], args=[DEFERRALS_TTL])
+
+
+async def clear_deferrals(pool: ArqRedis, job_id: str) -> None:
+    """
+    The function drops the deferrals counted for a job, once it is not deferred anymore
+    """
+    await pool.delete(DEFERRALS_KEY_PREFIX + job_id)
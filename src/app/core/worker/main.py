@@ -0,0 +1,73 @@
+"""
+Runs one arq worker per shard of WORKER_SHARDS in a single process
+
+    python -m app.core.worker.main
+"""
+import argparse
+import asyncio
+import signal
+
+from arq.connections import RedisSettings
+from arq.worker import Worker, create_worker, get_kwargs
+
+from ..config import settings
+from .precision import PrecisionWorker
+from .settings import REDIS_SHARDS, WORKER_SHARDS, WorkerSettings
+
+
+def build_worker(redis_settings: RedisSettings, **kwargs) -> Worker:
+    """
+    The function creates the worker of a shard, a PrecisionWorker when WORKER_PRECISION_MODE is enabled
+    :param redis_settings: redis of the shard
+    :type RedisSettings
+    :param kwargs: overrides of the WorkerSettings
+    :type Any
+
+    :rtype: Worker
+    :return: worker of the shard
+    """
+    if settings.WORKER_PRECISION_MODE:
+        return PrecisionWorker(**{**get_kwargs(WorkerSettings), "redis_settings": redis_settings,
+                                  "max_wait": settings.WORKER_PRECISION_MAX_WAIT, **kwargs})
+    return create_worker(WorkerSettings, redis_settings=redis_settings, **kwargs)
+
+
+def stop_worker(worker: Worker, signum: int) -> None:
+    """
+    The function stops a worker on a signal, the running jobs are given WORKER_DRAIN_TIMEOUT to finish
+    """
+    if settings.WORKER_DRAIN_TIMEOUT and worker.allow_pick_jobs:
+        worker.handle_sig_wait_for_completion(signum)
+    else:
+        worker.handle_sig(signum)
+
+
+async def run_workers(shards: list[int], start_delay: float = 0) -> None:
+    """
+    The function runs the workers of the shards until the process receives SIGINT or SIGTERM
+    :param shards: indexes of the shards to serve
+    :type list[int]
+    :param start_delay: seconds to wait before the first read of the queues, it spreads the reads of the processes
+    :type float
+    """
+    if start_delay:
+        await asyncio.sleep(start_delay)
+    workers: list[Worker] = [build_worker(REDIS_SHARDS[shard]) for shard in shards]
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, lambda sig=signum: [stop_worker(worker, sig) for worker in workers])
+    try:
+        await asyncio.gather(*(worker.async_run() for worker in workers), return_exceptions=True)
+    finally:
+        await asyncio.gather(*(worker.close() for worker in workers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs the workers of the shards of WORKER_SHARDS")
+    parser.add_argument("--start-delay", type=float, default=0, help="seconds before the first read of the queues")
+    args = parser.parse_args()
+    asyncio.run(run_workers(WORKER_SHARDS, args.start_delay))
+
+
+if __name__ == "__main__":
+    main()
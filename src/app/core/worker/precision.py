@@ -0,0 +1,97 @@
+"""
+Firing precision of the worker.
+
+Every fired job appends its intended and actual fire times to the capped ``delayed_task:fires`` stream, so the
+lateness of the callbacks can be measured after the fact. ``PrecisionWorker`` replaces the fixed poll interval of
+arq by a sleep until the next deadline of the queue.
+"""
+import asyncio
+
+from arq.connections import ArqRedis
+from arq.utils import timestamp_ms
+from arq.worker import Worker
+
+from ..utils.queue import QUEUE_NAME
+
+FIRES_KEY = f"{QUEUE_NAME}:fires"
+
+
+async def record_fire(pool: ArqRedis, job_id: str, intended_ms: int, actual_ms: int, maxlen: int) -> None:
+    """
+    The function appends the fire times of a job to the fires stream, the oldest records are trimmed
+    :param pool: redis pool of the shard of the job
+    :type ArqRedis
+    :param job_id: id of the job
+    :type str
+    :param intended_ms: deadline of the job
+    :type int
+    :param actual_ms: time at which the job started
+    :type int
+    :param maxlen: approximate number of records kept in the stream
+    :type int
+    """
+    await pool.xadd(FIRES_KEY, {"id": job_id, "intended": intended_ms, "actual": actual_ms},
+                    maxlen=maxlen, approximate=True)
+
+
+async def read_fire_lags(pool: ArqRedis, count: int = 1000) -> list[int]:
+    """
+    The function reads the lateness of the jobs recorded in the fires stream
+    :param pool: redis pool of a shard
+    :type ArqRedis
+    :param count: number of records read per round trip
+    :type int
+
+    :rtype: list[int]
+    :return: actual minus intended fire time in ms of every record, oldest first
+    """
+    lags = []
+    start = "-"
+    while True:
+        records = await pool.xrange(FIRES_KEY, min=start, count=count)
+        lags.extend(int(fields[b"actual"]) - int(fields[b"intended"]) for _, fields in records)
+        if len(records) < count:
+            return lags
+        start = "(" + records[-1][0].decode()
+
+
+class PrecisionWorker(Worker):
+    """
+    Worker which sleeps until the next deadline of the queue instead of polling it at a fixed interval.
+
+    After every poll the worker reads the earliest deadline still in the future and wakes up at that time, or
+    after ``max_wait`` seconds at most so timers created meanwhile with an earlier deadline are not delayed more
+    than by the plain worker. A poll which started a full page of due jobs is followed by the next one right away,
+    a page of jobs already running in other workers is not, the worker waits for the next deadline instead.
+    """
+    def __init__(self, *args, max_wait: float = 0.5, **kwargs) -> None:
+        kwargs["poll_delay"] = 0
+        super().__init__(*args, **kwargs)
+        self.max_wait_s = max_wait
+        self._started_count = 0
+
+    async def start_jobs(self, job_ids: list[bytes]) -> None:
+        # the jobs picked by other workers are skipped, only the jobs started by this one are counted
+        running = len(self.tasks)
+        await super().start_jobs(job_ids)
+        self._started_count = len(self.tasks) - running
+
+    async def _poll_iteration(self) -> None:
+        self._started_count = 0
+        await super()._poll_iteration()
+        await asyncio.sleep(await self.next_wakeup_s())
+
+    async def next_wakeup_s(self) -> float:
+        """
+        The function returns how long the worker sleeps before the next poll
+        :rtype: float
+        :return: seconds until the next deadline of the queue, at most `max_wait`
+        """
+        if self._started_count >= self.queue_read_limit:
+            return 0
+        now = timestamp_ms()
+        upcoming = await self.pool.zrangebyscore(self.queue_name, min=f"({now}", max="+inf", start=0, num=1,
+                                                 withscores=True)
+        if not upcoming:
+            return self.max_wait_s
+        return min(self.max_wait_s, max(0.0, (upcoming[0][1] - timestamp_ms()) / 1000))
@@ -1,20 +1,29 @@
-from arq.connections import RedisSettings
-
 from ...core.config import settings
-from .functions import request_url, shutdown, startup
+from ..utils.queue import QUEUE_NAME, parse_shards
+from ..utils.serializer import job_serializers
+from .functions import request_url, request_url_recurring, shutdown, startup
 
 REDIS_QUEUE_HOST = settings.REDIS_QUEUE_HOST
 REDIS_QUEUE_PORT = settings.REDIS_QUEUE_PORT
+REDIS_SHARDS = parse_shards(settings.REDIS_QUEUE_SHARDS, REDIS_QUEUE_HOST, REDIS_QUEUE_PORT)
+JOB_SERIALIZER, JOB_DESERIALIZER = job_serializers(settings.JOB_SERIALIZER)
+WORKER_SHARDS = [int(index) for index in settings.WORKER_SHARDS.split(",") if index.strip()] or list(range(len(REDIS_SHARDS)))
 
 
 class WorkerSettings:
     """
-    Settings that will apply while connecting redis using arq
+    Settings that will apply while connecting redis using arq, the arq cli serves the first shard of WORKER_SHARDS
     """
-    functions = [request_url]
-    redis_settings = RedisSettings(host=REDIS_QUEUE_HOST, port=REDIS_QUEUE_PORT)
+    functions = [request_url, request_url_recurring]
+    redis_settings = REDIS_SHARDS[WORKER_SHARDS[0]]
     on_startup = startup
     on_shutdown = shutdown
     handle_signals = False
     keep_result = 10
-    queue_name = "delayed_task"
\ No newline at end of file
+    max_jobs = settings.WORKER_MAX_JOBS
+    poll_delay = settings.WORKER_POLL_DELAY
+    # on SIGTERM the worker stops picking jobs and lets the running ones finish
+    job_completion_wait = settings.WORKER_DRAIN_TIMEOUT
+    queue_name = QUEUE_NAME
+    job_serializer = JOB_SERIALIZER
+    job_deserializer = JOB_DESERIALIZER
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Runs WORKER_PROCESSES worker processes, one per cpu by default, and keeps them running
+
+    python -m app.core.worker.supervisor
+
+Every process runs the workers of app.core.worker.main. The first read of the queues of a process is delayed by its
+share of WORKER_POLL_DELAY, so the processes read the sorted sets in turn instead of all together.
+
+Signals of the supervisor:
+
+- SIGTERM, SIGINT: the processes stop picking jobs, finish the running ones within WORKER_DRAIN_TIMEOUT and exit,
+- SIGHUP: the processes are restarted one after the other, the others keep serving the queues.
+
+A process which exits on its own is restarted after WORKER_RESTART_DELAY, doubled on every crash in a row.
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from ..config import settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# a process which ran longer than this before exiting resets the restart delay
+STABLE_RUN_SECONDS = 60
+MAX_RESTART_DELAY = 60
+# time left to a process after the drain timeout before it is killed
+KILL_GRACE_SECONDS = 5
+
+
+@dataclass
+class Child:
+    index: int
+    process: subprocess.Popen | None = None
+    started_at: float = 0
+    restart_delay: float = 0
+    restart_at: float = 0
+
+
+class Supervisor:
+    """
+    Starts, restarts and stops the worker processes
+    """
+    def __init__(self, processes: int, poll_delay: float, drain_timeout: float, restart_delay: float,
+                 metrics_port: int) -> None:
+        self.processes = processes
+        self.poll_delay = poll_delay
+        self.drain_timeout = drain_timeout
+        self.restart_delay = restart_delay
+        self.metrics_port = metrics_port
+        self.children = [Child(index) for index in range(processes)]
+        self._stopping = False
+        self._reloading = False
+
+    def command(self, child: Child) -> list[str]:
+        start_delay = child.index * self.poll_delay / self.processes
+        return [sys.executable, "-m", f"{__package__}.main", "--start-delay", f"{start_delay:.3f}"]
+
+    def start(self, child: Child) -> None:
+        # every process serves its own /metrics port
+        env = {**os.environ, "WORKER_METRICS_PORT": str(self.metrics_port + child.index if self.metrics_port else 0)}
+        # own session, a ctrl-c of the terminal reaches the supervisor only, which drains the processes
+        child.process = subprocess.Popen(self.command(child), env=env, start_new_session=True)
+        child.started_at = time.monotonic()
+        logger.info("Worker process %d started with pid %d", child.index, child.process.pid)
+
+    def stop(self, children: list[Child]) -> None:
+        """
+        The function stops the processes, the running jobs are given the drain timeout to finish
+        """
+        running = [child for child in children if child.process is not None and child.process.poll() is None]
+        for child in running:
+            child.process.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout + KILL_GRACE_SECONDS
+        for child in running:
+            try:
+                child.process.wait(max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.error("Worker process %d did not drain in time, killing it", child.index)
+                child.process.kill()
+                child.process.wait()
+            logger.info("Worker process %d stopped", child.index)
+
+    def reload(self) -> None:
+        """
+        The function restarts the processes one after the other, the other processes keep serving the queues
+        """
+        for child in self.children:
+            if self._stopping:
+                return
+            self.stop([child])
+            self.start(child)
+
+    def check(self) -> None:
+        """
+        The function restarts the processes which exited, with an exponential backoff on repeated crashes
+        """
+        now = time.monotonic()
+        for child in self.children:
+            if child.process is not None and child.process.poll() is not None:
+                returncode = child.process.returncode
+                child.process = None
+                if now - child.started_at > STABLE_RUN_SECONDS:
+                    child.restart_delay = self.restart_delay
+                else:
+                    child.restart_delay = min(MAX_RESTART_DELAY, max(self.restart_delay, child.restart_delay * 2))
+                child.restart_at = now + child.restart_delay
+                logger.error("Worker process %d exited with code %s, restarting in %.1fs",
+                             child.index, returncode, child.restart_delay)
+            if child.process is None and now >= child.restart_at:
+                self.start(child)
+
+    def handle_stop(self, signum: int, frame) -> None:
+        self._stopping = True
+
+    def handle_reload(self, signum: int, frame) -> None:
+        self._reloading = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        logger.info("Starting %d worker processes", self.processes)
+        for child in self.children:
+            self.start(child)
+        while not self._stopping:
+            if self._reloading:
+                self._reloading = False
+                logger.info("Restarting the worker processes")
+                self.reload()
+            self.check()
+            time.sleep(0.2)
+        logger.info("Stopping the worker processes")
+        self.stop(self.children)
+
+
+def main() -> None:
+    processes = settings.WORKER_PROCESSES or os.cpu_count() or 1
+    Supervisor(processes, settings.WORKER_POLL_DELAY, settings.WORKER_DRAIN_TIMEOUT, settings.WORKER_RESTART_DELAY,
+               settings.WORKER_METRICS_PORT).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,33 @@ class ModelValidationError(HTTPException):
         super().__init__(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=detail,
-        )
\ No newline at end of file
+        )
+
+class BackendNotSupportedError(HTTPException):
+    """The class is for the features of the API which the queue backend in use does not support"""
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=detail,
+        )
+
+class CallbackRetryError(Exception):
+    """The class is raised when a callback request keeps failing after all the retries"""
+    def __init__(self, url: str, status_code: int, attempts: int = 0):
+        self.url = url
+        self.status_code = status_code
+        self.attempts = attempts
+        super().__init__(f"Too many retries for {url}, last status code {status_code}")
+
+class HostLimitError(Exception):
+    """The class is raised when a callback stays over the limits of its host after all the deferrals"""
+    def __init__(self, host: str, deferrals: int):
+        self.host = host
+        self.deferrals = deferrals
+        super().__init__(f"Host {host} stayed over its limits after {deferrals} deferrals")
+
+class CircuitOpenError(Exception):
+    """The class is raised when a callback is not sent because the circuit of its host is open"""
+    def __init__(self, host: str):
+        self.host = host
+        super().__init__(f"Circuit open for host {host}")
@@ -1,12 +1,45 @@
-from pydantic import BaseModel
+from functools import lru_cache
+from pydantic import BaseModel, ValidationError, model_validator
 from pydantic.functional_validators import AfterValidator
-from typing import Annotated
+from typing import Annotated, Any, List, Literal
+from urllib.parse import urlsplit
 import re
 from ..exceptions.custom_exceptions import ModelValidationError
+from ..core.utils.lanes import TENANT_REGEX, lane_for
 from ..core.utils.logger import get_logger
+from ..core.utils.recurrence import cron_schedule, interval_schedule, next_deadline
 
 logger = get_logger(__name__)
 
+HOST_REGEX = re.compile(r"[-a-zA-Z0-9@:%._\+~#=]{0,255}[-a-zA-Z0-9@:%_\+~#=]\.[a-zA-Z0-9()]{1,6}")
+URL_SCHEMES = frozenset({"http", "https"})
+# urlsplit strips tabs and newlines, the urls holding control characters are rejected before it
+CONTROL_CHARS_REGEX = re.compile(r"[\x00-\x1f\x7f]")
+TIMER_FIELDS = frozenset({"hours", "minutes", "seconds", "url"})
+IDEMPOTENCY_KEY_REGEX = re.compile(r"[\x21-\x7e]{1,128}")
+
+
+@lru_cache(maxsize=4096)
+def is_valid_url(url: str) -> bool:
+    """
+    The function checks the structure of a callback url: http or https scheme, a host with a top level domain,
+    a valid port and no control characters. Producers reuse a few callback urls, so the results are cached.
+    :param url: url in request
+    :type: str
+
+    :rtype: bool
+    :return: True if the url is valid
+    """
+    if CONTROL_CHARS_REGEX.search(url):
+        return False
+    try:
+        parts = urlsplit(url)
+        parts.port
+    except ValueError:
+        return False
+    return parts.scheme in URL_SCHEMES and HOST_REGEX.fullmatch(parts.hostname or "") is not None
+
+
 def url_validator(url) -> str:
     """
     The function validates if a url is valid
@@ -16,13 +49,39 @@ def url_validator(url) -> str:
     :rtype: str
     :return: url if is valid otherwise raise error
     """
-    url_regex = re.compile(r"https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*)")
-    match_object = url_regex.search(url)
-    if match_object is None:
+    if not is_valid_url(url):
         raise ModelValidationError("Invalid URL")
     return url
 
 
+def tenant_validator(tenant: str) -> str:
+    """
+    The function validates the tenant of a timer, letters, digits, '_', '.' and '-' only
+    :param tenant: tenant in request
+    :type: str
+
+    :rtype: str
+    :return: tenant if is valid otherwise raise error
+    """
+    if not TENANT_REGEX.fullmatch(tenant):
+        raise ModelValidationError("Invalid tenant, expected 1 to 64 letters, digits, '_', '.' or '-'")
+    return tenant
+
+
+def idempotency_key_validator(key: str) -> str:
+    """
+    The function validates the idempotency key of a timer, 1 to 128 printable ascii characters without spaces
+    :param key: idempotency key in request
+    :type: str
+
+    :rtype: str
+    :return: key if is valid otherwise raise error
+    """
+    if not IDEMPOTENCY_KEY_REGEX.fullmatch(key):
+        raise ModelValidationError("Invalid idempotency key, expected 1 to 128 printable characters without spaces")
+    return key
+
+
 def check_negative(value) -> int:
     """
     The function validates if hours, mintues and seconds are greater than 0
@@ -33,18 +92,126 @@ def check_negative(value) -> int:
     :return: return the value if it is greater than or equal to 0
     """
     if value < 0:
-        logger.error(f"Value is negative")
+        logger.error("Value is negative")
         raise ValueError("Value should be greater than 0")
     return value
 
 
-class TimerRequest(BaseModel):
+class TimerDelayRequest(BaseModel):
     """
-    Request model for API's
+    Request model for rescheduling a timer
     """
     hours: Annotated[int, AfterValidator(check_negative)]
     minutes: Annotated[int, AfterValidator(check_negative)]
     seconds: Annotated[int, AfterValidator(check_negative)]
+
+    @property
+    def delay_seconds(self) -> int:
+        """
+        Delay of the timer in seconds
+        """
+        return (self.hours * 60 + self.minutes) * 60 + self.seconds
+
+
+class TimerRequest(TimerDelayRequest):
+    """
+    Request model for API's, a timer with a tenant or a priority is fired from its lane, a timer with an idempotency
+    key is created once per key
+    """
+    url: Annotated[str, AfterValidator(url_validator)]
+    tenant: Annotated[str, AfterValidator(tenant_validator)] | None = None
+    priority: Literal["high", "normal", "low"] | None = None
+    idempotency_key: Annotated[str, AfterValidator(idempotency_key_validator)] | None = None
+
+    @property
+    def lane(self) -> str | None:
+        """
+        Lane of the timer, None for the shared queue
+        """
+        return lane_for(self.tenant, self.priority)
+
+
+class RecurringTimerRequest(BaseModel):
+    """
+    Request model for recurring timers, fired every interval given by hours, minutes and seconds, or on a cron
+    expression in UTC
+    """
+    hours: Annotated[int, AfterValidator(check_negative)] = 0
+    minutes: Annotated[int, AfterValidator(check_negative)] = 0
+    seconds: Annotated[int, AfterValidator(check_negative)] = 0
+    cron: str | None = None
     url: Annotated[str, AfterValidator(url_validator)]
 
+    @model_validator(mode="after")
+    def check_schedule(self) -> "RecurringTimerRequest":
+        interval = (self.hours * 60 + self.minutes) * 60 + self.seconds
+        if (self.cron is None) == (interval == 0):
+            raise ModelValidationError("Either an interval greater than 0 or a cron expression is required")
+        if self.cron is not None:
+            try:
+                # an expression without occurrence, like the 31st of february, is rejected as well
+                next_deadline(cron_schedule(self.cron), 0, 0)
+            except ValueError as e:
+                raise ModelValidationError(str(e)) from None
+        return self
+
+    @property
+    def schedule(self) -> str:
+        """
+        Schedule of the timer stored with its jobs
+        """
+        if self.cron is not None:
+            return cron_schedule(self.cron)
+        return interval_schedule((self.hours * 60 + self.minutes) * 60 + self.seconds)
+
+
+def validate_timer_requests(items: list[Any]) -> list[tuple | str]:
+    """
+    The function validates the timers of a batch in one pass.
+
+    Well formed timers, a dict with exactly the fields of TimerRequest holding non negative ints and a valid url,
+    are checked with plain comparisons without building a model. The other timers go through
+    TimerRequest.model_validate, so they are coerced and reported exactly like on POST /timer, the timers with a
+    tenant or a priority as well.
+    :param items: timers of the request body
+    :type list[Any]
 
+    :rtype: list[tuple | str]
+    :return: url, delay in seconds and lane if any of the valid timers, error of the invalid ones, in the order of
+        the items
+    """
+    results: list[tuple | str] = []
+    for item in items:
+        if type(item) is dict and item.keys() == TIMER_FIELDS:
+            hours, minutes, seconds, url = item["hours"], item["minutes"], item["seconds"], item["url"]
+            if (
+                type(hours) is int and type(minutes) is int and type(seconds) is int
+                and hours >= 0 and minutes >= 0 and seconds >= 0
+                and type(url) is str and is_valid_url(url)
+            ):
+                results.append((url, (hours * 60 + minutes) * 60 + seconds))
+                continue
+        try:
+            timer_request = TimerRequest.model_validate(item)
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(loc) for loc in error["loc"])
+            results.append(f"{location}: {error['msg']}")
+        except ModelValidationError as e:
+            results.append(e.detail)
+        else:
+            lane = timer_request.lane
+            if timer_request.idempotency_key is not None:
+                results.append("idempotency_key: Only supported by POST /api/v1/timer")
+            elif lane is None:
+                results.append((timer_request.url, timer_request.delay_seconds))
+            else:
+                results.append((timer_request.url, timer_request.delay_seconds, lane))
+    return results
+
+
+class TimerStatusRequest(BaseModel):
+    """
+    Request model for the batch status API
+    """
+    ids: List[str]
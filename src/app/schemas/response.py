@@ -1,12 +1,66 @@
 from datetime import timedelta
-from typing import Union
+from typing import List, Union
 
 from pydantic import BaseModel
 
+class TimerResultResponse(BaseModel):
+    """
+    Outcome of the callback of a fired timer, status_code is 0 when no response was received
+    """
+    status_code: int
+    latency_ms: int
+    attempts: int
+    fired_at: int
+    body_hash: str
+
+
 class TimerResponse(BaseModel):
     """
     Response model for the API's
     """
     id: str = None
     time_left: Union[int, timedelta] = None
-    error: str = None
\ No newline at end of file
+    result: TimerResultResponse = None
+    error: str = None
+
+
+class TimerBatchResponse(BaseModel):
+    """
+    Response model for the batch API's, timers are in the same order as in the request
+    """
+    timers: List[TimerResponse]
+    created: int = 0
+    failed: int = 0
+
+
+class DeadLetterFailureResponse(BaseModel):
+    """
+    One failed fire of a dead-lettered timer, status_code is 0 when no response was received
+    """
+    failed_at: int
+    status_code: int
+    attempts: int
+    error: str
+
+
+class DeadLetterResponse(DeadLetterFailureResponse):
+    """
+    Timer whose callback failed, with its last failure and the history of its failures, the oldest first
+    """
+    id: str
+    url: str
+    history: List[DeadLetterFailureResponse]
+
+
+class DeadLetterListResponse(BaseModel):
+    """
+    Response model for the dead-letter API, the latest failure first
+    """
+    dead_letters: List[DeadLetterResponse]
+
+
+class TimerStatusResponse(BaseModel):
+    """
+    Response model for the batch status API, timers are in the same order as in the request
+    """
+    timers: List[TimerResponse]
@@ -0,0 +1,40 @@
+"""
+Timers created per second through POST /api/v1/timer against POST /api/v1/timers/batch.
+
+Needs the Redis configured in src/.env (REDIS_QUEUE_HOST/REDIS_QUEUE_PORT).
+
+    python -m tests.benchmarks.bench_batch_create --timers 10000 --batch-size 1000
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from src.app.main import app
+from .common import report
+
+TIMER = {"hours": 1, "minutes": 0, "seconds": 0, "url": "https://www.example.com/callback"}
+
+
+def main(timers: int, batch_size: int) -> None:
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        for _ in range(timers):
+            client.post("/api/v1/timer", json=TIMER).raise_for_status()
+        report("create_timers", path="single", timers=timers,
+               timers_per_s=round(timers / (time.perf_counter() - start), 1))
+
+        start = time.perf_counter()
+        for offset in range(0, timers, batch_size):
+            size = min(batch_size, timers - offset)
+            client.post("/api/v1/timers/batch", json=[TIMER] * size).raise_for_status()
+        report("create_timers", path="batch", timers=timers, batch_size=batch_size,
+               timers_per_s=round(timers / (time.perf_counter() - start), 1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.timers, args.batch_size)
@@ -0,0 +1,107 @@
+"""
+Queue drain throughput of the worker supervisor from 1 to N processes.
+
+For every process count of --processes, the supervisor is started with WORKER_PROCESSES set to it, --timers timers
+due at the same deadline are queued, and the time between the deadline and the empty queue gives the drain rate.
+The callbacks go to a local webserver answering after --callback-delay.
+
+The benchmark FLUSHES the Redis database given by --db, never point it at a database holding real timers.
+
+    python -m tests.benchmarks.bench_drain_scaling --timers 20000 --processes 1,2,4,8
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Generator
+
+from arq import create_pool
+from arq.connections import RedisSettings
+from arq.utils import timestamp_ms
+
+from src.app.core.config import settings
+from src.app.core.utils.queue import QUEUE_NAME
+from src.app.core.utils.timers import enqueue_request_urls
+from .common import SRC_DIR, report, slow_stub_server
+
+
+@contextlib.contextmanager
+def supervisor_process(env: dict[str, str]) -> Generator[None, None, None]:
+    process = subprocess.Popen([sys.executable, "-m", "app.core.worker.supervisor"], cwd=SRC_DIR,
+                               env={**os.environ, "WORKER_METRICS_PORT": "0", **env},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        yield
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(settings.WORKER_DRAIN_TIMEOUT + 30)
+
+
+async def drain(redis_settings: RedisSettings, timers: int, callback_url: str, lead_ms: int) -> float:
+    """
+    Queueing the timers at the same deadline
+    :return: timers fired per second between the deadline and the empty queue
+    """
+    pool = await create_pool(redis_settings)
+    try:
+        job_ids = await enqueue_request_urls(pool, [(callback_url, 3600)] * timers, settings.TIMER_BATCH_PIPELINE_SIZE)
+        # move all the timers to the same deadline
+        deadline = timestamp_ms() + lead_ms
+        chunk_size = settings.TIMER_BATCH_PIPELINE_SIZE
+        for start in range(0, len(job_ids), chunk_size):
+            await pool.zadd(QUEUE_NAME, {job_id: deadline for job_id in job_ids[start:start + chunk_size]}, xx=True)
+        # a job leaves the queue once its callback is done
+        while await pool.zcard(QUEUE_NAME):
+            await asyncio.sleep(0.05)
+        return timers / max(0.001, (timestamp_ms() - deadline) / 1000)
+    finally:
+        await pool.close()
+
+
+async def flush(redis_settings: RedisSettings) -> None:
+    pool = await create_pool(redis_settings)
+    await pool.flushdb()
+    await pool.close()
+
+
+def main(args: argparse.Namespace) -> None:
+    redis_settings = RedisSettings(host=args.redis_host, port=args.redis_port, database=args.db)
+    env = {
+        "REDIS_QUEUE_SHARDS": f"redis://{args.redis_host}:{args.redis_port}/{args.db}",
+        "WORKER_FIRE_RECORDS_MAXLEN": "0",
+        "WORKER_MAX_JOBS": str(args.max_jobs),
+        "WORKER_POLL_DELAY": str(args.poll_delay),
+    }
+    baseline = None
+    with slow_stub_server(delay=args.callback_delay) as callback_url:
+        for processes in args.processes:
+            asyncio.run(flush(redis_settings))
+            with supervisor_process({**env, "WORKER_PROCESSES": str(processes)}):
+                time.sleep(args.warmup)
+                rate = asyncio.run(drain(redis_settings, args.timers, callback_url, args.lead_ms))
+            baseline = baseline or rate
+            report("drain_scaling", processes=processes, timers=args.timers, max_jobs=args.max_jobs,
+                   poll_delay=args.poll_delay, drain_timers_per_s=round(rate, 1), speedup=round(rate / baseline, 2))
+    asyncio.run(flush(redis_settings))
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", type=int, default=20000, help="timers drained per process count")
+    parser.add_argument("--processes", type=lambda value: [int(count) for count in value.split(",")],
+                        default=sorted({1, cpus, *(2 ** power for power in range(1, cpus.bit_length()))}),
+                        help="comma separated process counts, powers of 2 up to the number of cpus by default")
+    parser.add_argument("--max-jobs", type=int, default=settings.WORKER_MAX_JOBS)
+    parser.add_argument("--poll-delay", type=float, default=settings.WORKER_POLL_DELAY)
+    parser.add_argument("--callback-delay", type=float, default=0, help="response time of the callback webserver")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds given to the processes to start")
+    parser.add_argument("--lead-ms", type=int, default=2000, help="time between the enqueue and the deadline")
+    parser.add_argument("--redis-host", default=settings.REDIS_QUEUE_HOST)
+    parser.add_argument("--redis-port", type=int, default=settings.REDIS_QUEUE_PORT)
+    parser.add_argument("--db", type=int, default=15, help="redis database FLUSHED by the benchmark")
+    main(parser.parse_args())
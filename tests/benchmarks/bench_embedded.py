@@ -0,0 +1,59 @@
+"""
+Cost per timer of the embedded scheduler, and its startup time with the log of the timers to replay.
+
+Compare the add cost with the single and batch create of bench_batch_create against Redis:
+
+    python -m tests.benchmarks.bench_embedded --timers 100000
+    python -m tests.benchmarks.bench_embedded --timers 100000 --fsync
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.app.core.utils.embedded import EmbeddedScheduler
+from .common import report
+
+URL = "https://www.example.com/webhooks/timers/callback"
+
+
+def main(timers: int, batch: int, fsync: bool) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "timers.log")
+        scheduler = EmbeddedScheduler(path, None, fsync)
+        start = time.perf_counter()
+        scheduler.open()
+        empty_start_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        timer_ids = [timer_id for _ in range(0, timers, batch) for timer_id in scheduler.add([(URL, 3600)] * batch)]
+        add_s = time.perf_counter() - start
+        start = time.perf_counter()
+        scheduler.scores(timer_ids)
+        scores_s = time.perf_counter() - start
+        start = time.perf_counter()
+        scheduler.cancel(timer_ids[::2])
+        cancel_s = time.perf_counter() - start
+        scheduler.close()
+        log_bytes = os.path.getsize(path)
+
+        start = time.perf_counter()
+        restarted = EmbeddedScheduler(path, None, fsync)
+        restarted.open()
+        replay_s = time.perf_counter() - start
+        restarted.close()
+
+        report("embedded", timers=len(timer_ids), batch=batch, fsync=fsync,
+               empty_start_ms=round(empty_start_s * 1000, 2), add_us=round(add_s / len(timer_ids) * 1e6, 2),
+               scores_us=round(scores_s / len(timer_ids) * 1e6, 3),
+               cancel_us=round(cancel_s / (len(timer_ids) // 2) * 1e6, 2), log_bytes=log_bytes,
+               replay_ms=round(replay_s * 1000, 1), pending_after_replay=len(restarted))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1, help="timers added per call, 1 for the single create API")
+    parser.add_argument("--fsync", action="store_true", help="sync the log to the disk on every write")
+    args = parser.parse_args()
+    main(args.timers, args.batch, args.fsync)
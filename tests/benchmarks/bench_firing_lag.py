@@ -0,0 +1,78 @@
+"""
+Firing lag of the worker when many timers are due in the same second.
+
+For every number of timers, the timers are queued with the same deadline, then a burst worker fires them against a
+local webserver and the lag of every job (actual minus intended fire time) is read from the fires stream. The
+plain arq worker polling every 0.5s is compared with the PrecisionWorker.
+
+The benchmark FLUSHES the Redis database given by --db, never point it at a database holding real timers.
+
+    python -m tests.benchmarks.bench_firing_lag --timers 1000,10000,100000 --db 15
+"""
+import argparse
+import asyncio
+
+from arq import create_pool
+from arq.connections import RedisSettings
+from arq.utils import timestamp_ms
+
+from src.app.core.config import settings
+from src.app.core.utils.queue import QUEUE_NAME
+from src.app.core.utils.timers import enqueue_request_urls
+from src.app.core.worker.main import build_worker
+from src.app.core.worker.precision import read_fire_lags
+from .common import percentile, report, slow_stub_server
+
+
+async def run(redis_settings: RedisSettings, mode: str, timers: int, url: str, lead_ms: int) -> None:
+    pool = await create_pool(redis_settings)
+    try:
+        await pool.flushdb()
+        settings.WORKER_PRECISION_MODE = mode == "precision"
+        settings.WORKER_FIRE_RECORDS_MAXLEN = timers * 2
+        job_ids = await enqueue_request_urls(pool, [(url, 3600)] * timers, settings.TIMER_BATCH_PIPELINE_SIZE)
+        # move all the timers to the same deadline
+        deadline = timestamp_ms() + lead_ms
+        chunk_size = settings.TIMER_BATCH_PIPELINE_SIZE
+        for start in range(0, timers, chunk_size):
+            await pool.zadd(QUEUE_NAME, {job_id: deadline for job_id in job_ids[start:start + chunk_size]}, xx=True)
+
+        worker = build_worker(redis_settings, burst=True)
+        try:
+            await worker.async_run()
+        finally:
+            await worker.close()
+
+        lags = await read_fire_lags(pool)
+        report(
+            "firing_lag",
+            mode=mode,
+            timers=timers,
+            fired=len(lags),
+            lag_p50_ms=percentile(lags, 50),
+            lag_p99_ms=percentile(lags, 99),
+            lag_max_ms=max(lags, default=0),
+            first_fire_lag_ms=min(lags, default=0),
+        )
+        await pool.flushdb()
+    finally:
+        await pool.close()
+
+
+async def main(counts: list[int], db: int, lead_ms: int, url: str) -> None:
+    redis_settings = RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT, database=db)
+    settings.WORKER_METRICS_PORT = 0
+    for timers in counts:
+        for mode in ("poll", "precision"):
+            await run(redis_settings, mode, timers, url, lead_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", default="1000,10000,100000", help="comma separated numbers of timers due together")
+    parser.add_argument("--db", type=int, default=15, help="redis database FLUSHED by the benchmark")
+    parser.add_argument("--lead-ms", type=int, default=2000, help="time between the end of the enqueue and the deadline")
+    parser.add_argument("--delay", type=float, default=0, help="response time of the local webserver")
+    args = parser.parse_args()
+    with slow_stub_server(delay=args.delay) as url:
+        asyncio.run(main([int(count) for count in args.timers.split(",")], args.db, args.lead_ms, url))
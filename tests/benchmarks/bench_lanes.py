@@ -0,0 +1,107 @@
+"""
+Firing lag of the timers of small tenants during the burst of a large tenant, with and without lanes.
+
+One tenant queues --burst timers due at the same deadline, --tenants other tenants queue --timers timers each, due
+during the burst. A worker fires them against a local webserver answering after --delay, and the lag of every job
+(actual minus intended fire time) is read from the fires stream. Without lanes the timers share the hot sorted set
+and the timers of the small tenants wait behind the burst, with lanes they wait at most LANE_DISPATCH_BACKLOG jobs.
+
+The benchmark FLUSHES the Redis database given by --db, never point it at a database holding real timers.
+
+    python -m tests.benchmarks.bench_lanes --burst 20000 --tenants 10 --timers 50 --db 15
+"""
+import argparse
+import asyncio
+
+from arq import create_pool
+from arq.connections import RedisSettings
+from arq.utils import timestamp_ms
+
+from src.app.core.config import settings
+from src.app.core.utils.lanes import LANE_KEY_PREFIX, lane_for
+from src.app.core.utils.queue import QUEUE_NAME
+from src.app.core.utils.timers import enqueue_request_urls
+from src.app.core.utils.wheel import DEADLINES_KEY
+from src.app.core.worker.main import build_worker
+from src.app.core.worker.precision import FIRES_KEY
+from .common import percentile, report, slow_stub_server
+
+
+async def move_deadlines(pool, job_ids: list[str], lane: str | None, deadline: int) -> None:
+    """
+    Moving the timers, queued far in the future, to their deadline
+    """
+    chunk_size = settings.TIMER_BATCH_PIPELINE_SIZE
+    for start in range(0, len(job_ids), chunk_size):
+        members = {job_id: deadline for job_id in job_ids[start:start + chunk_size]}
+        if lane is None:
+            await pool.zadd(QUEUE_NAME, members, xx=True)
+        else:
+            await pool.zadd(LANE_KEY_PREFIX + lane, members, xx=True)
+            await pool.hset(DEADLINES_KEY, mapping=members)
+
+
+async def run(redis_settings: RedisSettings, lanes: bool, args: argparse.Namespace, url: str) -> None:
+    pool = await create_pool(redis_settings)
+    try:
+        await pool.flushdb()
+        total = args.burst + args.tenants * args.timers
+        settings.WORKER_FIRE_RECORDS_MAXLEN = total * 2
+        burst_lane = lane_for("burst", None) if lanes else None
+        burst_ids = await enqueue_request_urls(pool, [(url, 3600, burst_lane)] * args.burst,
+                                               settings.TIMER_BATCH_PIPELINE_SIZE)
+        tenant_ids = {}
+        for tenant in range(args.tenants):
+            lane = lane_for(f"tenant-{tenant}", None) if lanes else None
+            tenant_ids[lane] = await enqueue_request_urls(pool, [(url, 3600, lane)] * args.timers,
+                                                          settings.TIMER_BATCH_PIPELINE_SIZE)
+        deadline = timestamp_ms() + args.lead_ms
+        await move_deadlines(pool, burst_ids, burst_lane, deadline)
+        # the timers of the small tenants are due during the burst
+        for lane, job_ids in tenant_ids.items():
+            for offset, job_id in enumerate(job_ids):
+                await move_deadlines(pool, [job_id], lane, deadline + offset * args.spread_ms // max(1, args.timers))
+
+        worker = build_worker(redis_settings)
+        task = asyncio.create_task(worker.async_run())
+        try:
+            while await pool.xlen(FIRES_KEY) < total:
+                await asyncio.sleep(0.1)
+        finally:
+            task.cancel()
+            await worker.close()
+
+        small = {job_id for job_ids in tenant_ids.values() for job_id in job_ids}
+        lags = {"burst": [], "small": []}
+        for _, fields in await pool.xrange(FIRES_KEY):
+            lag = int(fields[b"actual"]) - int(fields[b"intended"])
+            lags["small" if fields[b"id"].decode() in small else "burst"].append(lag)
+        for tenant, values in lags.items():
+            report("lanes", lanes=lanes, tenants=tenant, timers=len(values), backlog=settings.LANE_DISPATCH_BACKLOG,
+                   lag_p50_ms=percentile(values, 50), lag_p99_ms=percentile(values, 99),
+                   lag_max_ms=max(values, default=0))
+        await pool.flushdb()
+    finally:
+        await pool.close()
+
+
+async def main(args: argparse.Namespace, url: str) -> None:
+    redis_settings = RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT, database=args.db)
+    settings.WORKER_METRICS_PORT = 0
+    settings.RESULT_STORE_ENABLED = False
+    for lanes in (False, True):
+        await run(redis_settings, lanes, args, url)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=20000, help="timers of the large tenant, due together")
+    parser.add_argument("--tenants", type=int, default=10, help="number of small tenants")
+    parser.add_argument("--timers", type=int, default=50, help="timers of every small tenant")
+    parser.add_argument("--spread-ms", type=int, default=5000, help="the timers of a small tenant are due over it")
+    parser.add_argument("--lead-ms", type=int, default=2000, help="time between the end of the enqueue and the burst")
+    parser.add_argument("--delay", type=float, default=0.01, help="response time of the local webserver")
+    parser.add_argument("--db", type=int, default=15, help="redis database FLUSHED by the benchmark")
+    args = parser.parse_args()
+    with slow_stub_server(delay=args.delay) as url:
+        asyncio.run(main(args, url))
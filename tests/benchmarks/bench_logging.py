@@ -0,0 +1,80 @@
+"""
+Time spent on the calling thread by one log call of the request path, with the handlers of the application
+(console and rotating file) called inline against the queue handler handing the records to a writer thread.
+
+    python -m tests.benchmarks.bench_logging --calls 100000
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import tempfile
+import time
+
+from src.app.core.utils.logger import (
+    JsonFormatter,
+    enable_queue_logging,
+    logging_config,
+    stop_queue_logging,
+)
+from .common import percentile, report
+
+URL = "https://www.example.com/callback"
+
+
+def create_logger(directory: str, log_format: str) -> logging.Logger:
+    """
+    Logger with the console and file handlers of the application, the console writes to /dev/null
+    """
+    if log_format == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(logging_config["formatters"]["extended_formatter"]["format"])
+    console = logging.StreamHandler(open(os.devnull, "w"))
+    file = logging.handlers.RotatingFileHandler(os.path.join(directory, "app.log"), maxBytes=10485760, backupCount=5)
+    logger = logging.getLogger(f"bench_logging.{log_format}.{time.perf_counter_ns()}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    for handler in (console, file):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def measure(logger: logging.Logger, calls: int) -> tuple[float, list[float]]:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(calls):
+        call_start = time.perf_counter_ns()
+        logger.info("The request has been made to the URL: %s", URL)
+        latencies.append((time.perf_counter_ns() - call_start) / 1000)
+    return time.perf_counter() - start, latencies
+
+
+def main(calls: int, queue_size: int) -> None:
+    for log_format in ("text", "json"):
+        for mode in ("inline", "queue_drop", "queue_block"):
+            with tempfile.TemporaryDirectory() as directory:
+                logger = create_logger(directory, log_format)
+                handlers = list(logger.handlers)
+                queue_logging = None
+                if mode != "inline":
+                    queue_logging = enable_queue_logging(logger, queue_size, block=mode == "queue_block")
+                duration, latencies = measure(logger, calls)
+                dropped = 0
+                if queue_logging is not None:
+                    dropped = queue_logging[0].dropped
+                    stop_queue_logging(*queue_logging)
+                for handler in handlers:
+                    handler.close()
+                report("logging", format=log_format, mode=mode, calls=calls, dropped=dropped,
+                       calls_per_s=round(calls / duration, 1),
+                       p50_us=round(percentile(latencies, 50), 2), p99_us=round(percentile(latencies, 99), 2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.calls, args.queue_size)
@@ -0,0 +1,157 @@
+"""
+Load test of the full pipeline: the API served by uvicorn, worker processes and a local callback webserver.
+
+Workloads, selected with --workloads:
+
+- create: POST /api/v1/timer from --concurrency clients, timers/sec and request latency percentiles,
+- poll: GET /api/v1/timer/{id} latency percentiles of the created timers as the queue grows to every size of
+  --queue-sizes, it runs the create workload first,
+- fire: --timers timers due in the same second, drain rate of the workers and firing lag percentiles.
+
+Every line printed is one JSON measurement. The benchmark FLUSHES the Redis database given by --db, never point
+it at a database holding real timers.
+
+    python -m tests.benchmarks.bench_pipeline --workloads create,poll,fire --timers 10000 --workers 2
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from arq import create_pool
+from arq.connections import ArqRedis, RedisSettings
+from arq.utils import timestamp_ms
+
+from src.app.core.config import settings
+from src.app.core.utils.queue import QUEUE_NAME
+from src.app.core.utils.timers import enqueue_request_urls
+from src.app.core.worker.precision import read_fire_lags
+from .common import percentile, report, service_processes, slow_stub_server
+
+TIMER = {"hours": 1, "minutes": 0, "seconds": 0, "url": "https://www.example.com/callback"}
+
+
+def latency_fields(latencies: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p90_ms": round(percentile(latencies, 90), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0), 2),
+    }
+
+
+async def drive(requests: int, concurrency: int, send) -> tuple[float, list[float]]:
+    """
+    Sending the requests from `concurrency` clients
+    :return: duration of the run in seconds and latency of every request in ms
+    """
+    latencies: list[float] = []
+    pending = iter(range(requests))
+
+    async def client() -> None:
+        for index in pending:
+            start = time.perf_counter()
+            await send(index)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+async def create_workload(http: httpx.AsyncClient, timers: int, concurrency: int) -> list[str]:
+    job_ids: list[str] = []
+
+    async def send(_: int) -> None:
+        response = await http.post("/api/v1/timer", json=TIMER)
+        response.raise_for_status()
+        job_ids.append(response.json()["id"])
+
+    duration, latencies = await drive(timers, concurrency, send)
+    report("pipeline", workload="create", timers=timers, concurrency=concurrency,
+           timers_per_s=round(timers / duration, 1), **latency_fields(latencies))
+    return job_ids
+
+
+async def poll_workload(http: httpx.AsyncClient, pool: ArqRedis, job_ids: list[str], queue_sizes: list[int],
+                        requests: int, concurrency: int) -> None:
+    for queue_size in queue_sizes:
+        missing = queue_size - await pool.zcard(QUEUE_NAME)
+        for start in range(0, max(0, missing), 10000):
+            size = min(10000, missing - start)
+            await enqueue_request_urls(pool, [(TIMER["url"], 3600 + random.randint(0, 86400)) for _ in range(size)],
+                                       settings.TIMER_BATCH_PIPELINE_SIZE)
+
+        async def send(_: int) -> None:
+            (await http.get(f"/api/v1/timer/{random.choice(job_ids)}")).raise_for_status()
+
+        duration, latencies = await drive(requests, concurrency, send)
+        report("pipeline", workload="poll", queue_size=await pool.zcard(QUEUE_NAME), requests=requests,
+               concurrency=concurrency, requests_per_s=round(requests / duration, 1), **latency_fields(latencies))
+
+
+async def fire_workload(pool: ArqRedis, timers: int, callback_url: str, lead_ms: int) -> None:
+    await pool.flushdb()
+    job_ids = await enqueue_request_urls(pool, [(callback_url, 3600)] * timers, settings.TIMER_BATCH_PIPELINE_SIZE)
+    # move all the timers to the same deadline
+    deadline = timestamp_ms() + lead_ms
+    chunk_size = settings.TIMER_BATCH_PIPELINE_SIZE
+    for start in range(0, timers, chunk_size):
+        await pool.zadd(QUEUE_NAME, {job_id: deadline for job_id in job_ids[start:start + chunk_size]}, xx=True)
+
+    # a job leaves the queue once its callback is done
+    while await pool.zcard(QUEUE_NAME):
+        await asyncio.sleep(0.05)
+    drained_ms = timestamp_ms()
+
+    lags = await read_fire_lags(pool)
+    report("pipeline", workload="fire", timers=timers, fired=len(lags),
+           drain_timers_per_s=round(len(lags) / max(0.001, (drained_ms - deadline) / 1000), 1),
+           lag_p50_ms=percentile(lags, 50), lag_p99_ms=percentile(lags, 99), lag_max_ms=max(lags, default=0))
+
+
+async def run(base_url: str | None, redis_settings: RedisSettings, args: argparse.Namespace, callback_url: str) -> None:
+    pool = await create_pool(redis_settings)
+    try:
+        if base_url is not None:
+            async with httpx.AsyncClient(base_url=base_url, timeout=30,
+                                         limits=httpx.Limits(max_connections=args.concurrency)) as http:
+                job_ids = await create_workload(http, args.timers, args.concurrency)
+                if "poll" in args.workloads:
+                    await poll_workload(http, pool, job_ids, args.queue_sizes, args.timers, args.concurrency)
+        if "fire" in args.workloads:
+            await fire_workload(pool, args.timers, callback_url, args.lead_ms)
+        await pool.flushdb()
+    finally:
+        await pool.close()
+
+
+def main(args: argparse.Namespace) -> None:
+    redis_settings = RedisSettings(host=args.redis_host, port=args.redis_port, database=args.db)
+    env = {
+        "REDIS_QUEUE_SHARDS": f"redis://{args.redis_host}:{args.redis_port}/{args.db}",
+        "WORKER_FIRE_RECORDS_MAXLEN": str(args.timers * 2),
+        "WORKER_PRECISION_MODE": str(args.precision).lower(),
+    }
+    api = bool({"create", "poll"} & set(args.workloads))
+    with slow_stub_server(delay=args.callback_delay) as callback_url:
+        with service_processes(env, workers=args.workers, api=api) as base_url:
+            asyncio.run(run(base_url, redis_settings, args, callback_url))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", default="create,poll,fire", type=lambda value: value.split(","))
+    parser.add_argument("--timers", type=int, default=10000, help="timers created, polled and fired by the workloads")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent API clients")
+    parser.add_argument("--queue-sizes", default="10000,100000,1000000",
+                        type=lambda value: [int(size) for size in value.split(",")])
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--precision", action="store_true", help="run the workers in WORKER_PRECISION_MODE")
+    parser.add_argument("--callback-delay", type=float, default=0, help="response time of the callback webserver")
+    parser.add_argument("--lead-ms", type=int, default=2000, help="time between the enqueue and the deadline of fire")
+    parser.add_argument("--redis-host", default=settings.REDIS_QUEUE_HOST)
+    parser.add_argument("--redis-port", type=int, default=settings.REDIS_QUEUE_PORT)
+    parser.add_argument("--db", type=int, default=15, help="redis database FLUSHED by the benchmark")
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+"""
+Fired callbacks per second of the request_url job against a local slow webserver.
+
+Compares the previous blocking ``requests`` implementation with the asyncio executor, both driven
+by the same number of concurrent jobs as an arq worker with ``max_jobs`` slots.
+
+    python -m tests.benchmarks.bench_request_url --callbacks 500 --delay 0.05 --max-jobs 100
+"""
+import argparse
+import asyncio
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from src.app.core.config import settings
+from src.app.core.worker.functions import request_url, shutdown, startup
+from .common import report, slow_stub_server
+
+
+async def blocking_request_url(ctx: dict, url: str) -> str:
+    """
+    The request_url job before the asyncio executor
+    """
+    retry_strategy = Retry(total=4, status_forcelist=[429, 500, 502, 503, 504], backoff_factor=2)
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.get(url)
+    return f"Extracted data from {url}"
+
+
+async def fire(job, ctx: dict, url: str, callbacks: int, max_jobs: int) -> float:
+    slots = asyncio.Semaphore(max_jobs)
+
+    async def run_one() -> None:
+        async with slots:
+            await job(ctx, url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one() for _ in range(callbacks)))
+    return callbacks / (time.perf_counter() - start)
+
+
+async def main(callbacks: int, delay: float, max_jobs: int) -> None:
+    with slow_stub_server(delay) as url:
+        ctx: dict = {}
+        await startup(ctx)
+        try:
+            for name, job in (("blocking", blocking_request_url), ("asyncio", request_url)):
+                rate = await fire(job, ctx, url, callbacks, max_jobs)
+                report("request_url", engine=name, callbacks=callbacks, server_delay_s=delay,
+                       max_jobs=max_jobs, http_max_concurrency=settings.HTTP_MAX_CONCURRENCY,
+                       http_max_connections_per_host=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                       callbacks_per_s=round(rate, 1))
+        finally:
+            await shutdown(ctx)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callbacks", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.05, help="response delay of the stub server in seconds")
+    parser.add_argument("--max-jobs", type=int, default=settings.WORKER_MAX_JOBS)
+    args = parser.parse_args()
+    asyncio.run(main(args.callbacks, args.delay, args.max_jobs))
@@ -0,0 +1,44 @@
+"""
+Size and encode/decode cost of a request_url job with pickle against the compact serializer.
+
+The Redis memory per pending timer, key and sorted set entry included, is reported by bench_timer_wheel for the
+serializer selected by JOB_SERIALIZER:
+
+    python -m tests.benchmarks.bench_serializer --jobs 100000
+    JOB_SERIALIZER=pickle python -m tests.benchmarks.bench_timer_wheel --timers 1000000
+    JOB_SERIALIZER=compact python -m tests.benchmarks.bench_timer_wheel --timers 1000000
+"""
+import argparse
+import time
+
+from arq.jobs import deserialize_job_raw, serialize_job
+from arq.utils import timestamp_ms
+
+from src.app.core.utils.serializer import SERIALIZERS
+from .common import report
+
+URL = "https://www.example.com/webhooks/timers/callback"
+
+
+def main(jobs: int) -> None:
+    for name, (serializer, deserializer) in SERIALIZERS.items():
+        enqueue_time_ms = timestamp_ms()
+        start = time.perf_counter()
+        payloads = [serialize_job("request_url", (URL,), {}, 1, enqueue_time_ms, serializer=serializer)
+                    for _ in range(jobs)]
+        encode_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for payload in payloads:
+            deserialize_job_raw(payload, deserializer=deserializer)
+        decode_s = time.perf_counter() - start
+
+        report("serializer", serializer=name, url_bytes=len(URL), payload_bytes=len(payloads[0]),
+               encode_ns=round(encode_s / jobs * 1e9, 1), decode_ns=round(decode_s / jobs * 1e9, 1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.jobs)
@@ -0,0 +1,156 @@
+"""
+Enqueue, poll, promotion and fire cost of the flat delayed_task sorted set against the timing wheel.
+
+The timers are spread uniformly between 10 minutes and 24 hours. For every mode the benchmark reports
+enqueue throughput, the size of the hot sorted set, the latency of the worker poll (ZRANGEBYSCORE up to now, with
+--due timers in the due window) and, for the wheel, how fast the promoter moves the next hour of timers into the
+hot sorted set.
+
+The fire lag is then measured on top of the pending timers: --fire-timers timers due within the next --fire-window
+seconds are fired against a local webserver by a worker, which runs the promoter of the wheel, and their lag
+(actual minus intended fire time) is read from the fires stream. The horizon and the interval of the promoter are
+scaled down to --horizon and --interval, so the timers of the wheel mode are parked in the wheel and promoted
+during the run instead of minutes later.
+
+The benchmark FLUSHES the Redis database given by --db, never point it at a database holding real timers.
+
+    python -m tests.benchmarks.bench_timer_wheel --timers 1000000,10000000 --db 15
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from arq import create_pool
+from arq.connections import RedisSettings
+from arq.constants import job_key_prefix
+from arq.utils import timestamp_ms
+
+from src.app.core.config import settings
+from src.app.core.utils.queue import QUEUE_NAME
+from src.app.core.utils.serializer import job_serializers
+from src.app.core.utils.timers import enqueue_request_urls
+from src.app.core.utils.wheel import HOUR_MS, promote_due_buckets
+from src.app.core.worker.main import build_worker
+from src.app.core.worker.precision import FIRES_KEY, read_fire_lags
+from .common import percentile, report, slow_stub_server
+
+URL = "https://www.example.com/callback"
+
+
+async def measure_fire_lag(pool, redis_settings: RedisSettings, url: str, timers: int, window: int, lead: int,
+                           timeout: float) -> dict:
+    """
+    Firing timers due within the window with a worker running the promoter, and reading their lag
+    :return: fields of the report
+    """
+    await pool.delete(FIRES_KEY)
+    settings.WORKER_FIRE_RECORDS_MAXLEN = timers * 2
+    chunk_size = settings.TIMER_BATCH_PIPELINE_SIZE
+    for offset in range(0, timers, chunk_size * 10):
+        size = min(chunk_size * 10, timers - offset)
+        await enqueue_request_urls(pool, [(url, lead + random.randint(0, window)) for _ in range(size)], chunk_size)
+
+    worker = build_worker(redis_settings)
+    run = asyncio.create_task(worker.async_run())
+    deadline = time.monotonic() + lead + window + timeout
+    try:
+        while await pool.xlen(FIRES_KEY) < timers and time.monotonic() < deadline and not run.done():
+            await asyncio.sleep(0.5)
+    finally:
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        await worker.close()
+
+    lags = await read_fire_lags(pool)
+    return {
+        "fire_timers": timers,
+        "fired": len(lags),
+        "fire_lag_p50_ms": percentile(lags, 50),
+        "fire_lag_p99_ms": percentile(lags, 99),
+        "fire_lag_max_ms": max(lags, default=0),
+    }
+
+
+async def run(pool, redis_settings: RedisSettings, mode: str, timers: int, url: str, args: argparse.Namespace) -> None:
+    chunk_size = args.chunk_size
+    await pool.flushdb()
+    settings.TIMER_WHEEL_ENABLED = mode == "wheel"
+    settings.TIMER_WHEEL_HORIZON = 300.0
+    memory_before = (await pool.info("memory"))["used_memory"]
+
+    start = time.perf_counter()
+    for offset in range(0, timers, chunk_size * 10):
+        size = min(chunk_size * 10, timers - offset)
+        await enqueue_request_urls(pool, [(URL, random.randint(600, 86400)) for _ in range(size)], chunk_size)
+    enqueue_s = time.perf_counter() - start
+    memory_after = (await pool.info("memory"))["used_memory"]
+
+    # a backlog of due timers, so the polls read a full page like a busy worker
+    due_ids = await enqueue_request_urls(pool, [(URL, 0)] * args.due, chunk_size)
+    latencies = []
+    for _ in range(args.polls):
+        start = time.perf_counter()
+        await pool.zrangebyscore(QUEUE_NAME, min=float("-inf"), max=timestamp_ms(), start=0, num=500)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    for offset in range(0, len(due_ids), chunk_size):
+        chunk = due_ids[offset:offset + chunk_size]
+        await pool.zrem(QUEUE_NAME, *chunk)
+        await pool.delete(*(job_key_prefix + job_id for job_id in chunk))
+
+    fields = {
+        "mode": mode,
+        "timers": timers,
+        "enqueue_timers_per_s": round(timers / enqueue_s, 1),
+        "bytes_per_timer": round((memory_after - memory_before) / timers, 1),
+        "hot_set_size": await pool.zcard(QUEUE_NAME),
+        "poll_due": args.due,
+        "poll_p50_us": round(percentile(latencies, 50), 1),
+        "poll_p99_us": round(percentile(latencies, 99), 1),
+    }
+    if mode == "wheel":
+        start = time.perf_counter()
+        promoted = await promote_due_buckets(pool, int(settings.TIMER_WHEEL_HORIZON * 1000),
+                                             settings.TIMER_WHEEL_PROMOTE_BATCH, now_ms=timestamp_ms() + HOUR_MS)
+        promote_s = time.perf_counter() - start
+        fields.update(promotion_moves=promoted, promotion_moves_per_s=round(promoted / promote_s, 1) if promoted else 0)
+
+    if args.fire_timers:
+        settings.TIMER_WHEEL_HORIZON = args.horizon
+        settings.TIMER_WHEEL_INTERVAL = args.interval
+        fields.update(await measure_fire_lag(pool, redis_settings, url, args.fire_timers, args.fire_window,
+                                             args.fire_lead, args.fire_timeout))
+    report("timer_wheel", **fields)
+
+
+async def main(args: argparse.Namespace, url: str) -> None:
+    redis_settings = RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT, database=args.db)
+    settings.WORKER_METRICS_PORT = 0
+    job_serializer, job_deserializer = job_serializers(settings.JOB_SERIALIZER)
+    pool = await create_pool(redis_settings, job_serializer=job_serializer, job_deserializer=job_deserializer)
+    try:
+        for timers in [int(count) for count in args.timers.split(",")]:
+            for mode in ("flat", "wheel"):
+                await run(pool, redis_settings, mode, timers, url, args)
+        await pool.flushdb()
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", default="1000000", help="comma separated numbers of pending timers")
+    parser.add_argument("--db", type=int, default=15, help="redis database FLUSHED by the benchmark")
+    parser.add_argument("--chunk-size", type=int, default=settings.TIMER_BATCH_PIPELINE_SIZE)
+    parser.add_argument("--polls", type=int, default=1000)
+    parser.add_argument("--due", type=int, default=10000, help="due timers in the window read by the polls")
+    parser.add_argument("--fire-timers", type=int, default=10000, help="timers fired to measure the lag, 0 skips it")
+    parser.add_argument("--fire-window", type=int, default=30, help="seconds over which the fired timers are due")
+    parser.add_argument("--fire-lead", type=int, default=5, help="seconds before the first fired timer is due")
+    parser.add_argument("--fire-timeout", type=float, default=60, help="seconds waited for the last fires")
+    parser.add_argument("--horizon", type=float, default=2, help="horizon of the wheel while firing, in seconds")
+    parser.add_argument("--interval", type=float, default=0.5, help="interval of the promoter while firing")
+    parser.add_argument("--delay", type=float, default=0, help="response time of the local webserver")
+    args = parser.parse_args()
+    with slow_stub_server(delay=args.delay) as url:
+        asyncio.run(main(args, url))
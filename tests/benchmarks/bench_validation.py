@@ -0,0 +1,59 @@
+"""
+Validation cost per timer of POST /api/v1/timers/batch.
+
+Compares the previous TimerRequest, which compiled the url regex on every call, with TimerRequest.model_validate
+and with validate_timer_requests on a batch of well formed timers.
+
+    python -m tests.benchmarks.bench_validation --timers 50000
+"""
+import argparse
+import re
+import time
+from typing import Annotated
+
+from pydantic import BaseModel
+from pydantic.functional_validators import AfterValidator
+
+from src.app.schemas.request import TimerRequest, check_negative, validate_timer_requests
+from .common import report
+
+URLS = [f"https://www.example{index}.com/callback" for index in range(10)]
+
+
+def legacy_url_validator(url: str) -> str:
+    """
+    The url validator before the cached structural check
+    """
+    url_regex = re.compile(r"https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*)")
+    if url_regex.search(url) is None:
+        raise ValueError("Invalid URL")
+    return url
+
+
+class LegacyTimerRequest(BaseModel):
+    hours: Annotated[int, AfterValidator(check_negative)]
+    minutes: Annotated[int, AfterValidator(check_negative)]
+    seconds: Annotated[int, AfterValidator(check_negative)]
+    url: Annotated[str, AfterValidator(legacy_url_validator)]
+
+
+def measure(name: str, validate, timers: list[dict]) -> None:
+    start = time.perf_counter()
+    validate(timers)
+    duration = time.perf_counter() - start
+    report("validation", mode=name, timers=len(timers), ns_per_timer=round(duration / len(timers) * 1e9, 1),
+           timers_per_s=round(len(timers) / duration, 1))
+
+
+def main(timers: int) -> None:
+    items = [{"hours": 1, "minutes": index % 60, "seconds": 0, "url": URLS[index % len(URLS)]} for index in range(timers)]
+    measure("legacy_model_validate", lambda batch: [LegacyTimerRequest.model_validate(item) for item in batch], items)
+    measure("model_validate", lambda batch: [TimerRequest.model_validate(item) for item in batch], items)
+    measure("validate_timer_requests", validate_timer_requests, items)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", type=int, default=50000)
+    args = parser.parse_args()
+    main(args.timers)
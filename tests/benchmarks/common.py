@@ -0,0 +1,84 @@
+import contextlib
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Generator
+
+import httpx
+
+from ..helpers.servers import slow_stub_server
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Nearest-rank percentile of the values
+    :param values: measured values
+    :param q: percentile between 0 and 100
+    :return: value at the percentile, 0 when there are no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def report(benchmark: str, **fields: Any) -> None:
+    """
+    Printing one machine readable line per measurement
+    """
+    print(json.dumps({"benchmark": benchmark, **fields}), flush=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def service_processes(env: dict[str, str], workers: int = 1, api: bool = True
+                      ) -> Generator[str | None, Any, None]:
+    """
+    Booting the API with uvicorn and `workers` worker processes, configured by environment variables
+    :param env: settings overriding src/.env, e.g. REDIS_QUEUE_SHARDS
+    :param workers: number of worker processes
+    :param api: whether to boot the API
+    :return: base url of the API, None without API
+    """
+    env = {**os.environ, "WORKER_METRICS_PORT": "0", **env}
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "app.core.worker.main"], cwd=SRC_DIR, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(workers)
+    ]
+    url = None
+    try:
+        if api:
+            port = free_port()
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL,
+            ))
+            url = f"http://127.0.0.1:{port}"
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    httpx.get(f"{url}/api/v1/timers/status", params={"ids": ["ready"]}).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.2)
+        yield url
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(10)
@@ -71,4 +71,16 @@ def create_time_negative_request() -> dict:
         "seconds":-1,
         "url":"https://www.google.com"
     }
-    return _request
\ No newline at end of file
+    return _request
+
+def create_batch_timer_request() -> list:
+    """
+    Creating the request body for /timers/batch api with two valid timers and an invalid one
+    :return: request body in list
+    """
+    _request = [
+        create_valid_timer_request(),
+        create_invalid_url_timer_request(),
+        {"hours": 0, "minutes": 0, "seconds": 30, "url": "https://www.google.com"},
+    ]
+    return _request
@@ -0,0 +1,12 @@
+from arq import create_pool
+from arq.connections import ArqRedis, RedisSettings
+
+from src.app.core.config import settings
+
+
+async def queue_pool() -> ArqRedis:
+    """
+    Connecting to the redis of the queue, like the API and the worker
+    :return: redis pool
+    """
+    return await create_pool(RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT))
@@ -0,0 +1,89 @@
+import asyncio
+import uuid
+
+import pytest
+from arq.constants import in_progress_key_prefix, job_key_prefix, result_key_prefix
+
+from src.app.core.config import settings
+from src.app.core.utils.analyzer import KeyStats, ShardReport, analyze_shard, key_kind
+from src.app.core.utils.queue import QUEUE_NAME
+from src.app.core.utils.timers import cancel_jobs, enqueue_request_urls
+from src.app.core.utils.wheel import DEADLINES_KEY
+from .helpers.pools import queue_pool
+
+
+def test_key_kind() -> None:
+    """
+    To test the keys of a shard are grouped by kind, by exact name first and then by the longest prefix
+    """
+    assert key_kind("delayed_task") == "queue"
+    assert key_kind("delayed_task:wheel") == "wheel"
+    assert key_kind("delayed_task:wheel:m:123") == "wheel"
+    assert key_kind("delayed_task:lane:acme:high") == "lanes"
+    assert key_kind("delayed_task:dead_letters:index") == "dead_letters"
+    assert key_kind("arq:job:b1C8GydkSceEHVPN") == "job"
+    assert key_kind("arq:result:5264ca0402144d18bc94a8adb5d9b9a3") == "arq_result"
+    assert key_kind("session:42") == "other"
+
+
+def test_shard_report_lines() -> None:
+    """
+    To test the report gives the bytes per pending timer and the largest key of every kind
+    """
+    report = ShardReport(kinds={"job": KeyStats(), "queue": KeyStats()}, pending=2)
+    report.kinds["job"].add("arq:job:a", 120)
+    report.kinds["job"].add("arq:job:b", 100)
+    report.kinds["queue"].add("delayed_task", 180)
+    header, _, job, queue, orphans = report.lines(0)
+    assert header == "shard 0: 3 keys, 400 bytes, 2 pending timers, 200 bytes per pending timer"
+    assert job.split() == ["job", "2", "220", "110", "120", "arq:job:a"]
+    assert orphans == "  orphans: 0 job, 0 queue_entry, 0 arq_result, 0 purged"
+
+
+def test_purge_removes_only_orphans(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    To test that --purge deletes the orphaned keys only, and keeps the jobs queued, parked in the timing wheel or a
+    lane, and running
+    """
+    monkeypatch.setattr(settings, "TIMER_WHEEL_ENABLED", True)
+
+    async def run() -> tuple[ShardReport, list, list]:
+        pool = await queue_pool()
+        url = "https://www.google.com"
+        # due after the horizon of the wheel, in the hot sorted set, in a lane
+        parked, queued, laned = await enqueue_request_urls(
+            pool, [(url, 7200), (url, 60), (url, 60, "acme:low")], 10
+        )
+        running, orphan_job, orphan_entry, orphan_result = (uuid.uuid4().hex for _ in range(4))
+        await pool.set(job_key_prefix + running, b"job")
+        await pool.set(in_progress_key_prefix + running, b"1")
+        await pool.set(job_key_prefix + orphan_job, b"job")
+        await pool.zadd(QUEUE_NAME, {orphan_entry: 1})
+        await pool.set(result_key_prefix + orphan_result, b"result")
+        try:
+            report = await analyze_shard(pool, scan_count=100, pause=0, purge=True)
+            async with pool.pipeline(transaction=False) as pipe:
+                for job_id in (parked, queued, laned, running):
+                    pipe.exists(job_key_prefix + job_id)
+                pipe.zscore(QUEUE_NAME, queued)
+                pipe.hexists(DEADLINES_KEY, parked)
+                pipe.hexists(DEADLINES_KEY, laned)
+                kept = await pipe.execute()
+                pipe.exists(job_key_prefix + orphan_job)
+                pipe.zscore(QUEUE_NAME, orphan_entry)
+                pipe.exists(result_key_prefix + orphan_result)
+                purged = await pipe.execute()
+            return report, kept, purged
+        finally:
+            await cancel_jobs(pool, [parked, queued, laned])
+            await pool.delete(job_key_prefix + running, in_progress_key_prefix + running,
+                              job_key_prefix + orphan_job, result_key_prefix + orphan_result)
+            await pool.zrem(QUEUE_NAME, orphan_entry)
+            await pool.close()
+
+    report, kept, purged = asyncio.run(run())
+    assert kept[:4] == [1, 1, 1, 1]
+    assert kept[4] is not None and kept[5] and kept[6]
+    assert purged == [0, None, 0]
+    assert report.orphans["job"] >= 1 and report.orphans["queue_entry"] >= 1 and report.orphans["arq_result"] >= 1
+    assert report.purged >= 3
@@ -1,7 +1,14 @@
 import json
+import uuid
 
+import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
+from src.app.core.config import settings
+from src.app.core.utils import queue
+from src.app.core.utils.lanes import LANE_KEY_PREFIX, LANE_TIMERS_KEY
+from src.app.core.utils.serializer import serialize_compact
+from src.app.core.utils.wheel import DEADLINES_KEY
 from .helpers import generators
 
 shared_data = {}
@@ -124,3 +131,258 @@ def test_negative_all_time_in_post_request(client: TestClient) -> None:
     assert response_data["detail"][1]["loc"][1] == "minutes"
     assert response_data["detail"][2]["msg"] == "Value error, Value should be greater than 0"
     assert response_data["detail"][2]["loc"][1] == "seconds"
+
+
+def test_post_batch_tasks(client: TestClient) -> None:
+    """
+    To test the creation of many tasks, the invalid timer is reported and the valid ones are created
+    """
+    test_input = generators.create_batch_timer_request()
+    response = client.post(
+        "/api/v1/timers/batch",
+        json=test_input
+    )
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+
+    response_data = response.json()
+    assert response_data["created"] == 2
+    assert response_data["failed"] == 1
+    assert response_data["timers"][0]["time_left"] == 3661
+    assert response_data["timers"][1] == {"id": "-1", "error": "Invalid URL"}
+    assert response_data["timers"][2]["time_left"] == 30
+
+    response = client.get(
+        f"/api/v1/timer/{response_data['timers'][2]['id']}"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert 0 < response.json()["time_left"] <= 30
+
+
+def test_get_tasks_status(client: TestClient) -> None:
+    """
+    To test the /timers/status API with a created task and an unknown one, by query string and by body
+    """
+    response = client.get(
+        "/api/v1/timers/status",
+        params={"ids": [shared_data["id"], "unknown"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    timers = response.json()["timers"]
+    assert [timer["id"] for timer in timers] == [shared_data["id"], "unknown"]
+    assert 0 < timers[0]["time_left"] <= 3661
+    assert timers[1]["time_left"] == 0
+
+    response = client.post(
+        "/api/v1/timers/status",
+        json={"ids": [shared_data["id"]]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["timers"][0]["id"] == shared_data["id"]
+
+
+def test_stream_unknown_task(client: TestClient) -> None:
+    """
+    To test the /timers/stream API ends the stream of an unknown task with a not_found event
+    """
+    with client.stream("GET", "/api/v1/timers/stream", params={"ids": ["unknown"]}) as response:
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = response.read().decode()
+
+    assert body == 'event: not_found\ndata: {"id": "unknown"}\n\n'
+
+
+def test_task_parked_in_timing_wheel(client: TestClient) -> None:
+    """
+    To test a task parked in the timing wheel keeps the same API's
+    """
+    settings.TIMER_WHEEL_ENABLED = True
+    try:
+        response = client.post(
+            "/api/v1/timer",
+            json=generators.create_valid_timer_request()
+        )
+    finally:
+        settings.TIMER_WHEEL_ENABLED = False
+    assert response.status_code == status.HTTP_201_CREATED
+    task_id = response.json()["id"]
+
+    response = client.get(f"/api/v1/timer/{task_id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert 3600 < response.json()["time_left"] <= 3661
+
+    response = client.get("/api/v1/timers/status", params={"ids": [task_id]})
+    assert 3600 < response.json()["timers"][0]["time_left"] <= 3661
+
+
+def test_metrics(client: TestClient) -> None:
+    """
+    To test the /metrics API exposes the enqueue latency and the queue depth
+    """
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert 'delayed_task_enqueue_seconds_count{path="single"}' in response.text
+    assert 'delayed_task_queue_depth{shard="0",set="hot"}' in response.text
+
+
+def test_reschedule_task(client: TestClient) -> None:
+    """
+    To test that PATCH /timer/<task_id> moves the deadline of the task
+    """
+    task_id = client.post("/api/v1/timer", json=generators.create_valid_timer_request()).json()["id"]
+
+    response = client.patch(f"/api/v1/timer/{task_id}", json={"hours": 2, "minutes": 0, "seconds": 0})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"id": task_id, "time_left": 7200}
+    assert 7100 < client.get(f"/api/v1/timer/{task_id}").json()["time_left"] <= 7200
+
+    response = client.patch("/api/v1/timer/unknown", json={"hours": 2, "minutes": 0, "seconds": 0})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_cancel_tasks(client: TestClient) -> None:
+    """
+    To test that DELETE /timer/<task_id> and POST /timers/cancel remove the tasks from the queue
+    """
+    response = client.post("/api/v1/timers/batch", json=[generators.create_valid_timer_request()] * 2)
+    first_id, second_id = [timer["id"] for timer in response.json()["timers"]]
+
+    response = client.delete(f"/api/v1/timer/{first_id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"id": first_id}
+    assert client.delete(f"/api/v1/timer/{first_id}").status_code == status.HTTP_404_NOT_FOUND
+
+    response = client.post("/api/v1/timers/cancel", json={"ids": [second_id, first_id]})
+    assert response.status_code == 207
+    assert response.json()["timers"] == [{"id": second_id}, {"id": first_id, "error": "Timer not found"}]
+
+    response = client.get("/api/v1/timers/status", params={"ids": [first_id, second_id]})
+    assert [timer["time_left"] for timer in response.json()["timers"]] == [0, 0]
+
+
+def test_coalesce_tasks(client: TestClient) -> None:
+    """
+    To test that coalesced tasks of the same url share one job and keep their own ids
+    """
+    test_input = generators.create_valid_timer_request()
+    first = client.post("/api/v1/timer", params={"coalesce": True}, json=test_input).json()
+    second = client.post("/api/v1/timer", params={"coalesce": True}, json=test_input).json()
+    assert first["id"] != second["id"]
+    assert second["time_left"] <= first["time_left"]
+
+    response = client.get(f"/api/v1/timer/{second['id']}")
+    assert response.json()["time_left"] in (3660, 3661)
+
+    response = client.patch(f"/api/v1/timer/{second['id']}", json={"hours": 0, "minutes": 0, "seconds": 5})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    assert client.delete(f"/api/v1/timer/{first['id']}").status_code == status.HTTP_200_OK
+    response = client.get("/api/v1/timers/status", params={"ids": [first["id"], second["id"]]})
+    assert response.json()["timers"][1]["time_left"] in (3660, 3661)
+
+    assert client.delete(f"/api/v1/timer/{second['id']}").status_code == status.HTTP_200_OK
+    response = client.get("/api/v1/timers/status", params={"ids": [second["id"]]})
+    assert response.json()["timers"][0]["time_left"] == 0
+
+
+def test_recurring_task(client: TestClient) -> None:
+    """
+    To test that a recurring task reports the time left before its next occurrence until it is cancelled
+    """
+    response = client.post("/api/v1/timer/recurring", json={"minutes": 5, "url": "https://www.google.com"})
+    assert response.status_code == status.HTTP_201_CREATED
+    task_id = response.json()["id"]
+    assert response.json()["time_left"] in (299, 300)
+
+    response = client.get(f"/api/v1/timer/{task_id}")
+    assert response.json()["time_left"] in (299, 300)
+    response = client.patch(f"/api/v1/timer/{task_id}", json={"hours": 0, "minutes": 0, "seconds": 5})
+    assert response.json() == {"id": task_id, "error": "Timer is recurring"}
+
+    assert client.delete(f"/api/v1/timer/{task_id}").status_code == status.HTTP_200_OK
+    assert client.get(f"/api/v1/timer/{task_id}").json()["time_left"] == 0
+
+    response = client.post("/api/v1/timer/recurring", json={"cron": "61 * * * *", "url": "https://www.google.com"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_lane_tasks(client: TestClient) -> None:
+    """
+    To test that a task with a tenant and a priority is parked in its lane with its deadline, and can be cancelled
+    """
+    test_input = {**generators.create_valid_timer_request(), "tenant": "acme", "priority": "high"}
+    response = client.post("/api/v1/timer", json=test_input)
+    assert response.status_code == status.HTTP_201_CREATED
+    task_id = response.json()["id"]
+    assert client.get(f"/api/v1/timer/{task_id}").json()["time_left"] in (3660, 3661)
+
+    response = client.post("/api/v1/timers/batch", json=[test_input, {**test_input, "priority": "urgent"}])
+    assert response.json()["created"] == 1 and response.json()["failed"] == 1
+
+    response = client.post("/api/v1/timer", params={"coalesce": True}, json=test_input)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    assert client.delete(f"/api/v1/timer/{task_id}").status_code == status.HTTP_200_OK
+    assert client.get(f"/api/v1/timer/{task_id}").json()["time_left"] == 0
+
+
+def test_reschedule_lane_task(client: TestClient) -> None:
+    """
+    To test that a rescheduled task with a tenant stays in its lane with its new deadline
+    """
+    test_input = {**generators.create_valid_timer_request(), "tenant": "acme", "priority": "low"}
+    task_id = client.post("/api/v1/timer", json=test_input).json()["id"]
+
+    response = client.patch(f"/api/v1/timer/{task_id}", json={"hours": 2, "minutes": 0, "seconds": 0})
+    assert response.status_code == status.HTTP_200_OK
+    assert 7100 < client.get(f"/api/v1/timer/{task_id}").json()["time_left"] <= 7200
+    lane_score = client.portal.call(queue.pool.zscore, f"{LANE_KEY_PREFIX}acme:low", task_id)
+    assert lane_score == float(client.portal.call(queue.pool.hget, DEADLINES_KEY, task_id))
+    assert client.portal.call(queue.pool.zscore, queue.QUEUE_NAME, task_id) is None
+
+    assert client.delete(f"/api/v1/timer/{task_id}").status_code == status.HTTP_200_OK
+    assert client.portal.call(queue.pool.hget, LANE_TIMERS_KEY, task_id) is None
+
+
+def test_idempotent_task(client: TestClient) -> None:
+    """
+    To test that the retries of a task with an idempotency key get the first task instead of a new one
+    """
+    test_input = {**generators.create_valid_timer_request(), "idempotency_key": uuid.uuid4().hex}
+    first = client.post("/api/v1/timer", json=test_input)
+    assert first.status_code == status.HTTP_201_CREATED
+    retry = client.post("/api/v1/timer", json={**test_input, "minutes": 5})
+    assert retry.status_code == status.HTTP_200_OK
+    assert retry.json()["id"] == first.json()["id"]
+    assert retry.json()["time_left"] in (3660, 3661)
+
+    response = client.post("/api/v1/timer", json={**test_input, "idempotency_key": "with space"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.delete(f"/api/v1/timer/{first.json()['id']}").status_code == status.HTTP_200_OK
+
+
+def test_dead_letters(client: TestClient) -> None:
+    """
+    To test that the dead letters are listed, and that unknown dead letters are reported by the replay
+    """
+    response = client.get("/api/v1/dead-letters", params={"limit": 10})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["dead_letters"]) <= 10
+
+    response = client.post("/api/v1/dead-letters/replay", json={"ids": [uuid.uuid4().hex]})
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert response.json()["timers"] == [{"id": "-1", "error": "Dead letter not found"}]
+
+
+def test_get_compact_task(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    To test that a task written in the compact format is read back by the get API
+    """
+    monkeypatch.setattr(queue.pool, "job_serializer", serialize_compact)
+    response = client.post("/api/v1/timer", json=generators.create_valid_timer_request())
+    task_id = response.json()["id"]
+    response = client.get(f"/api/v1/timer/{task_id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["time_left"] in (3660, 3661)
+    assert client.delete(f"/api/v1/timer/{task_id}").status_code == status.HTTP_200_OK
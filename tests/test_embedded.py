@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+from arq.utils import timestamp_ms
+from fastapi.testclient import TestClient
+
+from src.app.core.config import settings
+from src.app.core.utils import queue
+from src.app.core.utils.embedded import EmbeddedScheduler
+from src.app.core.utils.timers import FIRED, NOT_FOUND, RECURRING, UPDATED
+from src.app.core.worker.executor import CallbackExecutor, RetryPolicy
+from src.app.main import app
+from .helpers.servers import slow_stub_server
+
+
+def create_scheduler(path: str) -> EmbeddedScheduler:
+    """
+    Creating a scheduler which calls the urls with a retry-less executor
+    :return: scheduler with its log replayed
+    """
+    executor = CallbackExecutor(RetryPolicy(total=0, backoff_factor=0), httpx.Timeout(5), 10, httpx.Limits(), 2)
+    scheduler = EmbeddedScheduler(path, executor)
+    scheduler.open()
+    return scheduler
+
+
+def test_embedded_timers_survive_a_restart(tmp_path) -> None:
+    """
+    To test that the pending timers are replayed from the log, without the cancelled ones and with the new deadlines
+    """
+    path = str(tmp_path / "timers.log")
+    scheduler = create_scheduler(path)
+    kept, cancelled, moved = scheduler.add([("http://localhost/a", 60), ("http://localhost/b", 60),
+                                            ("http://localhost/c", 60)])
+    recurring, _ = scheduler.add_recurring("http://localhost/d", "every:30")
+    assert scheduler.cancel([cancelled, "unknown"]) == [UPDATED, NOT_FOUND]
+    assert scheduler.reschedule(moved, 600) == UPDATED
+    assert scheduler.reschedule(recurring, 600) == RECURRING
+    scores = scheduler.scores([kept, moved, recurring])
+    scheduler.close()
+    with open(path, "a") as log:
+        # a record cut by a crash
+        log.write("A 123")
+
+    restarted = create_scheduler(path)
+    assert len(restarted) == 3
+    assert restarted.scores([kept, cancelled, moved, recurring]) == [scores[0], None, scores[1], scores[2]]
+    restarted.close()
+    with open(path) as log:
+        assert len(log.readlines()) == 3
+
+
+def test_embedded_log_url_cannot_inject_records(tmp_path) -> None:
+    """
+    To test that a url holding a newline is kept in its own record and does not cancel another timer on replay
+    """
+    path = str(tmp_path / "timers.log")
+    scheduler = create_scheduler(path)
+    victim, = scheduler.add([("http://localhost/a", 60)])
+    injected, = scheduler.add([(f"http://localhost/b\nD {victim}", 60)])
+    scores = scheduler.scores([victim, injected])
+    scheduler.close()
+
+    restarted = create_scheduler(path)
+    assert restarted.scores([victim, injected]) == scores
+    restarted.close()
+    with open(path) as log:
+        assert len(log.readlines()) == 2
+
+
+def test_embedded_timers_fire(tmp_path) -> None:
+    """
+    To test that the due timers are fired in deadline order and keep the result of their callback, and that a
+    recurring timer moves to its next occurrence
+    """
+    async def run(url: str) -> tuple:
+        scheduler = create_scheduler(str(tmp_path / "timers.log"))
+        scheduler.start()
+        try:
+            timer_id, = scheduler.add([(url, 0)])
+            recurring, _ = scheduler.add_recurring(url, "every:1")
+            first_deadline, = scheduler.scores([recurring])
+            for _ in range(100):
+                if scheduler.state(timer_id) == "completed":
+                    break
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(1.2)
+            return (scheduler.state(timer_id), scheduler.results([timer_id])[0], scheduler.cancel([timer_id]),
+                    scheduler.scores([recurring])[0] - first_deadline)
+        finally:
+            await scheduler.stop()
+            await scheduler.executor.aclose()
+
+    now_ms = timestamp_ms()
+    with slow_stub_server(delay=0) as url:
+        state, result, outcome, moved = asyncio.run(run(url))
+    assert state == "completed"
+    assert result.status_code == 200 and result.attempts == 1 and result.fired_at >= now_ms
+    assert outcome == [FIRED]
+    assert moved >= 1000
+
+
+def test_embedded_backend_api(tmp_path, monkeypatch) -> None:
+    """
+    To test that the API serves the timers without Redis with QUEUE_BACKEND=embedded
+    """
+    monkeypatch.setattr(settings, "QUEUE_BACKEND", "embedded")
+    monkeypatch.setattr(settings, "EMBEDDED_LOG_PATH", str(tmp_path / "timers.log"))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/timer", json={"hours": 0, "minutes": 0, "seconds": 30,
+                                                      "url": "https://example.com"})
+        assert response.status_code == 201
+        timer_id = response.json()["id"]
+        assert client.get(f"/api/v1/timer/{timer_id}").json()["time_left"] in (29, 30)
+        assert client.delete(f"/api/v1/timer/{timer_id}").status_code == 200
+        assert client.delete(f"/api/v1/timer/{timer_id}").status_code == 404
+        response = client.post("/api/v1/timer", params={"coalesce": True},
+                               json={"hours": 0, "minutes": 0, "seconds": 30, "url": "https://example.com"})
+        assert response.status_code == 501
+        timer = {"hours": 0, "minutes": 0, "seconds": 30, "url": "https://example.com", "tenant": "acme"}
+        assert client.post("/api/v1/timer", json=timer).status_code == 501
+        timer = {**timer, "tenant": None, "idempotency_key": "order-1"}
+        assert client.post("/api/v1/timer", json=timer).status_code == 501
+        response = client.post("/api/v1/timers/batch", json=[{**timer, "tenant": "acme", "idempotency_key": None},
+                                                              {**timer, "idempotency_key": None}])
+        assert response.status_code == 207 and response.json()["created"] == 1
+        assert client.get("/api/v1/dead-letters").status_code == 501
+    assert queue.embedded is None
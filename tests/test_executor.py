@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.app.core.utils import metrics
+from src.app.core.worker.executor import CallbackExecutor, RetryPolicy
+from src.app.exceptions.custom_exceptions import CallbackRetryError
+from .helpers.servers import slow_stub_server
+
+
+def create_executor(total: int = 2) -> CallbackExecutor:
+    """
+    Creating an executor which retries without sleeping
+    :return: executor
+    """
+    return CallbackExecutor(RetryPolicy(total=total, backoff_factor=0), httpx.Timeout(5), 10, httpx.Limits(), 2)
+
+
+def test_executor_returns_response() -> None:
+    """
+    To test that the callback request is made over the shared client
+    """
+    async def run() -> list:
+        executor = create_executor()
+        try:
+            return await asyncio.gather(*(executor.get(url) for _ in range(5)))
+        finally:
+            await executor.aclose()
+
+    with slow_stub_server(delay=0) as url:
+        responses = asyncio.run(run())
+    assert [response.status_code for response in responses] == [200] * 5
+
+
+def test_executor_retries_http_status() -> None:
+    """
+    To test that the retryable status codes are retried on plain http urls too
+    """
+    async def run() -> None:
+        executor = create_executor(total=2)
+        try:
+            await executor.get(url)
+        finally:
+            await executor.aclose()
+
+    retries = metrics.CALLBACK_RETRIES.value("status")
+    with slow_stub_server(delay=0, status=503) as url:
+        with pytest.raises(CallbackRetryError) as e:
+            asyncio.run(run())
+    assert e.value.status_code == 503
+    assert e.value.attempts == 3
+    assert metrics.CALLBACK_RETRIES.value("status") - retries == 2
+
+
+def test_retry_policy_backoff() -> None:
+    """
+    To test the backoff follows urllib3: first retry is immediate, then factor * 2 ** (n - 1)
+    """
+    retry = RetryPolicy()
+    assert [retry.backoff(n) for n in range(1, 5)] == [0, 4, 8, 16]
+
+
+def test_executor_saturated_host_keeps_other_hosts_going() -> None:
+    """
+    To test that the jobs waiting for a saturated host do not hold the global slots of the other hosts
+    """
+    async def run(slow_url: str, fast_url: str) -> float:
+        executor = CallbackExecutor(RetryPolicy(total=0), httpx.Timeout(5), 2, httpx.Limits(), 1)
+        try:
+            slow = [asyncio.create_task(executor.get(slow_url)) for _ in range(4)]
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            assert (await executor.get(fast_url)).status_code == 200
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*slow)
+            return elapsed
+        finally:
+            await executor.aclose()
+
+    with slow_stub_server(delay=0.5) as slow_url, slow_stub_server(delay=0) as fast_url:
+        elapsed = asyncio.run(run(slow_url, fast_url))
+    assert elapsed < 0.4
@@ -0,0 +1,26 @@
+import pytest
+
+from src.app.core.utils.lanes import lane_for, lane_weight, parse_weights
+
+
+def test_lane_for() -> None:
+    """
+    To test that only the timers with a tenant or a priority get a lane
+    """
+    assert lane_for(None, None) is None
+    assert lane_for("acme", None) == "acme:normal"
+    assert lane_for(None, "high") == "default:high"
+
+
+def test_lane_weight() -> None:
+    """
+    To test that the weight of a lane is the weight of its tenant times the weight of its priority
+    """
+    priorities = parse_weights("high:4, normal:2,low:1")
+    tenants = parse_weights("acme:3")
+    assert priorities == {"high": 4, "normal": 2, "low": 1}
+    assert lane_weight("acme:high", priorities, tenants) == 12
+    assert lane_weight("other:low", priorities, tenants) == 1
+    assert parse_weights("") == {}
+    with pytest.raises(ValueError):
+        parse_weights("acme:0")
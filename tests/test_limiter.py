@@ -0,0 +1,161 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from arq import Retry
+from arq.constants import retry_key_prefix
+
+from src.app.core.config import settings
+from src.app.core.utils.dead_letters import DEAD_LETTERS_INDEX_KEY, DEAD_LETTERS_KEY
+from src.app.core.worker.executor import CallbackExecutor, RetryPolicy
+from src.app.core.worker.functions import call_url
+from src.app.core.worker.limiter import (
+    DEFERRALS_KEY_PREFIX,
+    LIMIT_KEY_PREFIX,
+    HostLimit,
+    HostLimiter,
+    count_deferral,
+    parse_host_limits,
+)
+from src.app.exceptions.custom_exceptions import HostLimitError
+from .helpers.pools import queue_pool
+from .helpers.servers import slow_stub_server
+
+
+def test_parse_host_limits() -> None:
+    """
+    To test the parsing of HOST_RATE_LIMITS, a missing burst defaults to one second of requests
+    """
+    assert parse_host_limits("") == {}
+    assert parse_host_limits("*=50:100:20, API.example.com=5") == {
+        "*": HostLimit(rate=50, burst=100, concurrency=20),
+        "api.example.com": HostLimit(rate=5, burst=5, concurrency=0),
+    }
+
+
+def test_acquire_rate() -> None:
+    """
+    To test that the token bucket of a host lets its burst through, then tells how long to wait for the next token
+    """
+    async def run() -> list[tuple[float, str]]:
+        pool = await queue_pool()
+        host = f"{uuid.uuid4().hex}.example.com"
+        limiter = HostLimiter(pool, {host: HostLimit(rate=1, burst=2)}, lease_ttl=30, busy_wait=0.2)
+        try:
+            return [await limiter.acquire(host, str(i)) for i in range(3)]
+        finally:
+            await pool.delete(LIMIT_KEY_PREFIX + host)
+            await pool.close()
+
+    first, second, (wait, reason) = asyncio.run(run())
+    assert first == second == (0, "")
+    assert reason == "rate" and 0 < wait <= 1
+
+
+def test_acquire_concurrency() -> None:
+    """
+    To test that a host takes requests up to its concurrency, and a freed lease lets the next one through
+    """
+    async def run() -> list[tuple[float, str]]:
+        pool = await queue_pool()
+        host = f"{uuid.uuid4().hex}.example.com"
+        limiter = HostLimiter(pool, {"*": HostLimit(concurrency=1)}, lease_ttl=30, busy_wait=0.2)
+        try:
+            outcomes = [await limiter.acquire(host, "first"), await limiter.acquire(host, "second")]
+            await limiter.release(host, "first")
+            return outcomes + [await limiter.acquire(host, "second")]
+        finally:
+            await pool.delete(LIMIT_KEY_PREFIX + host + ":leases")
+            await pool.close()
+
+    assert asyncio.run(run()) == [(0, ""), (0.2, "concurrency"), (0, "")]
+
+
+def test_count_deferral_gives_back_try() -> None:
+    """
+    To test that a deferral is counted on its own and gives back the try of arq taken by the deferred run
+    """
+    async def run() -> list:
+        pool = await queue_pool()
+        job_id = uuid.uuid4().hex
+        try:
+            counts = []
+            for _ in range(3):
+                # arq takes a try when it starts the job
+                await pool.incr(retry_key_prefix + job_id)
+                counts.append(await count_deferral(pool, job_id))
+            return [counts, int(await pool.get(retry_key_prefix + job_id)),
+                    await pool.ttl(DEFERRALS_KEY_PREFIX + job_id)]
+        finally:
+            await pool.delete(retry_key_prefix + job_id, DEFERRALS_KEY_PREFIX + job_id)
+            await pool.close()
+
+    counts, tries, ttl = asyncio.run(run())
+    assert counts == [1, 2, 3]
+    assert tries == 0
+    assert ttl > 0
+
+
+def test_call_url_dead_letters_after_max_deferrals(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    To test that a job deferred more than HOST_LIMIT_MAX_DEFERRALS times is dead lettered, and its count dropped
+    """
+    monkeypatch.setattr(settings, "HOST_LIMIT_MAX_DEFERRALS", 2)
+    monkeypatch.setattr(settings, "DEAD_LETTER_ENABLED", True)
+
+    async def run() -> list:
+        pool = await queue_pool()
+        job_id = uuid.uuid4().hex
+        host = f"{uuid.uuid4().hex}.example.com"
+        limiter = HostLimiter(pool, {"*": HostLimit(concurrency=1)}, lease_ttl=30, busy_wait=0.2)
+        ctx = {"redis": pool, "job_id": job_id, "host_limiter": limiter}
+        try:
+            # the only slot of the host is held by another job
+            await limiter.acquire(host, "other")
+            outcomes = []
+            for _ in range(3):
+                await pool.incr(retry_key_prefix + job_id)
+                try:
+                    await call_url(ctx, f"https://{host}/", job_id)
+                except (Retry, HostLimitError) as e:
+                    outcomes.append(e.__class__)
+            return [outcomes, await pool.hget(DEAD_LETTERS_KEY, job_id),
+                    await pool.exists(DEFERRALS_KEY_PREFIX + job_id)]
+        finally:
+            await pool.hdel(DEAD_LETTERS_KEY, job_id)
+            await pool.zrem(DEAD_LETTERS_INDEX_KEY, job_id)
+            await pool.delete(retry_key_prefix + job_id, LIMIT_KEY_PREFIX + host + ":leases")
+            await pool.close()
+
+    outcomes, dead_letter, deferrals = asyncio.run(run())
+    assert outcomes == [Retry, Retry, HostLimitError]
+    assert dead_letter is not None
+    assert not deferrals
+
+
+def test_call_url_drops_deferrals_once_sent(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    To test that the deferrals of a job are dropped once its callback is sent
+    """
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", False)
+    monkeypatch.setattr(settings, "WORKER_FIRE_RECORDS_MAXLEN", 0)
+
+    async def run(url: str) -> tuple[str, int]:
+        pool = await queue_pool()
+        job_id = uuid.uuid4().hex
+        limiter = HostLimiter(pool, {"*": HostLimit(concurrency=1)}, lease_ttl=30, busy_wait=0.2)
+        executor = CallbackExecutor(RetryPolicy(total=0), httpx.Timeout(5), 10, httpx.Limits(), 2)
+        ctx = {"redis": pool, "job_id": job_id, "score": 0, "host_limiter": limiter, "http_executor": executor}
+        try:
+            await count_deferral(pool, job_id)
+            return await call_url(ctx, url, job_id), await pool.exists(DEFERRALS_KEY_PREFIX + job_id)
+        finally:
+            await pool.delete(retry_key_prefix + job_id, DEFERRALS_KEY_PREFIX + job_id)
+            await executor.aclose()
+            await pool.close()
+
+    with slow_stub_server(delay=0) as url:
+        outcome, deferrals = asyncio.run(run(url))
+    assert outcome == f"Extracted data from {url}"
+    assert not deferrals
@@ -0,0 +1,34 @@
+import json
+import logging
+import queue
+
+from src.app.core.utils.logger import BoundedQueueHandler, JsonFormatter
+
+
+def test_json_formatter() -> None:
+    """
+    To test that a record is written as one JSON object with its message formatted
+    """
+    record = logging.LogRecord("tasks", logging.INFO, __file__, 10, "Task %s is created", ("abc",), None, "create_task")
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "tasks"
+    assert entry["function"] == "create_task"
+    assert entry["message"] == "Task abc is created"
+
+
+def test_queue_handler_drops_when_full() -> None:
+    """
+    To test that the records are handed off unformatted and dropped once the queue is full
+    """
+    log_queue: queue.Queue = queue.Queue(2)
+    handler = BoundedQueueHandler(log_queue)
+    logger = logging.getLogger("test_queue_handler_drops_when_full")
+    logger.propagate = False
+    logger.addHandler(handler)
+    for index in range(5):
+        logger.warning("record %d", index)
+
+    assert handler.dropped == 3
+    record = log_queue.get_nowait()
+    assert (record.msg, record.args) == ("record %d", (0,))
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.app.core.utils import metrics
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    """
+    To test the text exposition of a histogram
+    """
+    registry: list = []
+    histogram = metrics.Histogram("test_seconds", "Test", ["path"], buckets=(0.1, 1), registry=registry)
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, "single")
+
+    lines = metrics.render_metrics(registry).splitlines()
+    assert lines[:2] == ["# HELP test_seconds Test", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{path="single",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{path="single",le="1"} 3' in lines
+    assert 'test_seconds_bucket{path="single",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{path="single"} 4' in lines
+    assert 'test_seconds_sum{path="single"} 4.25' in lines
+
+
+def test_worker_exporter_serves_metrics() -> None:
+    """
+    To test that the exporter of the worker serves the metrics of the process
+    """
+    async def run() -> httpx.Response:
+        await metrics.start_exporter(0)
+        port = metrics._exporter.sockets[0].getsockname()[1]
+        try:
+            async with httpx.AsyncClient() as client:
+                return await client.get(f"http://127.0.0.1:{port}/metrics")
+        finally:
+            await metrics.stop_exporter()
+
+    metrics.CALLBACK_RETRIES.inc("status")
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert "# TYPE delayed_task_callback_retries_total counter" in response.text
+    assert 'delayed_task_callback_retries_total{reason="status"}' in response.text
+
+
+def test_exporter_takes_first_free_port() -> None:
+    """
+    To test that every API process gets a port of its own, and that the gauges are refreshed at scrape time
+    """
+    collected = []
+
+    async def collect() -> None:
+        collected.append(True)
+
+    async def run() -> tuple[int, int, httpx.Response]:
+        # the first port is held by another process of the API
+        taken = await asyncio.start_server(lambda reader, writer: None, "0.0.0.0", 0)
+        port = taken.sockets[0].getsockname()[1]
+        try:
+            with pytest.raises(OSError):
+                await metrics.start_exporter(port)
+            exporter_port = await metrics.start_exporter(port, 10, collect)
+            async with httpx.AsyncClient() as client:
+                return port, exporter_port, await client.get(f"http://127.0.0.1:{exporter_port}/metrics")
+        finally:
+            await metrics.stop_exporter()
+            taken.close()
+            await taken.wait_closed()
+
+    port, exporter_port, response = asyncio.run(run())
+    assert port < exporter_port < port + 10
+    assert response.status_code == 200
+    assert collected == [True]
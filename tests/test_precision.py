@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from arq.utils import timestamp_ms
+from arq.worker import Worker
+
+from src.app.core.worker.precision import PrecisionWorker
+
+
+class DeadlinePool:
+    """
+    Pool answering the next deadline of the queue, `delay_s` seconds from now
+    """
+    def __init__(self, delay_s: float | None) -> None:
+        self.delay_s = delay_s
+
+    async def zrangebyscore(self, *args, **kwargs) -> list:
+        if self.delay_s is None:
+            return []
+        return [(b"next", timestamp_ms() + self.delay_s * 1000)]
+
+
+async def noop(ctx: dict) -> None:
+    pass
+
+
+def next_wakeup(monkeypatch: pytest.MonkeyPatch, page: list[bytes], running_elsewhere: set[bytes],
+                delay_s: float | None) -> float:
+    """
+    Starting a page of jobs, skipping the jobs running in other workers, and reading the sleep before the next poll
+    :return: seconds until the next poll
+    """
+    async def start_jobs(self: Worker, job_ids: list[bytes]) -> None:
+        for job_id in job_ids:
+            if job_id not in running_elsewhere:
+                self.tasks[job_id.decode()] = asyncio.get_running_loop().create_future()
+
+    async def run() -> float:
+        worker = PrecisionWorker(functions=[noop], redis_pool=DeadlinePool(delay_s), queue_read_limit=len(page),
+                                 handle_signals=False, max_wait=0.5)
+        await worker.start_jobs(page)
+        return await worker.next_wakeup_s()
+
+    monkeypatch.setattr(Worker, "start_jobs", start_jobs)
+    return asyncio.run(run())
+
+
+def test_next_wakeup_after_full_page(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    To test that the worker polls again right away after starting a full page of due jobs
+    """
+    assert next_wakeup(monkeypatch, [b"a", b"b"], set(), delay_s=0.3) == 0
+
+
+def test_next_wakeup_after_jobs_running_elsewhere(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    To test that a page of jobs already running in other workers does not make the worker spin
+    """
+    assert 0.2 < next_wakeup(monkeypatch, [b"a", b"b"], {b"a", b"b"}, delay_s=0.3) <= 0.3
+    assert next_wakeup(monkeypatch, [b"a", b"b"], {b"b"}, delay_s=2) == 0.5
+    assert next_wakeup(monkeypatch, [b"a", b"b"], {b"a", b"b"}, delay_s=None) == 0.5
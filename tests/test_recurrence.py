@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from src.app.core.utils.recurrence import cron_schedule, interval_schedule, next_deadline, parse_cron
+
+
+def utc_ms(*args: int) -> int:
+    return int(datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+
+def test_interval_is_drift_free() -> None:
+    """
+    To test that the next deadline follows from the previous deadline and skips the missed occurrences
+    """
+    schedule = interval_schedule(10)
+    assert next_deadline(schedule, 0, 0) == 10000
+    assert next_deadline(schedule, 10000, 10350) == 20000
+    assert next_deadline(schedule, 10000, 45000) == 50000
+
+
+def test_cron_next_deadline() -> None:
+    """
+    To test the occurrences of cron expressions across hours, days, months and leap years
+    """
+    now = utc_ms(2026, 1, 31, 23, 59, 30)
+    assert next_deadline(cron_schedule("*/15 * * * *"), now, now) == utc_ms(2026, 2, 1, 0, 0)
+    assert next_deadline(cron_schedule("0 9 * * 1-5"), now, now) == utc_ms(2026, 2, 2, 9, 0)
+    assert next_deadline(cron_schedule("0 0 29 2 *"), now, now) == utc_ms(2028, 2, 29, 0, 0)
+    # day of month or day of week when both are restricted, 7 is sunday
+    assert next_deadline(cron_schedule("30 12 15 * 7"), now, now) == utc_ms(2026, 2, 1, 12, 30)
+    # a late occurrence does not move the next one
+    deadline = utc_ms(2026, 2, 1, 0, 0)
+    assert next_deadline(cron_schedule("*/15 * * * *"), deadline, deadline + 2500) == utc_ms(2026, 2, 1, 0, 15)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *", "0 0 31 2 *"])
+def test_invalid_cron(expression: str) -> None:
+    """
+    To test that malformed cron expressions, and expressions without occurrence, are rejected
+    """
+    with pytest.raises(ValueError):
+        parse_cron(expression).next_after(datetime.datetime.now(datetime.timezone.utc))
@@ -0,0 +1,20 @@
+from src.app.core.utils.results import RESULT_FORMAT, CallbackResult, body_hash
+
+
+def test_result_round_trip() -> None:
+    """
+    To test that a callback result is packed in a fixed size record and read back unchanged
+    """
+    result = CallbackResult(200, 35, 1, 1760000000123, body_hash(b'{"ok": true}'))
+    payload = result.pack()
+    assert len(payload) == RESULT_FORMAT.size == 24
+    assert CallbackResult.unpack(payload) == result
+
+
+def test_result_without_response() -> None:
+    """
+    To test that a callback without response, and counters over their range, are still stored
+    """
+    result = CallbackResult(0, 2 ** 40, 70000, 1760000000123, body_hash(b""))
+    assert CallbackResult.unpack(result.pack()) == CallbackResult(0, 2 ** 32 - 1, 2 ** 16 - 1, 1760000000123,
+                                                                   body_hash(b""))
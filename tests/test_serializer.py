@@ -0,0 +1,30 @@
+import pickle
+
+from arq.jobs import deserialize_job_raw, deserialize_result, serialize_job, serialize_result
+
+from src.app.core.utils.serializer import deserialize_compact, serialize_compact
+
+
+def test_request_url_job_is_compact() -> None:
+    """
+    To test that a request_url job is written in the compact format and read back by arq
+    """
+    url = "https://www.google.com/callback?id=1"
+    payload = serialize_job("request_url", (url,), {}, 3, 1700000000000, serializer=serialize_compact)
+
+    assert len(payload) == 11 + len(url)
+    assert deserialize_job_raw(payload, deserializer=deserialize_compact) == (
+        "request_url", (url,), {}, 3, 1700000000000
+    )
+
+
+def test_other_payloads_are_pickled() -> None:
+    """
+    To test that results and the jobs queued with pickle are still readable
+    """
+    result = serialize_result("request_url", ("https://www.google.com",), {}, 1, 1, True, "done", 2, 3, "id",
+                              "delayed_task", serializer=serialize_compact)
+    assert deserialize_result(result, deserializer=deserialize_compact).result == "done"
+
+    legacy = serialize_job("request_url", ("https://www.google.com",), {}, 1, 1, serializer=pickle.dumps)
+    assert deserialize_job_raw(legacy, deserializer=deserialize_compact)[:2] == ("request_url", ("https://www.google.com",))
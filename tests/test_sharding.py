@@ -0,0 +1,52 @@
+from urllib.parse import quote
+
+from src.app.core.config import settings
+from src.app.core.utils import queue
+from src.app.core.utils.timers import new_job_id, shard_job_id
+
+
+def test_parse_shards() -> None:
+    """
+    To test the shards are parsed from host:port and redis:// urls, and default to the single redis
+    """
+    shards = queue.parse_shards("redis-1:6379, redis://redis-2:6380/2", "localhost", 6379)
+    assert [(shard.host, shard.port, shard.database) for shard in shards] == [("redis-1", 6379, 0), ("redis-2", 6380, 2)]
+
+    shard, = queue.parse_shards("", "localhost", 6379)
+    assert (shard.host, shard.port) == ("localhost", 6379)
+
+
+def test_shard_index_is_stable() -> None:
+    """
+    To test a job id always hashes to the same shard, whatever the process
+    """
+    assert queue.shard_index("5264ca0402144d18bc94a8adb5d9b9a3", 4) == queue.shard_index("5264ca0402144d18bc94a8adb5d9b9a3", 4)
+    assert {queue.shard_index(f"{i:032x}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_group_by_shard() -> None:
+    """
+    To test the job ids are grouped by shard, keeping their positions
+    """
+    shards, queue.shards = queue.shards, [None, None, None]
+    try:
+        job_ids = [f"{i:032x}" for i in range(30)]
+        groups = queue.group_by_shard(job_ids)
+    finally:
+        queue.shards = shards
+    assert sorted(position for positions in groups.values() for position in positions) == list(range(30))
+    for shard, positions in groups.items():
+        assert all(queue.shard_index(job_ids[position], 3) == shard for position in positions)
+
+
+def test_short_job_ids(monkeypatch) -> None:
+    """
+    To test the short job ids are url safe, unique, and still generated on the requested shard
+    """
+    monkeypatch.setattr(settings, "TIMER_SHORT_IDS", True)
+    job_ids = {new_job_id() for _ in range(1000)}
+    assert len(job_ids) == 1000
+    assert all(len(job_id) == 16 and quote(job_id) == job_id for job_id in job_ids)
+
+    monkeypatch.setattr(queue, "shards", [None, None, None])
+    assert all(queue.shard_index(shard_job_id(2), 3) == 2 for _ in range(20))
@@ -0,0 +1,52 @@
+import time
+
+from src.app.core.utils import metrics
+from src.app.core.utils.status_cache import StatusCache
+
+
+def test_status_cache_pending_and_due() -> None:
+    """
+    To test that a pending timer is served until its deadline, and a timer whose job is gone until it expires
+    """
+    cache = StatusCache(max_size=10, ttl=30)
+    now = time.time() * 1000
+    cache.put("pending", now + 5000, None)
+    cache.put("done", None, {"status_code": 200})
+    assert cache.get("pending", now) == (now + 5000, None)
+    assert cache.get("pending", now + 5000) is None
+    assert len(cache) == 1
+    assert cache.get("done", now + 60000) == (None, {"status_code": 200})
+    assert cache.get("unknown", now) is None
+
+
+def test_status_cache_eviction_and_ttl() -> None:
+    """
+    To test that the least recently used timer is evicted and that the entries expire
+    """
+    cache = StatusCache(max_size=2, ttl=30)
+    cache.put("a", None, None)
+    cache.put("b", None, None)
+    assert cache.get("a", 0) is not None
+    cache.put("c", None, None)
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) is not None and cache.get("c", 0) is not None
+    expired = StatusCache(max_size=2, ttl=0)
+    expired.put("a", None, None)
+    assert expired.get("a", 0) is None
+
+
+def test_status_cache_invalidation() -> None:
+    """
+    To test that invalidating a job drops the coalesced timers cached with it
+    """
+    hits = metrics.STATUS_CACHE_LOOKUPS.value("hit")
+    cache = StatusCache(max_size=10, ttl=30)
+    now = time.time() * 1000
+    cache.put("first", now + 5000, None, job_id="group")
+    cache.put("second", now + 5000, None, job_id="group")
+    cache.put("other", now + 5000, None)
+    cache.invalidate(["group"])
+    assert cache.get("first", now) is None and cache.get("second", now) is None
+    cache.invalidate(["other"])
+    assert len(cache) == 0
+    assert metrics.STATUS_CACHE_LOOKUPS.value("hit") == hits
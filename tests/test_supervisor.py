@@ -0,0 +1,41 @@
+import sys
+import time
+
+from src.app.core.worker.supervisor import Supervisor
+
+
+class ExitingSupervisor(Supervisor):
+    """
+    Supervisor of processes exiting right away
+    """
+    def command(self, child) -> list[str]:
+        return [sys.executable, "-c", "pass"]
+
+
+def test_start_delays_spread_the_polls() -> None:
+    """
+    To test that the first reads of the queue of the processes are spread over the poll delay
+    """
+    supervisor = Supervisor(4, poll_delay=0.5, drain_timeout=1, restart_delay=1, metrics_port=0)
+    delays = [float(supervisor.command(child)[-1]) for child in supervisor.children]
+    assert delays == [0, 0.125, 0.25, 0.375]
+
+
+def test_crashed_process_is_restarted_with_backoff() -> None:
+    """
+    To test that a process exiting on its own is restarted, with a doubled delay on every crash in a row
+    """
+    supervisor = ExitingSupervisor(1, poll_delay=0.5, drain_timeout=1, restart_delay=0.1, metrics_port=0)
+    child = supervisor.children[0]
+    supervisor.start(child)
+    child.process.wait()
+    supervisor.check()
+    assert child.process is None and child.restart_delay == 0.1
+
+    time.sleep(0.15)
+    supervisor.check()
+    assert child.process is not None
+    child.process.wait()
+    supervisor.check()
+    assert child.restart_delay == 0.2
+    supervisor.stop(supervisor.children)
@@ -0,0 +1,37 @@
+from src.app.schemas.request import TimerRequest, is_valid_url, validate_timer_requests
+from .helpers import generators
+
+
+def test_is_valid_url() -> None:
+    """
+    To test the structural check of the callback urls
+    """
+    assert is_valid_url("https://www.google.com")
+    assert is_valid_url("http://127.0.0.1:8080/callback?id=1")
+    assert not is_valid_url("https://www/google.com")
+    assert not is_valid_url("ftp://www.google.com")
+    assert not is_valid_url("https://www.google.com:99999")
+    assert not is_valid_url("https://www.google.com/a\nD 5264ca0402144d18bc94a8adb5d9b9a3")
+
+
+def test_validate_timer_requests_matches_model() -> None:
+    """
+    To test that the fast path of the batch validation gives the same timers and errors as TimerRequest
+    """
+    items = generators.create_batch_timer_request() + [
+        generators.create_negative_minutes_request(),
+        {"hours": "1", "minutes": 0, "seconds": 0, "url": "https://www.google.com"},
+        {"hours": 1, "minutes": 0, "seconds": 0, "url": "https://www.google.com", "extra": True},
+        {"hours": 1, "minutes": 0, "seconds": 0, "url": "https://www.google.com", "idempotency_key": "retry-1"},
+    ]
+    valid = TimerRequest.model_validate(generators.create_valid_timer_request())
+
+    assert validate_timer_requests(items) == [
+        (valid.url, valid.delay_seconds),
+        "Invalid URL",
+        ("https://www.google.com", 30),
+        "minutes: Value error, Value should be greater than 0",
+        ("https://www.google.com", 3600),
+        ("https://www.google.com", 3600),
+        "idempotency_key: Only supported by POST /api/v1/timer",
+    ]